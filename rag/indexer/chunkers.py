@@ -1,26 +1,227 @@
+import os
 import re
-from typing import List
+from functools import lru_cache
+from typing import List, NamedTuple, Optional, Sequence, Tuple, Union
 
+import numpy as np
 import tiktoken
 
+DEFAULT_ENCODING = "cl100k_base"
+# encode_ordinary_batch spreads texts over a thread pool; below this many
+# characters (or on one CPU) starting the pool costs more than it saves
+BATCH_ENCODE_MIN_CHARS = 256 * 1024
+
+# Markdown chunkers: sections packs paragraphs and sections up to the token
+# budget; fragments is the older split on every heading, blank line and bullet
+MARKDOWN_CHUNKERS = ("sections", "fragments")
+DEFAULT_MARKDOWN_CHUNKER = "sections"
+
+# Tokenizer chunk sizes are measured in: model is the embedding model's own
+# (chunks then never exceed its maximum sequence length), tiktoken is cl100k_base
+CHUNK_TOKENIZERS = ("model", "tiktoken")
+DEFAULT_CHUNK_TOKENIZER = "model"
+
+HEADING_RE = re.compile(r"^ {0,3}(#{1,6})[ \t]+(.*?)(?:[ \t]+#+)?[ \t]*$")
+FENCE_RE = re.compile(r"^ {0,3}(`{3,}|~{3,})")
+EMPHASIS_RE = re.compile(r"[*_`]+")
+
+
+@lru_cache(maxsize=None)
+def get_encoder(name: str = DEFAULT_ENCODING) -> tiktoken.Encoding:
+    """The tiktoken encoding, loaded once per process."""
+    return tiktoken.get_encoding(name)
+
+
+@lru_cache(maxsize=None)
+def token_byte_lengths(name: str = DEFAULT_ENCODING) -> np.ndarray:
+    """Length in bytes of every token id (0 for unused ids)."""
+    enc = get_encoder(name)
+    lengths = np.zeros(enc.n_vocab, dtype=np.int64)
+    for token in range(enc.n_vocab):
+        try:
+            lengths[token] = len(enc.decode_single_token_bytes(token))
+        except KeyError:
+            pass
+    return lengths
+
+
+def encode_texts(enc: tiktoken.Encoding, texts: Sequence[str]) -> List[np.ndarray]:
+    """Token ids of each text (special-token markers are encoded as plain text)."""
+    if (
+        len(texts) > 1
+        and (os.cpu_count() or 1) > 1
+        and sum(len(text) for text in texts) >= BATCH_ENCODE_MIN_CHARS
+    ):
+        return [
+            np.asarray(tokens, dtype=np.uint32)
+            for tokens in enc.encode_ordinary_batch(list(texts))
+        ]
+    # Much faster than encode(): no list of Python ints is built
+    return [enc.encode_to_numpy(text, disallowed_special=()) for text in texts]
+
+
+def token_windows(
+    n_tokens: int, max_tokens: int, overlap: int
+) -> List[Tuple[int, int]]:
+    """(start, end) token ranges of max_tokens, each overlapping the previous."""
+    windows = []
+    start = 0
+    while start < n_tokens:
+        end = min(start + max_tokens, n_tokens)
+        windows.append((start, end))
+        if end == n_tokens:
+            # A further window would only repeat the overlap
+            break
+        start = end - overlap if end - overlap > start else end
+    return windows
+
+
+class TiktokenCounter:
+    """Measures chunks in tiktoken (cl100k_base) tokens."""
+
+    name = "tiktoken"
+    # Tokens the embedding model keeps (None: not known)
+    max_tokens: Optional[int] = None
+
+    def __init__(self, encoding: str = DEFAULT_ENCODING):
+        self.encoding = encoding
+
+    def may_exceed(self, text: str, max_tokens: int) -> bool:
+        # Every token is at least one byte: shorter texts need no tokenizing
+        return len(text.encode("utf-8")) > max_tokens
+
+    def bounds(self, texts: Sequence[str]) -> List[np.ndarray]:
+        """
+        Per text, the character offset at which each token starts, plus
+        len(text). An offset inside a multi-byte character (tokens may
+        split one) moves to the end of that character.
+        """
+        enc = get_encoder(self.encoding)
+        byte_lengths = token_byte_lengths(self.encoding)
+        result = []
+        for text, tokens in zip(texts, encode_texts(enc, texts)):
+            offsets = np.zeros(len(tokens) + 1, dtype=np.int64)
+            np.cumsum(byte_lengths[tokens], out=offsets[1:])
+            if not text.isascii():
+                data = np.frombuffer(text.encode("utf-8"), dtype=np.uint8)
+                # chars_before[b]: characters starting in the first b bytes
+                chars_before = np.zeros(len(data) + 1, dtype=np.int64)
+                np.cumsum((data & 0xC0) != 0x80, out=chars_before[1:])
+                offsets = chars_before[offsets]
+            result.append(offsets)
+        return result
+
+    def count(self, texts: Sequence[str]) -> List[int]:
+        return [len(bounds) - 1 for bounds in self.bounds(texts)]
+
+
+class ModelTokenizer:
+    """
+    Measures chunks with the embedding model's own (Hugging Face) tokenizer,
+    so a chunk never holds more tokens than the model reads.
+    """
+
+    name = "model"
+
+    def __init__(self, tokenizer):
+        # A copy without the model's truncation and padding, to see full lengths
+        self.tokenizer = type(tokenizer).from_str(tokenizer.to_str())
+        self.tokenizer.no_truncation()
+        self.tokenizer.no_padding()
+        specials = len(self.tokenizer.encode("", add_special_tokens=True).ids)
+        limit = (tokenizer.truncation or {}).get("max_length")
+        self.max_tokens: Optional[int] = limit - specials if limit else None
+
+    def may_exceed(self, text: str, max_tokens: int) -> bool:
+        return bool(text.strip())
+
+    def _encode(self, texts: Sequence[str]):
+        return self.tokenizer.encode_batch(list(texts), add_special_tokens=False)
+
+    def bounds(self, texts: Sequence[str]) -> List[np.ndarray]:
+        """Per text, the character offset at which each token starts, plus len(text)."""
+        result = []
+        for text, encoding in zip(texts, self._encode(texts)):
+            offsets = np.empty(len(encoding.offsets) + 1, dtype=np.int64)
+            offsets[:-1] = [start for start, _ in encoding.offsets]
+            offsets[-1] = len(text)
+            # Offsets of merged or special tokens may step back
+            np.maximum.accumulate(offsets, out=offsets)
+            result.append(offsets)
+        return result
+
+    def count(self, texts: Sequence[str]) -> List[int]:
+        return [len(encoding.ids) for encoding in self._encode(texts)]
+
+
+TokenCounter = Union[TiktokenCounter, ModelTokenizer]
+TIKTOKEN = TiktokenCounter()
+
+
+class Chunk(NamedTuple):
+    text: str
+    # Titles of the enclosing headings, outermost first
+    headings: Tuple[str, ...] = ()
+    # Size in the counter's tokens (an upper bound for packed markdown)
+    tokens: int = 0
+
+
+def chunk_bounds(
+    text: str, bounds: np.ndarray, max_tokens: int = 300, overlap: int = 40
+) -> List[Chunk]:
+    """
+    Chunks of at most max_tokens tokens, sliced out of text by character
+    offset instead of decoding every (overlapping) window again.
+    """
+    n_tokens = len(bounds) - 1
+    if n_tokens <= max_tokens:
+        windows = [(0, n_tokens)]
+    else:
+        windows = token_windows(n_tokens, max_tokens, overlap)
+    chunks = []
+    for start, end in windows:
+        piece = text[bounds[start] : bounds[end]].strip()
+        if piece:
+            chunks.append(Chunk(piece, (), end - start))
+    return chunks
+
+
+def token_chunks(
+    texts: Sequence[str],
+    max_tokens: int = 300,
+    overlap: int = 40,
+    counter: TokenCounter = TIKTOKEN,
+) -> List[List[Chunk]]:
+    """Token-bounded chunks of several texts (e.g. the sections of a file) at once."""
+    long = [counter.may_exceed(text, max_tokens) for text in texts]
+    bounds = iter(counter.bounds([t for t, is_long in zip(texts, long) if is_long]))
+    chunks = []
+    for text, is_long in zip(texts, long):
+        if is_long:
+            chunks.append(chunk_bounds(text, next(bounds), max_tokens, overlap))
+        else:
+            stripped = text.strip()
+            # Bytes bound the token count from above
+            size = len(stripped.encode("utf-8"))
+            chunks.append([Chunk(stripped, (), size)] if stripped else [])
+    return chunks
+
+
+def chunk_texts(
+    texts: Sequence[str], max_tokens=300, overlap=40, model="gpt-3.5-turbo"
+) -> List[List[str]]:
+    """chunk_text for several texts (e.g. the sections of a file) at once."""
+    return [
+        [chunk.text for chunk in chunks]
+        for chunks in token_chunks(texts, max_tokens, overlap)
+    ]
+
 
 # Simple tokenizer-based chunker for markdown/text/code
 def chunk_text(
     text: str, max_tokens=300, overlap=40, model="gpt-3.5-turbo"
 ) -> List[str]:
-    enc = (
-        tiktoken.get_encoding("cl100k_base")
-        if "gpt" in model
-        else tiktoken.get_encoding("cl100k_base")
-    )
-    tokens = enc.encode(text)
-    chunks = []
-    start = 0
-    while start < len(tokens):
-        end = min(start + max_tokens, len(tokens))
-        chunks.append(enc.decode(tokens[start:end]))
-        start = end - overlap if end - overlap > start else end
-    return [c.strip() for c in chunks if c.strip()]
+    return chunk_texts([text], max_tokens, overlap, model)[0]
 
 
 def prefer_md_splits(text: str) -> List[str]:
@@ -28,3 +229,110 @@ def prefer_md_splits(text: str) -> List[str]:
     parts = re.split(r"(?m)^(#{1,6}\s.*$)|^\s*$|^[-*]\s+", text)
     # filter out None and trivial whitespace
     return [p.strip() for p in parts if p and p.strip()]
+
+
+class Block(NamedTuple):
+    """A paragraph, heading, list or code block: text[start:end]."""
+
+    start: int
+    end: int
+    headings: Tuple[str, ...]
+    is_heading: bool
+
+
+def markdown_blocks(text: str) -> List[Block]:
+    """
+    Split markdown into blank-line separated blocks and heading lines, each
+    with the heading path it sits under. Fenced code blocks stay whole.
+    """
+    blocks: List[Block] = []
+    path: Tuple[str, ...] = ()
+    levels: Tuple[int, ...] = ()
+    start: Optional[int] = None
+    fence = ""
+    offset = 0
+    for line in text.splitlines(keepends=True):
+        line_start, offset = offset, offset + len(line)
+        stripped = line.strip()
+        if fence:
+            if stripped.startswith(fence):
+                fence = ""
+            continue
+        match = FENCE_RE.match(line)
+        if match:
+            fence = match.group(1)
+            if start is None:
+                start = line_start
+            continue
+        heading = HEADING_RE.match(line.rstrip("\r\n"))
+        if heading or not stripped:
+            if start is not None:
+                blocks.append(Block(start, line_start, path, False))
+                start = None
+            if heading:
+                level = len(heading.group(1))
+                title = EMPHASIS_RE.sub("", heading.group(2)).strip()
+                # Drop headings at this level or deeper, then nest under the rest
+                depth = sum(1 for outer in levels if outer < level)
+                path = path[:depth] + (title,)
+                levels = levels[:depth] + (level,)
+                blocks.append(Block(line_start, offset, path, True))
+        elif start is None:
+            start = line_start
+    if start is not None:
+        blocks.append(Block(start, offset, path, False))
+    return blocks
+
+
+def chunk_markdown(
+    text: str, max_tokens=300, overlap=40, counter: TokenCounter = TIKTOKEN
+) -> List[Chunk]:
+    """
+    Pack consecutive blocks of a markdown document into chunks of up to
+    max_tokens, each a slice of text. A heading starts a new chunk once the
+    current one is half full, and never ends one; blocks larger than the
+    budget are split into overlapping token windows.
+    """
+    blocks = markdown_blocks(text)
+    texts = [text[block.start : block.end] for block in blocks]
+    bounds = counter.bounds(texts)
+    # Tokens of each block + the separator to the next one (a chunk of blocks
+    # thus takes the sum of their counts - 1)
+    counts = [len(offsets) for offsets in bounds]
+    chunks: List[Chunk] = []
+    current: List[int] = []
+    used = 0
+
+    def flush(keep_headings: bool = False) -> List[int]:
+        carry: List[int] = []
+        while keep_headings and current and blocks[current[-1]].is_heading:
+            carry.insert(0, current.pop())
+        if current:
+            piece = text[blocks[current[0]].start : blocks[current[-1]].end].strip()
+            if piece:
+                size = sum(counts[j] for j in current) - 1
+                chunks.append(Chunk(piece, blocks[current[0]].headings, size))
+        current.clear()
+        return carry
+
+    for i, block in enumerate(blocks):
+        if block.is_heading and used >= max_tokens // 2:
+            flush()
+            used = 0
+        if counts[i] - 1 > max_tokens:
+            flush()
+            used = 0
+            for piece in chunk_bounds(texts[i], bounds[i], max_tokens, overlap):
+                chunks.append(piece._replace(headings=block.headings))
+            continue
+        if used + counts[i] - 1 > max_tokens:
+            current[:] = flush(keep_headings=True)
+            used = sum(counts[j] for j in current)
+            if used + counts[i] - 1 > max_tokens:
+                # No room for the headings: they live on in the heading path
+                flush()
+                used = 0
+        current.append(i)
+        used += counts[i]
+    flush()
+    return chunks
@@ -0,0 +1,188 @@
+"""Exact and near-duplicate chunk detection (MinHash + LSH) before embedding."""
+
+import hashlib
+import itertools
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+# off:   every chunk is embedded
+# exact: chunks equal up to whitespace and case reuse one vector
+# near:  chunks whose estimated word-shingle Jaccard similarity reaches the
+#        threshold reuse one vector (MinHash signatures, LSH buckets)
+DEDUP_MODES = ("off", "exact", "near")
+DEFAULT_DEDUP = "off"
+DEFAULT_DEDUP_THRESHOLD = 0.9
+# Representatives (signature + vector) kept; the least recently matched go first
+DEFAULT_MAX_REPRESENTATIVES = 20_000
+
+SHINGLE_WORDS = 5
+MINHASH_PERMUTATIONS = 64
+# 16 bands of 4 rows: pairs from ~0.5 similarity become candidates, which are
+# then checked against the threshold
+LSH_BANDS = 16
+
+WORD_RE = re.compile(r"\w+")
+_MASK32 = np.uint64(0xFFFFFFFF)
+# Fixed seed: signatures must not change between runs
+_rng = np.random.default_rng(20240601)
+# Multiply-shift hashes h(x) = (a * x + b) >> 32 with odd a, one per permutation
+_A = _rng.integers(1, 1 << 32, size=MINHASH_PERMUTATIONS, dtype=np.uint64) | 1
+_B = _rng.integers(0, 1 << 32, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+# Per-position multipliers combining word hashes into shingle hashes
+_SHINGLE_MULT = _rng.integers(1, 1 << 32, size=SHINGLE_WORDS, dtype=np.uint64) | 1
+
+
+class DedupConfig(NamedTuple):
+    mode: str = DEFAULT_DEDUP
+    threshold: float = DEFAULT_DEDUP_THRESHOLD
+
+
+def dedup_config(
+    mode: str = DEFAULT_DEDUP, threshold: float = DEFAULT_DEDUP_THRESHOLD
+) -> DedupConfig:
+    mode = (mode or DEFAULT_DEDUP).strip().lower()
+    if mode not in DEDUP_MODES:
+        raise ValueError(
+            f"Unknown dedup mode '{mode}' (expected one of {', '.join(DEDUP_MODES)})"
+        )
+    if not 0 < threshold <= 1:
+        raise ValueError(f"Dedup threshold must be in (0, 1], got {threshold}")
+    return DedupConfig(mode, threshold)
+
+
+def dedup_settings(config: DedupConfig) -> Dict:
+    """Manifest settings (duplicates store another chunk's vector)."""
+    if config.mode == "off":
+        return {}
+    if config.mode == "exact":
+        return {"dedup": "exact"}
+    return {"dedup": f"near:{config.threshold:g}"}
+
+
+def exact_key(text: str) -> bytes:
+    """Key of a chunk's text with whitespace collapsed and case folded."""
+    normalized = " ".join(text.split()).casefold()
+    return hashlib.sha256(normalized.encode("utf-8")).digest()
+
+
+def minhash(text: str) -> np.ndarray:
+    """MinHash signature over the text's SHINGLE_WORDS-word shingles."""
+    words = WORD_RE.findall(text.casefold())
+    hashes = np.fromiter(
+        (zlib.crc32(word.encode("utf-8")) for word in words),
+        dtype=np.uint64,
+        count=len(words),
+    )
+    if len(hashes) == 0:
+        hashes = np.array([zlib.crc32(text.strip().encode("utf-8"))], dtype=np.uint64)
+    width = min(SHINGLE_WORDS, len(hashes))
+    n_shingles = len(hashes) - width + 1
+    shingles = np.zeros(n_shingles, dtype=np.uint64)
+    for j in range(width):
+        shingles += hashes[j : j + n_shingles] * _SHINGLE_MULT[j]
+    shingles &= _MASK32
+    permuted = (shingles[:, None] * _A[None, :] + _B[None, :]) >> np.uint64(32)
+    return permuted.min(axis=0).astype(np.uint32)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return float(np.count_nonzero(a == b)) / len(a)
+
+
+class Representative:
+    """The chunk whose vector its duplicates reuse."""
+
+    __slots__ = ("id", "rel", "signature", "keys", "vector")
+
+    def __init__(self, id: int, rel: str, signature: Optional[np.ndarray], keys: List):
+        self.id = id
+        self.rel = rel
+        self.signature = signature
+        self.keys = keys  # bucket keys pointing at this representative
+        self.vector: Optional[np.ndarray] = None  # set once embedded
+
+
+class Duplicates:
+    """
+    Finds chunks that duplicate (exactly or nearly) a chunk seen before in
+    the same run, so they can reuse its vector instead of being embedded.
+    Shared by the chunk and embed workers of one collection.
+    """
+
+    def __init__(
+        self,
+        config: DedupConfig,
+        max_representatives: int = DEFAULT_MAX_REPRESENTATIVES,
+    ):
+        self.config = config
+        self.max_representatives = max(1, max_representatives)
+        self.matched = 0
+        self.reused = 0
+        self._rows = MINHASH_PERMUTATIONS // LSH_BANDS
+        self._buckets: Dict = {}
+        self._representatives: "OrderedDict[int, Representative]" = OrderedDict()
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def check(self, text: str, rel: str) -> Tuple[Representative, bool]:
+        """
+        The representative of text, and whether text just became one (True)
+        or duplicates an earlier chunk (False).
+        """
+        # Bucket keys: the text's hash (exact) or its (band, band hash) pairs (near)
+        keys: List[Any]
+        if self.config.mode == "exact":
+            signature = None
+            keys = [exact_key(text)]
+        else:
+            signature = minhash(text)
+            keys = [
+                (band, signature[band * self._rows : (band + 1) * self._rows].tobytes())
+                for band in range(LSH_BANDS)
+            ]
+        with self._lock:
+            best, best_score = None, 0.0
+            for key in keys:
+                candidate = self._buckets.get(key)
+                if candidate is None or candidate is best:
+                    continue
+                score = (
+                    1.0
+                    if signature is None
+                    else similarity(signature, candidate.signature)
+                )
+                if score >= self.config.threshold and score > best_score:
+                    best, best_score = candidate, score
+            if best is not None:
+                self.matched += 1
+                self._representatives.move_to_end(best.id)
+                return best, False
+
+            representative = Representative(next(self._ids), rel, signature, keys)
+            for key in keys:
+                self._buckets.setdefault(key, representative)
+            self._representatives[representative.id] = representative
+            while len(self._representatives) > self.max_representatives:
+                _, evicted = self._representatives.popitem(last=False)
+                for key in evicted.keys:
+                    if self._buckets.get(key) is evicted:
+                        del self._buckets[key]
+            return representative, True
+
+    def vector(self, representative: Representative) -> Optional[np.ndarray]:
+        """The representative's vector, if it has been embedded yet."""
+        vector = representative.vector
+        if vector is not None:
+            with self._lock:
+                self.reused += 1
+        return vector
+
+
+def duplicates(config: DedupConfig) -> Optional[Duplicates]:
+    return None if config.mode == "off" else Duplicates(config)
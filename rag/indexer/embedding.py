@@ -0,0 +1,357 @@
+"""Cross-file embedding batcher decoupling chunking from model inference."""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+from memory import memory_budget_mb
+from util import current_rss_mb
+
+logger = logging.getLogger("indexer")
+
+DEFAULT_EMBED_BATCH_SIZE = 64
+DEFAULT_MAX_WAIT_MS = 20
+# Batches worth of queued chunks sorted by length before being cut into batches
+# (1: batches keep the arrival order)
+DEFAULT_SORT_WINDOW = 4
+# Length estimate of texts embedded without token counts
+CHARS_PER_TOKEN = 4
+
+# Batch sizes the autotuner probes, smallest first
+AUTOTUNE_CANDIDATES = (16, 32, 64, 128, 256)
+# Full batches timed per candidate during probing
+AUTOTUNE_PROBE_BATCHES = 3
+# A batch slower than this is a latency spike (and ends probing larger sizes)
+DEFAULT_MAX_BATCH_LATENCY_S = 2.0
+# The smallest size within this fraction of the best throughput wins
+AUTOTUNE_TOLERANCE = 0.95
+# Healthy batches after a back-off before stepping back up
+AUTOTUNE_RECOVER_AFTER = 20
+
+
+class BatchAutotuner:
+    """
+    Picks the embedding batch size from measured throughput.
+
+    While probing, the first batches of a run are formed at each candidate
+    size in turn and timed: real work, nothing is embedded twice. Probing
+    stops early once a size is slower than max_latency_s, no faster than the
+    previous one, or memory runs high. The smallest size within
+    AUTOTUNE_TOLERANCE of the best throughput is then kept. Afterwards a
+    batch slower than max_latency_s, or RSS above memory_limit_mb, halves
+    the size (down to the smallest candidate); it steps back up towards the
+    tuned size after AUTOTUNE_RECOVER_AFTER healthy batches.
+    """
+
+    def __init__(
+        self,
+        candidates: Sequence[int] = AUTOTUNE_CANDIDATES,
+        probe_batches: int = AUTOTUNE_PROBE_BATCHES,
+        max_latency_s: float = DEFAULT_MAX_BATCH_LATENCY_S,
+        memory_limit_mb: float = 0.0,
+        rss_mb: Callable[[], float] = current_rss_mb,
+    ):
+        self.candidates = sorted(set(max(1, c) for c in candidates))
+        self.probe_batches = max(1, probe_batches)
+        self.max_latency_s = max_latency_s
+        self.memory_limit_mb = memory_budget_mb(memory_limit_mb)
+        self.rss_mb = rss_mb
+        self.batch_size = self.candidates[0]
+        self.tuned: Optional[int] = None
+        self.back_offs = 0
+        self._throughput: Dict[int, List[float]] = {}
+        self._warmed_up = False
+        self._healthy = 0
+
+    def _memory_high(self) -> bool:
+        return self.memory_limit_mb > 0 and self.rss_mb() > self.memory_limit_mb
+
+    def record(self, size: int, elapsed_s: float) -> None:
+        """Feed back how long a batch of size texts took to embed."""
+        if self.tuned is None:
+            self._probe(size, elapsed_s)
+        elif elapsed_s > self.max_latency_s or self._memory_high():
+            self._healthy = 0
+            index = self.candidates.index(self.batch_size)
+            if index > 0:
+                self.batch_size = self.candidates[index - 1]
+                self.back_offs += 1
+                logger.warning(
+                    f"Embedding batch took {elapsed_s:.2f}s at RSS {self.rss_mb():.0f} MB "
+                    f"- backing off to batch size {self.batch_size}"
+                )
+        elif self.batch_size < self.tuned:
+            self._healthy += 1
+            if self._healthy >= AUTOTUNE_RECOVER_AFTER:
+                self._healthy = 0
+                self.batch_size = self.candidates[
+                    self.candidates.index(self.batch_size) + 1
+                ]
+                logger.info(f"Embedding batch size back up to {self.batch_size}")
+
+    def _probe(self, size: int, elapsed_s: float) -> None:
+        if not self._warmed_up:
+            # The first inference pays for model initialization
+            self._warmed_up = True
+            return
+        if size < self.batch_size:
+            return  # a partial batch (input ran dry) says little about this size
+        samples = self._throughput.setdefault(self.batch_size, [])
+        samples.append(size / max(elapsed_s, 1e-9))
+        too_slow = elapsed_s > self.max_latency_s
+        if len(samples) < self.probe_batches and not too_slow:
+            return
+
+        rates = {s: sum(v) / len(v) for s, v in self._throughput.items()}
+        index = self.candidates.index(self.batch_size)
+        previous = self.candidates[index - 1] if index > 0 else None
+        stalled = previous is not None and rates[self.batch_size] <= rates[previous]
+        last = index == len(self.candidates) - 1
+        if too_slow or self._memory_high():
+            # Never settle on a size that already spiked
+            rates.pop(self.batch_size, None)
+        if too_slow or stalled or last or self._memory_high() or not rates:
+            self._settle(rates)
+        else:
+            self.batch_size = self.candidates[index + 1]
+
+    def _settle(self, rates: Dict[int, float]) -> None:
+        if rates:
+            best = max(rates.values())
+            self.tuned = min(
+                s for s, r in rates.items() if r >= best * AUTOTUNE_TOLERANCE
+            )
+        else:
+            self.tuned = self.candidates[0]
+        self.batch_size = self.tuned
+        summary = ", ".join(f"{s}: {r:.0f}/s" for s, r in sorted(rates.items()))
+        logger.info(
+            f"Embedding batch size tuned to {self.tuned} (chunks/s by size: {summary})"
+        )
+
+
+class _EmbedRequest:
+    """Chunks of one caller waiting for their vectors."""
+
+    def __init__(self, texts: List[str], lengths: Optional[List[int]] = None):
+        self.texts = texts
+        # Tokens of each text, which the batcher sorts by
+        self.lengths = (
+            lengths
+            if lengths is not None
+            else [len(text) // CHARS_PER_TOKEN + 1 for text in texts]
+        )
+        self.vectors: List[Any] = [None] * len(texts)
+        self.scheduled = 0  # texts already handed to a batch
+        self.remaining = len(texts)  # texts still waiting for a vector
+        self.enqueued_at = time.monotonic()
+        self.error: Optional[BaseException] = None
+        self.done = threading.Event()
+
+
+class EmbeddingBatcher:
+    """
+    Collects chunks from many files into fixed-size inference batches.
+
+    Worker threads call embed() exactly like TextEmbedding.embed(); a single
+    inference thread packs their chunks into batches of batch_size, runs the
+    model once per batch and hands each caller back its own vectors. A batch
+    is flushed when it is full or when the oldest waiting chunk has waited
+    max_wait_ms, so a lone small file is never stuck behind an empty queue.
+    With an autotuner, the batch size follows its measurements instead.
+
+    The model pads every text of a batch to the longest one. The batcher
+    therefore waits (up to max_wait_ms) for sort_window batches of queued
+    chunks and sorts them by token count, so each batch holds chunks of
+    similar length; the vectors are handed back in each caller's order.
+    """
+
+    def __init__(
+        self,
+        model,
+        batch_size: int = DEFAULT_EMBED_BATCH_SIZE,
+        max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+        autotuner: Optional[BatchAutotuner] = None,
+        sort_window: int = DEFAULT_SORT_WINDOW,
+    ):
+        self.model = model
+        self.autotuner = autotuner
+        self.batch_size = autotuner.batch_size if autotuner else max(1, batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self.sort_window = max(1, sort_window)
+        self.batches = 0
+        self.texts = 0
+        # Tokens embedded, and tokens incl. padding to each batch's longest
+        self.tokens = 0
+        self.padded_tokens = 0
+        self._pending: Deque[_EmbedRequest] = deque()
+        self._pending_texts = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(
+            target=self._run, name="embedding-batcher", daemon=True
+        )
+        self._thread.start()
+
+    def __enter__(self) -> "EmbeddingBatcher":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def embed(self, texts: List[str], lengths: Optional[List[int]] = None) -> List[Any]:
+        """
+        Embed texts, blocking until every vector is available. lengths are
+        their token counts (e.g. Chunk.tokens), estimated from characters if
+        not given.
+        """
+        if not texts:
+            return []
+        request = _EmbedRequest(list(texts), lengths)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("EmbeddingBatcher is closed")
+            self._pending.append(request)
+            self._pending_texts += len(request.texts)
+            self._cond.notify()
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.vectors
+
+    def close(self) -> None:
+        """Flush outstanding work and stop the inference thread."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        if self.batches:
+            logger.info(
+                f"Embedded {self.texts} chunks in {self.batches} batches "
+                f"(avg {self.texts / self.batches:.1f} per batch, target {self.batch_size}); "
+                f"padding {self.padded_tokens / max(self.tokens, 1) - 1:.0%} of the tokens"
+            )
+        if self.autotuner is not None and self.autotuner.back_offs:
+            logger.info(
+                f"Embedding batch size backed off {self.autotuner.back_offs} times"
+            )
+
+    def _next_batch(self) -> List[Tuple[_EmbedRequest, int, int]]:
+        """
+        Wait until sort_window batches of chunks are queued (or the oldest has
+        waited max_wait_ms) and slice up to that many off the queue.
+        """
+        with self._cond:
+            while True:
+                limit = self.batch_size * self.sort_window
+                if self._pending_texts >= limit:
+                    break
+                if self._pending:
+                    timeout = self._pending[0].enqueued_at + self.max_wait
+                    timeout -= time.monotonic()
+                    if timeout <= 0 or self._closed:
+                        break
+                    self._cond.wait(timeout)
+                elif self._closed:
+                    return []
+                else:
+                    self._cond.wait()
+
+            batch: List[Tuple[_EmbedRequest, int, int]] = []
+            size = 0
+            while self._pending and size < limit:
+                request = self._pending[0]
+                take = min(limit - size, len(request.texts) - request.scheduled)
+                batch.append((request, request.scheduled, take))
+                request.scheduled += take
+                size += take
+                if request.scheduled == len(request.texts):
+                    self._pending.popleft()
+            self._pending_texts -= size
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            window = self._next_batch()
+            if not window:
+                return
+
+            queued = [
+                (request, index)
+                for request, start, count in window
+                for index in range(start, start + count)
+            ]
+            # Longest first: a batch that runs out of memory or time shows early
+            queued.sort(key=lambda item: -item[0].lengths[item[1]])
+            while queued:
+                batch, queued = queued[: self.batch_size], queued[self.batch_size :]
+                batch = [item for item in batch if item[0].error is None]
+                if batch:
+                    self._embed_batch(batch)
+
+    def _embed_batch(self, batch: List[Tuple[_EmbedRequest, int]]) -> None:
+        """Run one inference batch and hand every vector back to its caller."""
+        texts = [request.texts[index] for request, index in batch]
+        started = time.monotonic()
+        try:
+            vectors = list(self.model.embed(texts, batch_size=len(texts)))
+            if len(vectors) != len(texts):
+                raise ValueError(
+                    f"model returned {len(vectors)} vectors for {len(texts)} chunks"
+                )
+        except Exception as e:
+            logger.error(f"Embedding batch of {len(texts)} chunks failed: {e}")
+            self._fail([(request, index, 1) for request, index in batch], e)
+            return
+
+        if self.autotuner is not None:
+            self.autotuner.record(len(texts), time.monotonic() - started)
+            with self._cond:
+                self.batch_size = self.autotuner.batch_size
+        self.batches += 1
+        self.texts += len(texts)
+        lengths = [request.lengths[index] for request, index in batch]
+        self.tokens += sum(lengths)
+        self.padded_tokens += max(lengths) * len(lengths)
+        for (request, index), vector in zip(batch, vectors):
+            request.vectors[index] = vector
+            request.remaining -= 1
+            if request.remaining == 0 and request.error is None:
+                request.done.set()
+
+    def _fail(self, batch: List[Tuple[_EmbedRequest, int, int]], error: Exception):
+        """Fail every request that had chunks in a failed batch."""
+        with self._cond:
+            for request, _, _ in batch:
+                if request.error is not None:
+                    continue
+                request.error = error
+                unscheduled = len(request.texts) - request.scheduled
+                if unscheduled and request in self._pending:
+                    self._pending.remove(request)
+                    self._pending_texts -= unscheduled
+                    request.scheduled = len(request.texts)
+                request.done.set()
+
+
+def find_tokenizer(model, depth: int = 4):
+    """
+    The Hugging Face tokenizer behind a (wrapped) fastembed model, found by
+    following the .model attribute of the wrappers; None if there is none.
+    """
+    try:
+        from tokenizers import Tokenizer
+    except ImportError:
+        return None
+    for _ in range(depth):
+        tokenizer = getattr(model, "tokenizer", None)
+        if isinstance(tokenizer, Tokenizer):
+            return tokenizer
+        model = getattr(model, "model", None)
+        if model is None:
+            return None
+    return None
@@ -0,0 +1,205 @@
+"""Persistent embedding cache keyed by (model, chunk text)."""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger("indexer")
+
+DEFAULT_CACHE_MAX_MB = 1024
+CACHE_FILE_NAME = "embeddings.sqlite3"
+# Evict down to this fraction of the bound so eviction does not run on every insert
+EVICT_TO_FRACTION = 0.9
+# SQLite's default limit on host parameters per statement is 999
+LOOKUP_CHUNK = 500
+
+
+def cache_key(model_name: str, text: str) -> bytes:
+    return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """
+    SQLite store of float32 vectors with least-recently-used eviction.
+
+    Keys are sha256(model name, chunk text), so identical text shared by
+    several repositories or collections is embedded once per model. The cache
+    is bounded by max_mb of vector data; hits refresh an entry's last use.
+    """
+
+    def __init__(self, path: str, max_mb: float = DEFAULT_CACHE_MAX_MB):
+        self.path = path
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key BLOB PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings(last_used)"
+        )
+        self._db.commit()
+        self.size_bytes = self._db.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()[0]
+
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        """Return the cached vectors of keys (misses are absent)."""
+        found: Dict[bytes, np.ndarray] = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            for start in range(0, len(unique), LOOKUP_CHUNK):
+                part = unique[start : start + LOOKUP_CHUNK]
+                rows = self._db.execute(
+                    "SELECT key, vector FROM embeddings WHERE key IN "
+                    f"({','.join('?' * len(part))})",
+                    part,
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+            if found:
+                now = time.time()
+                self._db.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._db.commit()
+        return found
+
+    def put_many(self, items: Dict[bytes, Any]) -> None:
+        """Store vectors, evicting least recently used entries beyond the bound."""
+        if not items:
+            return
+        now = time.time()
+        rows = [
+            (key, np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for key, vector in items.items()
+        ]
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                rows,
+            )
+            self.size_bytes += sum(len(blob) for _, blob, _ in rows)
+            if self.size_bytes > self.max_bytes:
+                self._evict()
+            self._db.commit()
+
+    def record(self, hits: int, misses: int) -> None:
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def _evict(self) -> None:
+        target = int(self.max_bytes * EVICT_TO_FRACTION)
+        # Concurrent inserts of the same text may have over-counted
+        self.size_bytes = self._db.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()[0]
+        cursor = self._db.execute(
+            "SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_used"
+        )
+        victims = []
+        size = self.size_bytes
+        for key, length in cursor.fetchall():
+            if size <= target:
+                break
+            victims.append((key,))
+            size -= length
+        self._db.executemany("DELETE FROM embeddings WHERE key = ?", victims)
+        self.size_bytes = size
+        self.evicted += len(victims)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class CachedEmbedding:
+    """
+    Wraps an embedding model (or EmbeddingBatcher) with an EmbeddingCache.
+
+    embed() serves cached vectors directly and only sends the misses, each
+    distinct text once, to the wrapped model.
+    """
+
+    def __init__(self, model, cache: EmbeddingCache, model_name: str):
+        self.model = model
+        self.cache = cache
+        self.model_name = model_name
+
+    def __enter__(self) -> "CachedEmbedding":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def embed(
+        self, texts: List[str], lengths: Optional[List[int]] = None, **kwargs
+    ) -> List[Any]:
+        if not texts:
+            return []
+        keys = [cache_key(self.model_name, text) for text in texts]
+        found = self.cache.get_many(keys)
+
+        missing: Dict[bytes, int] = {}
+        for i, key in enumerate(keys):
+            if key not in found and key not in missing:
+                missing[key] = i
+        hits = sum(1 for key in keys if key in found)
+        self.cache.record(hits, len(texts) - hits)
+
+        if missing:
+            if lengths is not None:
+                # Token counts of the texts to embed, for the batcher
+                kwargs["lengths"] = [lengths[i] for i in missing.values()]
+            vectors = list(
+                self.model.embed([texts[i] for i in missing.values()], **kwargs)
+            )
+            computed = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(computed)
+            found.update(computed)
+        return [found[key] for key in keys]
+
+    def close(self) -> None:
+        """Close the wrapped model (if closable) and the cache."""
+        close = getattr(self.model, "close", None)
+        if close is not None:
+            close()
+        total = self.cache.hits + self.cache.misses
+        if total:
+            logger.info(
+                f"Embedding cache: {self.cache.hits} hits, {self.cache.misses} misses "
+                f"({100.0 * self.cache.hits / total:.1f}% hit rate), "
+                f"{self.cache.evicted} evicted, {self.cache.size_bytes / 1024 / 1024:.1f} MB"
+            )
+        self.cache.close()
+
+
+def open_cache(state_dir: str, max_mb: float) -> Optional[EmbeddingCache]:
+    """Open the shared cache under state_dir; None (uncached) if it is unusable."""
+    path = os.path.join(state_dir, CACHE_FILE_NAME)
+    try:
+        return EmbeddingCache(path, max_mb)
+    except (OSError, sqlite3.Error) as e:
+        logger.warning(
+            f"Embedding cache at {path} unavailable ({e}) - embedding without cache"
+        )
+        return None
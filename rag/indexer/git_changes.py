@@ -0,0 +1,207 @@
+"""Git-based change detection: which files changed since the last indexed commit."""
+
+import logging
+import subprocess
+from typing import List, NamedTuple, Optional
+
+logger = logging.getLogger("indexer")
+
+GIT_TIMEOUT_S = 60
+HOOKS = ("post-commit", "post-merge")
+
+
+class GitChanges(NamedTuple):
+    """Paths (relative to the indexed directory) git reports as changed."""
+
+    touched: List[str]  # added, modified, renamed-to or untracked files
+    deleted: List[str]  # deleted or renamed-from files
+    dirty: List[str]  # uncommitted working tree changes (re-checked next run)
+    ignored_dirs: List[str]  # git-ignored directories git does not look into
+
+
+def run_git(work_root: str, *args: str) -> Optional[str]:
+    """Run git in work_root; None if git is unavailable or the command fails."""
+    try:
+        result = subprocess.run(
+            ["git", "-C", work_root, *args],
+            capture_output=True,
+            text=True,
+            timeout=GIT_TIMEOUT_S,
+        )
+    except (OSError, subprocess.SubprocessError) as e:
+        logger.debug(f"git {args[0]} failed in {work_root}: {e}")
+        return None
+    if result.returncode != 0:
+        logger.debug(f"git {args[0]} failed in {work_root}: {result.stderr.strip()}")
+        return None
+    return result.stdout
+
+
+def git_head(work_root: str) -> Optional[str]:
+    """Commit checked out in work_root, or None if it is not a git checkout."""
+    out = run_git(work_root, "rev-parse", "--verify", "-q", "HEAD")
+    return out.strip() if out else None
+
+
+def resolve_commit(work_root: str, rev: str) -> Optional[str]:
+    out = run_git(work_root, "rev-parse", "--verify", "-q", f"{rev}^{{commit}}")
+    return out.strip() if out else None
+
+
+def _prefix(work_root: str) -> Optional[str]:
+    """Path of work_root inside its repository ('' at the top level)."""
+    out = run_git(work_root, "rev-parse", "--show-prefix")
+    return None if out is None else out.strip()
+
+
+def _relative(path: str, prefix: str) -> Optional[str]:
+    """Repository-relative path -> work_root-relative path (None if outside)."""
+    if not path.startswith(prefix):
+        return None
+    return path[len(prefix) :]
+
+
+def _parse_name_status(out: str, prefix: str, changes: GitChanges) -> None:
+    """Parse `--name-status -z` output (renames/copies carry two paths)."""
+    tokens = out.split("\0")
+    i = 0
+    while i < len(tokens) and tokens[i]:
+        status = tokens[i]
+        if status[0] in "RC":
+            old, new = tokens[i + 1], tokens[i + 2]
+            i += 3
+            if status[0] == "R":
+                _add(changes.deleted, old, prefix)
+            _add(changes.touched, new, prefix)
+        else:
+            path = tokens[i + 1]
+            i += 2
+            _add(changes.deleted if status[0] == "D" else changes.touched, path, prefix)
+
+
+def _parse_status(out: str, prefix: str, changes: GitChanges) -> None:
+    """Parse `status --porcelain -z` output (a rename entry is followed by its source)."""
+    tokens = out.split("\0")
+    i = 0
+    while i < len(tokens) and tokens[i]:
+        entry = tokens[i]
+        xy, path = entry[:2], entry[3:]
+        i += 1
+        if xy == "!!":
+            if path.endswith("/"):
+                rel = _relative(path.rstrip("/"), prefix)
+                if rel:
+                    changes.ignored_dirs.append(rel)
+            else:
+                _add(changes.touched, path, prefix)
+            continue
+        if "R" in xy or "C" in xy:
+            source = tokens[i]
+            i += 1
+            if "R" in xy:
+                _add(changes.deleted, source, prefix)
+        _add(changes.dirty, path, prefix)
+        _add(changes.deleted if "D" in xy else changes.touched, path, prefix)
+
+
+def _add(paths: List[str], path: str, prefix: str) -> None:
+    rel = _relative(path, prefix)
+    if rel:
+        paths.append(rel)
+
+
+def _status(work_root: str, prefix: str, changes: GitChanges) -> bool:
+    # Ignored files may still match the include globs; ignored directories are
+    # reported once (not file by file) and left to the caller to walk
+    out = run_git(
+        work_root,
+        "status",
+        "--porcelain",
+        "-z",
+        "--untracked-files=all",
+        "--ignored=matching",
+        "--",
+        ".",
+    )
+    if out is None:
+        return False
+    _parse_status(out, prefix, changes)
+    return True
+
+
+def working_tree_changes(work_root: str) -> Optional[GitChanges]:
+    """Uncommitted changes only (used to remember dirty files after a full scan)."""
+    prefix = _prefix(work_root)
+    if prefix is None:
+        return None
+    changes = GitChanges([], [], [], [])
+    return changes if _status(work_root, prefix, changes) else None
+
+
+def changes_since(work_root: str, since: str) -> Optional[GitChanges]:
+    """
+    Files changed between commit `since` and HEAD, plus working tree changes.
+    None if `since` is unknown (e.g. garbage-collected) or git fails - callers
+    then fall back to a full scan.
+    """
+    prefix = _prefix(work_root)
+    if prefix is None or resolve_commit(work_root, since) is None:
+        return None
+    out = run_git(
+        work_root, "diff", "--name-status", "-z", "-M", since, "HEAD", "--", "."
+    )
+    if out is None:
+        return None
+    changes = GitChanges([], [], [], [])
+    _parse_name_status(out, prefix, changes)
+    if not _status(work_root, prefix, changes):
+        return None
+    return changes
+
+
+def hook_changes(work_root: str, hook: str) -> Optional[GitChanges]:
+    """
+    Files touched by the commit a git hook fired for: HEAD for post-commit,
+    ORIG_HEAD..HEAD for post-merge.
+    """
+    prefix = _prefix(work_root)
+    if prefix is None:
+        return None
+    if hook == "post-commit":
+        out = run_git(
+            work_root,
+            "diff-tree",
+            "-r",
+            "--root",
+            "-M",
+            "--no-commit-id",
+            "--name-status",
+            "-z",
+            "HEAD",
+            "--",
+            ".",
+        )
+    elif hook == "post-merge":
+        out = run_git(
+            work_root,
+            "diff",
+            "--name-status",
+            "-z",
+            "-M",
+            "ORIG_HEAD",
+            "HEAD",
+            "--",
+            ".",
+        )
+    else:
+        raise ValueError(f"Unsupported git hook '{hook}' (expected one of {HOOKS})")
+    if out is None:
+        return None
+    changes = GitChanges([], [], [], [])
+    _parse_name_status(out, prefix, changes)
+    return changes
+
+
+def hook_base(work_root: str, hook: str) -> Optional[str]:
+    """Commit the repository was at before the hook's commit or merge."""
+    return resolve_commit(work_root, "HEAD^" if hook == "post-commit" else "ORIG_HEAD")
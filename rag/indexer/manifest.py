@@ -0,0 +1,169 @@
+"""Per-collection index manifest used for incremental re-indexing."""
+
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from util import ScannedFile, write_json_atomic
+
+logger = logging.getLogger("indexer")
+
+MANIFEST_VERSION = 2
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def default_state_dir() -> str:
+    """Directory holding indexer state (manifests); overridable via INDEX_STATE_DIR."""
+    return os.getenv("INDEX_STATE_DIR") or os.path.join(
+        os.path.expanduser("~"), ".cache", "hish", "indexer"
+    )
+
+
+def manifest_path(state_dir: str, collection: str) -> str:
+    return os.path.join(state_dir, f"{collection}.manifest.json")
+
+
+def hash_file(path: str) -> str:
+    """SHA-256 of the file contents, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def new_manifest(work_root: str, settings: Dict) -> Dict:
+    return {
+        "version": MANIFEST_VERSION,
+        "work_root": os.path.abspath(work_root),
+        "settings": settings,
+        "files": {},
+    }
+
+
+def load_manifest(path: str) -> Optional[Dict]:
+    """Load a manifest, returning None if it is missing or unreadable."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            manifest = json.load(fh)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable manifest {path}: {e}")
+        return None
+    if manifest.get("version") != MANIFEST_VERSION:
+        logger.info(f"Ignoring manifest {path} with unsupported version")
+        return None
+    return manifest
+
+
+def save_manifest(path: str, manifest: Dict) -> None:
+    """Atomically write the manifest so a crash never leaves a partial file."""
+    write_json_atomic(path, manifest)
+
+
+def manifest_matches(manifest: Dict, work_root: str, settings: Dict) -> bool:
+    """A manifest is only reusable for the same root and chunking/model settings."""
+    return (
+        manifest.get("work_root") == os.path.abspath(work_root)
+        and manifest.get("settings") == settings
+    )
+
+
+def scan_changes(
+    manifest: Dict,
+    work_root: str,
+    files: Iterable[Union[str, ScannedFile]],
+    scanned: Set[str],
+) -> Iterator[Tuple[str, Dict]]:
+    """
+    Yield (rel, fingerprint) for each new or changed file while the scanned
+    files are consumed, adding every scanned path to scanned. Paths are stat'ed
+    here; ScannedFiles already carry it.
+
+    Size and mtime are checked first; only files whose stat differs are hashed.
+    Files whose content hash still matches just get their stat refreshed.
+    """
+    entries = manifest["files"]
+
+    for item in files:
+        rel = item.rel if isinstance(item, ScannedFile) else item
+        scanned.add(rel)
+        path = os.path.join(work_root, rel)
+        if isinstance(item, ScannedFile):
+            size, mtime_ns = item.size, item.mtime_ns
+        else:
+            try:
+                st = os.stat(path)
+            except OSError as e:
+                logger.warning(f"Could not stat {rel}: {e}")
+                continue
+            size, mtime_ns = st.st_size, st.st_mtime_ns
+
+        entry = entries.get(rel)
+        if entry and entry["size"] == size and entry["mtime_ns"] == mtime_ns:
+            continue
+
+        try:
+            sha256 = hash_file(path)
+        except OSError as e:
+            logger.warning(f"Could not hash {rel}: {e}")
+            continue
+
+        if entry and entry["sha256"] == sha256:
+            entry["size"] = size
+            entry["mtime_ns"] = mtime_ns
+            continue
+
+        yield rel, {"size": size, "mtime_ns": mtime_ns, "sha256": sha256}
+
+
+def removed_files(manifest: Dict, scanned: Set[str]) -> List[str]:
+    """Files in the manifest that a complete scan no longer found."""
+    return [rel for rel in manifest["files"] if rel not in scanned]
+
+
+def plan_changes(
+    manifest: Dict, work_root: str, files: Iterable[Union[str, ScannedFile]]
+) -> Tuple[List[str], List[str], Dict[str, Dict]]:
+    """
+    Compare the scanned files (consumed once, e.g. straight from the scanner)
+    against the manifest (see scan_changes).
+    Returns: (new_or_changed_files, removed_files, fingerprints_of_changed_files)
+    """
+    scanned: Set[str] = set()
+    fingerprints = dict(scan_changes(manifest, work_root, files, scanned))
+    return list(fingerprints), removed_files(manifest, scanned), fingerprints
+
+
+def record_file(manifest: Dict, rel: str, fingerprint: Dict, point_ids: List) -> None:
+    manifest["files"][rel] = {**fingerprint, "point_ids": list(point_ids)}
+
+
+def forget_files(manifest: Dict, files: List[str]) -> List:
+    """Drop entries for files and return the point IDs they owned."""
+    point_ids: List = []
+    for rel in files:
+        entry = manifest["files"].pop(rel, None)
+        if entry:
+            point_ids.extend(entry.get("point_ids", []))
+    return point_ids
+
+
+def superseded_point_ids(manifest: Dict, previous_ids: Dict[str, List]) -> List:
+    """
+    Point IDs that re-indexed files no longer use.
+    Point IDs are stable, so a changed file overwrites its own points in place;
+    only the tail left behind when it now yields fewer chunks must be deleted.
+    Files that failed to re-index still hold their previous IDs and yield nothing.
+    """
+    stale: List = []
+    for rel, old_ids in previous_ids.items():
+        entry = manifest["files"].get(rel)
+        if entry is None:
+            continue
+        current = set(entry["point_ids"])
+        stale.extend(pid for pid in old_ids if pid not in current)
+    return stale
@@ -0,0 +1,96 @@
+"""Memory governor: backpressure on pipeline stages from the process's real RSS."""
+
+import gc
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+from util import current_rss_mb, total_memory_mb
+
+logger = logging.getLogger("indexer")
+
+# Without an explicit budget, use this share of physical memory
+DEFAULT_MEMORY_FRACTION = 0.75
+# Throttling starts above HIGH_WATER and ends below LOW_WATER of the budget
+HIGH_WATER = 0.9
+LOW_WATER = 0.8
+# RSS is read at most this often (reading /proc is cheap, not free)
+DEFAULT_CHECK_INTERVAL_S = 0.25
+# Minimum time between forced collections while under pressure
+COLLECT_INTERVAL_S = 5.0
+
+
+def memory_budget_mb(budget_mb: float = 0.0) -> float:
+    """The budget in MB; 0 means DEFAULT_MEMORY_FRACTION of physical memory."""
+    return budget_mb if budget_mb > 0 else total_memory_mb() * DEFAULT_MEMORY_FRACTION
+
+
+class MemoryGovernor:
+    """
+    Throttles the memory-hungry pipeline stages when RSS nears a budget.
+
+    Stages wrap their work in admit(). While RSS is below HIGH_WATER of the
+    budget this is free: workers run in parallel as configured. Above it,
+    admitted work is serialized (one item at a time per governor), so no new
+    file text or embedding batches pile up while the writer drains the
+    queues; a garbage collection runs once on entering that state. Normal
+    parallelism resumes when RSS falls below LOW_WATER. Work is slowed down,
+    never refused, so a budget that is too small cannot deadlock a run.
+    """
+
+    def __init__(
+        self,
+        budget_mb: float = 0.0,
+        rss_mb: Callable[[], float] = current_rss_mb,
+        check_interval_s: float = DEFAULT_CHECK_INTERVAL_S,
+    ):
+        self.budget_mb = memory_budget_mb(budget_mb)
+        self.rss_mb = rss_mb
+        self.check_interval_s = check_interval_s
+        self.under_pressure = False
+        self.episodes = 0
+        self.throttled = 0
+        self.peak_mb = 0.0
+        self._checked = float("-inf")
+        self._collected = float("-inf")
+        self._state = threading.Lock()
+        self._serial = threading.Lock()
+
+    def pressure(self) -> bool:
+        """True while RSS is (still) too close to the budget."""
+        now = time.monotonic()
+        collect = False
+        with self._state:
+            if now - self._checked >= self.check_interval_s:
+                self._checked = now
+                rss = self.rss_mb()
+                self.peak_mb = max(self.peak_mb, rss)
+                if not self.under_pressure and rss > self.budget_mb * HIGH_WATER:
+                    self.under_pressure = True
+                    self.episodes += 1
+                    logger.warning(
+                        f"RSS {rss:.0f} MB is near the memory budget "
+                        f"({self.budget_mb:.0f} MB) - throttling read and embed"
+                    )
+                    if now - self._collected >= COLLECT_INTERVAL_S:
+                        self._collected = now
+                        collect = True
+                elif self.under_pressure and rss < self.budget_mb * LOW_WATER:
+                    self.under_pressure = False
+                    logger.info(f"RSS down to {rss:.0f} MB - throttling lifted")
+            under_pressure = self.under_pressure
+        if collect:
+            gc.collect()
+        return under_pressure
+
+    @contextmanager
+    def admit(self) -> Iterator[None]:
+        """Run the enclosed work, one item at a time while under pressure."""
+        if not self.pressure():
+            yield
+            return
+        with self._serial:
+            self.throttled += 1
+            yield
@@ -0,0 +1,118 @@
+"""Point payload schemas: the legacy full layout and compact alternatives."""
+
+import base64
+import hashlib
+import os
+import zlib
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from util import read_text
+
+# full:       content + document (header + chunk) and raw_content (chunk)
+# compact:    the chunk once, under text_field
+# compressed: the chunk once, zlib + base64 under "text_zlib"
+# offsets:    no text; start/end offsets into the source file, read on demand
+PAYLOAD_MODES = ("full", "compact", "compressed", "offsets")
+DEFAULT_PAYLOAD_MODE = "full"
+# mcp-server-qdrant reads "document"; the LlamaIndex server reads "content"
+DEFAULT_TEXT_FIELD = "document"
+
+
+class PayloadFormat(NamedTuple):
+    mode: str = DEFAULT_PAYLOAD_MODE
+    text_field: str = DEFAULT_TEXT_FIELD
+
+
+def payload_format(
+    mode: str = DEFAULT_PAYLOAD_MODE, text_field: str = DEFAULT_TEXT_FIELD
+) -> PayloadFormat:
+    mode = (mode or DEFAULT_PAYLOAD_MODE).strip().lower()
+    if mode not in PAYLOAD_MODES:
+        raise ValueError(
+            f"Unknown payload mode '{mode}' (expected one of {', '.join(PAYLOAD_MODES)})"
+        )
+    return PayloadFormat(mode, text_field or DEFAULT_TEXT_FIELD)
+
+
+def context_header(payload: Dict) -> str:
+    """The header full payloads prepend to each chunk (derived from metadata)."""
+    return (
+        f"[repo: {payload['repo']}] [file: {payload['path']}] "
+        f"[ext: {payload['ext']}] [title: {payload['title']}]\n---\n"
+    )
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def locate_pieces(text: str, pieces: List[str]) -> List[Optional[Tuple[int, int]]]:
+    """(start, end) character offsets of each piece in text, in order (None if not found)."""
+    spans: List[Optional[Tuple[int, int]]] = []
+    cursor = 0
+    for piece in pieces:
+        start = text.find(piece, cursor)
+        if start < 0:
+            start = text.find(piece)
+        if start < 0:
+            spans.append(None)
+            continue
+        spans.append((start, start + len(piece)))
+        # Overlapping chunks start before the previous one ends
+        cursor = start + 1
+    return spans
+
+
+def build_payload(
+    meta: Dict,
+    chunk: str,
+    fmt: PayloadFormat,
+    span: Optional[Tuple[int, int]] = None,
+) -> Dict:
+    """The payload of one chunk: meta (path, repo, ext, title, ...) plus its text."""
+    payload = dict(meta)
+    if fmt.mode == "full":
+        enhanced_chunk = context_header(payload) + chunk
+        payload["content"] = enhanced_chunk  # LlamaIndex expects 'content' field
+        payload["document"] = enhanced_chunk  # Alternative field for other MCPs
+        payload["raw_content"] = chunk  # Original chunk without context header
+        return payload
+
+    if fmt.mode == "offsets" and span is not None:
+        payload["schema"] = "offsets"
+        payload["start"], payload["end"] = span
+        payload["text_hash"] = text_hash(chunk)
+    elif fmt.mode == "compressed":
+        payload["schema"] = "compressed"
+        payload["text_zlib"] = base64.b64encode(
+            zlib.compress(chunk.encode("utf-8"))
+        ).decode("ascii")
+    else:
+        # compact, or offsets for a chunk that is not a verbatim slice of the file
+        payload["schema"] = "compact"
+        payload["text_field"] = fmt.text_field
+        payload[fmt.text_field] = chunk
+    return payload
+
+
+def payload_text(payload: Dict, work_root: Optional[str] = None) -> str:
+    """
+    The chunk text of a payload in any schema. Offset payloads are read from
+    the file below work_root; ValueError if it changed since it was indexed.
+    """
+    schema = payload.get("schema", "full")
+    if schema == "full":
+        return payload["raw_content"]
+    if schema == "compact":
+        return payload[payload["text_field"]]
+    if schema == "compressed":
+        return zlib.decompress(base64.b64decode(payload["text_zlib"])).decode("utf-8")
+    if schema == "offsets":
+        if work_root is None:
+            raise ValueError("work_root is needed to read offset payloads")
+        text = read_text(os.path.join(work_root, payload["path"]))
+        chunk = text[payload["start"] : payload["end"]]
+        if text_hash(chunk) != payload["text_hash"]:
+            raise ValueError(f"{payload['path']} changed since it was indexed")
+        return chunk
+    raise ValueError(f"Unknown payload schema '{schema}'")
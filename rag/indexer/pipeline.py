@@ -0,0 +1,201 @@
+"""Staged producer/consumer pipeline with bounded queues between stages."""
+
+import logging
+import queue
+import threading
+from typing import Any, Callable, Iterable, List, NamedTuple, Optional
+
+logger = logging.getLogger("indexer")
+
+DEFAULT_QUEUE_SIZE = 64
+POLL_INTERVAL_S = 0.1
+
+_END = object()
+
+
+class Budget:
+    """
+    Caps a shared quantity (e.g. points held by files in flight).
+
+    acquire(n) blocks while n more would exceed the limit. An amount larger
+    than the whole limit is let through once nothing else is held, so a
+    single oversized item cannot deadlock the pipeline. Once abort (the
+    event passed to run_pipeline) is set, waiting holders give up instead.
+    """
+
+    def __init__(self, limit: int, abort: Optional[threading.Event] = None):
+        self.limit = max(1, limit)
+        self.used = 0
+        self.peak = 0
+        self.abort = abort
+        self._cond = threading.Condition()
+
+    def acquire(self, amount: int) -> bool:
+        """Take amount; False if the pipeline was aborted while waiting."""
+        with self._cond:
+            while self.used and self.used + amount > self.limit:
+                if self.abort is not None and self.abort.is_set():
+                    return False
+                self._cond.wait(POLL_INTERVAL_S)
+            self.used += amount
+            self.peak = max(self.peak, self.used)
+            return True
+
+    def release(self, amount: int) -> None:
+        with self._cond:
+            self.used -= amount
+            self._cond.notify_all()
+
+
+class Stage(NamedTuple):
+    """A pipeline stage: fn maps an item to the next item (None drops it)."""
+
+    name: str
+    fn: Callable[[Any], Any]
+    workers: int = 1
+
+
+def run_pipeline(
+    source: Iterable[Any],
+    stages: List[Stage],
+    sink: Callable[[Any], None],
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+    on_error: Optional[Callable[[Any, Exception], None]] = None,
+    max_in_flight: int = 0,
+    abort: Optional[threading.Event] = None,
+) -> None:
+    """
+    Run items from source through stages into sink.
+
+    The source is consumed by its own thread, every stage runs its own pool of
+    worker threads, and sink runs in the calling thread. Each hop goes through
+    a queue bounded by queue_size, so a slow stage applies backpressure
+    upstream and the number of items in flight stays capped. max_in_flight
+    (if set) caps the items between source and sink across all stages; the
+    source is only pulled from when an item has left the pipeline.
+
+    An exception raised by a stage function only drops that item (reported via
+    on_error). Errors in the source or sink abort the whole pipeline and are
+    re-raised here. abort (if given) is set when the pipeline aborts, so
+    stages blocked on something else, such as a Budget, can give up too.
+    """
+    queues: List[queue.Queue] = [
+        queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)
+    ]
+    consumers = [max(1, stage.workers) for stage in stages] + [1]
+    abort = abort or threading.Event()
+    failures: List[BaseException] = []
+    slots = threading.Semaphore(max_in_flight) if max_in_flight > 0 else None
+
+    def done() -> None:
+        if slots is not None:
+            slots.release()
+
+    def admit() -> bool:
+        if slots is None:
+            return True
+        while not abort.is_set():
+            if slots.acquire(timeout=POLL_INTERVAL_S):
+                return True
+        return False
+
+    def put(q: queue.Queue, item: Any) -> bool:
+        while not abort.is_set():
+            try:
+                q.put(item, timeout=POLL_INTERVAL_S)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(q: queue.Queue) -> Any:
+        while not abort.is_set():
+            try:
+                return q.get(timeout=POLL_INTERVAL_S)
+            except queue.Empty:
+                continue
+        return _END
+
+    def finish(index: int) -> None:
+        for _ in range(consumers[index]):
+            if not put(queues[index], _END):
+                return
+
+    def produce() -> None:
+        try:
+            iterator = iter(source)
+            while admit():
+                item = next(iterator, _END)
+                if item is _END:
+                    done()
+                    break
+                if not put(queues[0], item):
+                    return
+            else:
+                return
+        except Exception as e:
+            failures.append(e)
+            abort.set()
+            return
+        finish(0)
+
+    def work(index: int, stage: Stage, remaining: List[int], lock: threading.Lock):
+        while True:
+            item = get(queues[index])
+            if item is _END:
+                break
+            try:
+                result = stage.fn(item)
+            except Exception as e:
+                done()
+                if on_error is not None:
+                    on_error(item, e)
+                else:
+                    logger.error(f"Stage '{stage.name}' failed: {e}")
+                continue
+            if result is None:
+                done()
+            elif not put(queues[index + 1], result):
+                return
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            finish(index + 1)
+
+    threads = [threading.Thread(target=produce, name="scan", daemon=True)]
+    for index, stage in enumerate(stages):
+        remaining = [consumers[index]]
+        lock = threading.Lock()
+        for n in range(consumers[index]):
+            threads.append(
+                threading.Thread(
+                    target=work,
+                    args=(index, stage, remaining, lock),
+                    name=f"{stage.name}-{n}",
+                    daemon=True,
+                )
+            )
+    for thread in threads:
+        thread.start()
+
+    try:
+        while True:
+            item = get(queues[-1])
+            if item is _END:
+                break
+            try:
+                sink(item)
+            finally:
+                done()
+    except BaseException:
+        abort.set()
+        raise
+    finally:
+        if failures:
+            abort.set()
+        for thread in threads:
+            thread.join()
+
+    if failures:
+        raise failures[0]
@@ -1,6 +1,6 @@
 """Test configuration and fixtures."""
 
-from unittest.mock import Mock
+from unittest.mock import AsyncMock, Mock
 
 import pytest
 
@@ -53,6 +53,14 @@ class TestClass:
 '''
 
 
+@pytest.fixture(autouse=True)
+def isolated_state_dir(tmp_path, monkeypatch):
+    """Keep indexer state (manifests) out of the user's cache directory."""
+    state_dir = tmp_path / "indexer-state"
+    monkeypatch.setenv("INDEX_STATE_DIR", str(state_dir))
+    return state_dir
+
+
 @pytest.fixture
 def sample_files():
     """Sample files for testing file processing."""
@@ -68,19 +76,42 @@ def sample_files():
 def mock_qdrant_client():
     """Mock Qdrant client for testing."""
     client = Mock()
-    client.get_collection.side_effect = Exception("Collection not found")
-    client.recreate_collection.return_value = None
-    client.upsert.return_value = None
+    client.collection_exists.return_value = False
+    client.create_collection.return_value = None
+    # An existing collection without manifest is recovered from its points
+    client.scroll.return_value = ([], None)
+    # Points are written through the async client (see writer.PointWriter)
+    client.upsert = AsyncMock(return_value=None)
+    client.close = AsyncMock(return_value=None)
     return client
 
 
+@pytest.fixture
+def word_tokenizer():
+    """
+    A Hugging Face tokenizer with one token per word, [CLS]/[SEP] around
+    the text and a model maximum of 8 tokens (6 of them content).
+    """
+    from tokenizers import Tokenizer, models, pre_tokenizers, processors
+
+    tokenizer = Tokenizer(
+        models.WordLevel({"[UNK]": 0, "[CLS]": 1, "[SEP]": 2}, unk_token="[UNK]")
+    )
+    tokenizer.pre_tokenizer = pre_tokenizers.WhitespaceSplit()
+    tokenizer.post_processor = processors.TemplateProcessing(
+        single="[CLS] $A [SEP]", special_tokens=[("[CLS]", 1), ("[SEP]", 2)]
+    )
+    tokenizer.enable_truncation(8)
+    return tokenizer
+
+
 @pytest.fixture
 def mock_text_embedding():
     """Mock text embedding model."""
     model = Mock()
     # Return consistent embeddings for testing
 
-    def mock_embed(texts):
+    def mock_embed(texts, **kwargs):
         return [[0.1] * EXPECTED_EMBEDDING_DIMENSION for _ in texts]
 
     model.embed.side_effect = mock_embed
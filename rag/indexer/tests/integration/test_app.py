@@ -1,12 +1,34 @@
 """Integration tests for app.py."""
 
+import shutil
+import subprocess
 import tempfile
+import threading
+import time
 from pathlib import Path
+from types import SimpleNamespace
 from unittest.mock import Mock, patch
 
 import pytest
-
-from app import embedder, ensure_collection, guess_dim, index_repo, main
+from qdrant_client.http.models import Datatype
+
+from app import (
+    IndexTarget,
+    embedder,
+    ensure_collection,
+    ensure_model_suffix,
+    guess_dim,
+    has_resumable_rebuild,
+    index_repo,
+    index_targets,
+    interleave,
+    main,
+    point_id,
+    watch_repo,
+)
+from manifest import default_state_dir, load_manifest, manifest_path
+from payload import payload_text
+from quantization import quantization
 from tests.conftest import (
     CHUNK_MAX_TOKENS_TEST,
     CHUNK_MIN_CHARS_TEST,
@@ -25,11 +47,10 @@ class TestEnsureCollection:
     @pytest.mark.integration
     def test_ensure_collection_exists(self, mock_qdrant_client):
         """Test when collection already exists."""
-        # Reset the side_effect and set return_value to mock successful collection response
-        mock_qdrant_client.get_collection.side_effect = None
-        # Mock a collection info object that has vectors_count attribute
+        # Collection exists: its info is read, nothing is created
+        mock_qdrant_client.collection_exists.return_value = True
         mock_collection_info = Mock()
-        mock_collection_info.vectors_count = 100
+        mock_collection_info.points_count = 100
         mock_qdrant_client.get_collection.return_value = mock_collection_info
 
         # Should not raise exception
@@ -41,12 +62,12 @@ class TestEnsureCollection:
         )
 
         mock_qdrant_client.get_collection.assert_called_once_with(TEST_COLLECTION_NAME)
-        mock_qdrant_client.recreate_collection.assert_not_called()
+        mock_qdrant_client.create_collection.assert_not_called()
 
     @pytest.mark.integration
     def test_ensure_collection_create_new(self, mock_qdrant_client):
         """Test creating new collection when it doesn't exist."""
-        mock_qdrant_client.get_collection.side_effect = Exception("Not found")
+        mock_qdrant_client.collection_exists.return_value = False
 
         ensure_collection(
             mock_qdrant_client,
@@ -55,8 +76,97 @@ class TestEnsureCollection:
             TEST_MODEL_NAME,
         )
 
-        mock_qdrant_client.get_collection.assert_called_once_with(TEST_COLLECTION_NAME)
-        mock_qdrant_client.recreate_collection.assert_called_once()
+        mock_qdrant_client.collection_exists.assert_called_once_with(
+            TEST_COLLECTION_NAME
+        )
+        mock_qdrant_client.get_collection.assert_not_called()
+        mock_qdrant_client.create_collection.assert_called_once()
+
+    @pytest.mark.integration
+    def test_errors_on_existing_collection_do_not_recreate_it(self, mock_qdrant_client):
+        """Only a missing collection is created; other failures propagate."""
+        mock_qdrant_client.collection_exists.return_value = True
+        mock_qdrant_client.get_collection.side_effect = RuntimeError("timed out")
+
+        with pytest.raises(RuntimeError):
+            ensure_collection(
+                mock_qdrant_client,
+                TEST_COLLECTION_NAME,
+                EXPECTED_EMBEDDING_DIMENSION,
+                TEST_MODEL_NAME,
+            )
+        mock_qdrant_client.create_collection.assert_not_called()
+        mock_qdrant_client.delete_collection.assert_not_called()
+
+    @pytest.mark.integration
+    def test_ensure_collection_quantization(self, mock_qdrant_client):
+        """New collections get the configured datatype and quantized copy."""
+        mock_qdrant_client.collection_exists.return_value = False
+
+        ensure_collection(
+            mock_qdrant_client,
+            TEST_COLLECTION_NAME,
+            EXPECTED_EMBEDDING_DIMENSION,
+            TEST_MODEL_NAME,
+            quantization("binary"),
+        )
+        kwargs = mock_qdrant_client.create_collection.call_args.kwargs
+        assert kwargs["quantization_config"].binary.always_ram is True
+        assert kwargs["vectors_config"][TEST_MODEL_NAME].datatype is None
+
+        ensure_collection(
+            mock_qdrant_client,
+            TEST_COLLECTION_NAME,
+            EXPECTED_EMBEDDING_DIMENSION,
+            TEST_MODEL_NAME,
+            quantization("float16"),
+        )
+        kwargs = mock_qdrant_client.create_collection.call_args.kwargs
+        assert kwargs["quantization_config"] is None
+        assert kwargs["vectors_config"][TEST_MODEL_NAME].datatype == Datatype.FLOAT16
+
+    @pytest.mark.integration
+    def test_existing_collection_is_requantized_in_place(self, mock_qdrant_client):
+        """A changed mode updates the existing collection instead of rebuilding it."""
+        mock_qdrant_client.collection_exists.return_value = True
+        mock_collection_info = Mock()
+        mock_collection_info.config.quantization_config = None
+        mock_qdrant_client.get_collection.return_value = mock_collection_info
+
+        created = ensure_collection(
+            mock_qdrant_client,
+            TEST_COLLECTION_NAME,
+            EXPECTED_EMBEDDING_DIMENSION,
+            TEST_MODEL_NAME,
+            quantization("scalar"),
+        )
+
+        assert not created
+        mock_qdrant_client.create_collection.assert_not_called()
+        update = mock_qdrant_client.update_collection.call_args.kwargs
+        assert update["collection_name"] == TEST_COLLECTION_NAME
+        assert update["quantization_config"].scalar.always_ram is True
+
+    @pytest.mark.integration
+    def test_failed_requantization_keeps_the_collection(self, mock_qdrant_client):
+        """A rejected quantization update is logged; nothing is rebuilt."""
+        mock_qdrant_client.collection_exists.return_value = True
+        mock_collection_info = Mock()
+        mock_collection_info.config.quantization_config = None
+        mock_qdrant_client.get_collection.return_value = mock_collection_info
+        mock_qdrant_client.update_collection.side_effect = Exception("bad request")
+
+        created = ensure_collection(
+            mock_qdrant_client,
+            TEST_COLLECTION_NAME,
+            EXPECTED_EMBEDDING_DIMENSION,
+            TEST_MODEL_NAME,
+            quantization("scalar"),
+        )
+
+        assert not created
+        mock_qdrant_client.create_collection.assert_not_called()
+        mock_qdrant_client.delete_collection.assert_not_called()
 
 
 class TestEmbedder:
@@ -64,14 +174,13 @@ class TestEmbedder:
 
     @pytest.mark.integration
     @patch("app.TextEmbedding")
-    @patch("app.torch")
-    def test_embedder_initialization(self, mock_torch, mock_text_embedding):
+    @patch("onnxruntime.get_available_providers")
+    def test_embedder_initialization(self, mock_providers, mock_text_embedding):
         """Test embedder model initialization."""
         model_name = TEST_MODEL_NAME
         mock_model = Mock()
         mock_text_embedding.return_value = mock_model
-        mock_torch.cuda.is_available.return_value = True
-        mock_torch.cuda.get_device_name.return_value = "Test GPU"
+        mock_providers.return_value = ["CUDAExecutionProvider", "CPUExecutionProvider"]
 
         result = embedder(model_name)
 
@@ -80,6 +189,19 @@ class TestEmbedder:
         )
         assert result == mock_model
 
+    @pytest.mark.integration
+    @patch("app.TextEmbedding")
+    @patch("onnxruntime.get_available_providers")
+    def test_embedder_uses_cpu_without_cuda_provider(
+        self, mock_providers, mock_text_embedding
+    ):
+        """Without onnxruntime-gpu the model runs on the CPU."""
+        mock_providers.return_value = ["CPUExecutionProvider"]
+
+        embedder(TEST_MODEL_NAME)
+
+        mock_text_embedding.assert_called_once_with(model_name=TEST_MODEL_NAME)
+
 
 class TestGuessDim:
     """Test the guess_dim function."""
@@ -107,6 +229,7 @@ class TestIndexRepo:
             with (
                 patch("app.embedder", return_value=mock_text_embedding),
                 patch("app.QdrantClient", return_value=mock_qdrant_client),
+                patch("app.AsyncQdrantClient", return_value=mock_qdrant_client),
             ):
                 index_repo(
                     work_root=tmpdir,
@@ -122,7 +245,7 @@ class TestIndexRepo:
                 )
 
                 # Verify collection was ensured
-                mock_qdrant_client.get_collection.assert_called()
+                mock_qdrant_client.collection_exists.assert_called()
 
                 # Verify embedding was called
                 mock_text_embedding.embed.assert_called()
@@ -137,6 +260,7 @@ class TestIndexRepo:
             with (
                 patch("app.embedder", return_value=mock_text_embedding),
                 patch("app.QdrantClient", return_value=mock_qdrant_client),
+                patch("app.AsyncQdrantClient", return_value=mock_qdrant_client),
             ):
                 index_repo(
                     work_root=tmpdir,
@@ -152,7 +276,7 @@ class TestIndexRepo:
                 )
 
                 # Should still ensure collection
-                mock_qdrant_client.get_collection.assert_called()
+                mock_qdrant_client.collection_exists.assert_called()
 
                 # Should not call embed or upsert for empty directory
                 mock_text_embedding.embed.assert_not_called()
@@ -170,6 +294,7 @@ class TestIndexRepo:
             with (
                 patch("app.embedder", return_value=mock_text_embedding),
                 patch("app.QdrantClient", return_value=mock_qdrant_client),
+                patch("app.AsyncQdrantClient", return_value=mock_qdrant_client),
             ):
                 index_repo(
                     work_root=tmpdir,
@@ -199,6 +324,7 @@ class TestIndexRepo:
             with (
                 patch("app.embedder", return_value=mock_text_embedding),
                 patch("app.QdrantClient", return_value=mock_qdrant_client),
+                patch("app.AsyncQdrantClient", return_value=mock_qdrant_client),
             ):
                 index_repo(
                     work_root=tmpdir,
@@ -217,6 +343,497 @@ class TestIndexRepo:
                 assert mock_qdrant_client.upsert.call_count >= 1
 
 
+class TestIncrementalIndexRepo:
+    """Test manifest-driven incremental indexing."""
+
+    def _run(self, tmpdir, client, model, **kwargs):
+        with (
+            patch("app.embedder", return_value=model),
+            patch("app.QdrantClient", return_value=client),
+            patch("app.AsyncQdrantClient", return_value=client),
+        ):
+            index_repo(
+                work_root=tmpdir,
+                qdrant_url="http://localhost:6333",
+                api_key="",
+                collection=TEST_COLLECTION_NAME,
+                model_name="test-model",
+                includes="*.md",
+                excludes="",
+                chunk_max_tokens=CHUNK_MAX_TOKENS_TEST,
+                chunk_min_chars=CHUNK_MIN_CHARS_TEST,
+                chunk_overlap=CHUNK_OVERLAP_TOKENS_TEST,
+                **kwargs,
+            )
+
+    @pytest.mark.integration
+    def test_second_run_only_indexes_changes(
+        self, mock_qdrant_client, mock_text_embedding
+    ):
+        """Unchanged files are skipped, edited and removed files are cleaned up."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            (Path(tmpdir) / "a.md").write_text(SAMPLE_MARKDOWN_TEXT)
+            (Path(tmpdir) / "b.md").write_text(SAMPLE_MARKDOWN_TEXT)
+            self._run(tmpdir, mock_qdrant_client, mock_text_embedding)
+            first_upserts = mock_qdrant_client.upsert.call_count
+            assert first_upserts >= 1
+
+            # Collection now exists; nothing changed -> no embedding, no upsert
+            mock_qdrant_client.collection_exists.return_value = True
+            mock_text_embedding.embed.reset_mock()
+            self._run(tmpdir, mock_qdrant_client, mock_text_embedding)
+            mock_text_embedding.embed.assert_not_called()
+            assert mock_qdrant_client.upsert.call_count == first_upserts
+            mock_qdrant_client.delete.assert_not_called()
+            mock_qdrant_client.delete_collection.assert_not_called()
+
+            # Edit one file, remove the other
+            (Path(tmpdir) / "a.md").write_text(SAMPLE_MARKDOWN_TEXT + "\nMore text.")
+            (Path(tmpdir) / "b.md").unlink()
+            self._run(tmpdir, mock_qdrant_client, mock_text_embedding)
+            mock_qdrant_client.delete.assert_called_once()
+            assert mock_qdrant_client.upsert.call_count > first_upserts
+
+    @pytest.mark.integration
+    def test_existing_collection_without_manifest_is_recovered(
+        self, mock_qdrant_client, mock_text_embedding
+    ):
+        """A lost manifest is rebuilt from the stored points, not by dropping them."""
+        mock_qdrant_client.collection_exists.return_value = True
+
+        def scroll(collection_name, **kwargs):
+            stored = [
+                SimpleNamespace(
+                    id=point_id(collection_name, rel, 0), payload={"path": rel}
+                )
+                for rel in ("a.md", "gone.md")
+            ]
+            return stored, None
+
+        mock_qdrant_client.scroll.side_effect = scroll
+        with tempfile.TemporaryDirectory() as tmpdir:
+            (Path(tmpdir) / "a.md").write_text(SAMPLE_MARKDOWN_TEXT)
+            self._run(tmpdir, mock_qdrant_client, mock_text_embedding)
+
+        collection = mock_qdrant_client.scroll.call_args.kwargs["collection_name"]
+        mock_qdrant_client.delete_collection.assert_not_called()
+        mock_qdrant_client.upsert.assert_called()
+        deleted = [
+            point
+            for call in mock_qdrant_client.delete.call_args_list
+            for point in call.kwargs["points_selector"].points
+        ]
+        assert point_id(collection, "gone.md", 0) in deleted
+        assert point_id(collection, "a.md", 0) not in deleted
+
+    @pytest.mark.integration
+    def test_foreign_points_without_manifest_require_recreate(
+        self, mock_qdrant_client, mock_text_embedding
+    ):
+        """Points the indexer did not write are neither attributed nor dropped."""
+        mock_qdrant_client.collection_exists.return_value = True
+        stored = [SimpleNamespace(id=1, payload={"path": "a.md"})]
+        mock_qdrant_client.scroll.return_value = (stored, None)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            (Path(tmpdir) / "a.md").write_text(SAMPLE_MARKDOWN_TEXT)
+            with pytest.raises(RuntimeError, match="--recreate"):
+                self._run(tmpdir, mock_qdrant_client, mock_text_embedding)
+
+        mock_qdrant_client.delete_collection.assert_not_called()
+        mock_qdrant_client.upsert.assert_not_called()
+
+    @pytest.mark.integration
+    def test_files_are_indexed_while_the_tree_is_scanned(
+        self, mock_qdrant_client, mock_text_embedding
+    ):
+        """The pipeline consumes the scan; it does not wait for the full listing."""
+        import util
+
+        embedded = threading.Event()
+        embed = mock_text_embedding.embed.side_effect
+
+        def signal_embed(texts, **kwargs):
+            embedded.set()
+            return embed(texts, **kwargs)
+
+        mock_text_embedding.embed.side_effect = signal_embed
+        seen_before_last = []
+
+        def slow_scan(*args, **kwargs):
+            found = list(util.scan_tree(*args, **kwargs))
+            yield from found[:-1]
+            # The last file is only listed once the first ones were embedded
+            seen_before_last.append(embedded.wait(timeout=10))
+            yield found[-1]
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for name in ("a.md", "b.md", "c.md"):
+                (Path(tmpdir) / name).write_text(SAMPLE_MARKDOWN_TEXT + name)
+            with patch("app.scan_tree", side_effect=slow_scan):
+                self._run(tmpdir, mock_qdrant_client, mock_text_embedding)
+
+            assert seen_before_last == [True]
+            manifest = load_manifest(
+                manifest_path(
+                    default_state_dir(),
+                    ensure_model_suffix(TEST_COLLECTION_NAME, "test-model"),
+                )
+            )
+            assert sorted(manifest["files"]) == ["a.md", "b.md", "c.md"]
+
+    @pytest.mark.integration
+    def test_new_collection_ignores_old_manifest(
+        self, mock_qdrant_client, mock_text_embedding
+    ):
+        """A collection dropped outside the indexer is fully re-indexed."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            (Path(tmpdir) / "a.md").write_text(SAMPLE_MARKDOWN_TEXT)
+            self._run(tmpdir, mock_qdrant_client, mock_text_embedding)
+            first_upserts = mock_qdrant_client.upsert.call_count
+
+            # Still missing on the next run: its manifest must not be trusted
+            self._run(tmpdir, mock_qdrant_client, mock_text_embedding)
+            assert mock_qdrant_client.upsert.call_count > first_upserts
+            assert mock_qdrant_client.create_collection.call_count == 2
+
+    @pytest.mark.integration
+    def test_full_rebuild_reuses_cached_embeddings(
+        self, mock_qdrant_client, mock_text_embedding
+    ):
+        """A non-incremental rebuild of unchanged text runs no inference."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            (Path(tmpdir) / "a.md").write_text(SAMPLE_MARKDOWN_TEXT)
+            self._run(tmpdir, mock_qdrant_client, mock_text_embedding)
+            mock_text_embedding.embed.assert_called()
+
+            mock_text_embedding.embed.reset_mock()
+            self._run(
+                tmpdir, mock_qdrant_client, mock_text_embedding, incremental=False
+            )
+            mock_text_embedding.embed.assert_not_called()
+
+            self._run(
+                tmpdir,
+                mock_qdrant_client,
+                mock_text_embedding,
+                incremental=False,
+                embed_cache=False,
+            )
+            mock_text_embedding.embed.assert_called()
+
+    @pytest.mark.integration
+    def test_payload_mode_change_rebuilds(
+        self, mock_qdrant_client, mock_text_embedding
+    ):
+        """Switching to offset payloads needs --recreate; their text resolves from source."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            (Path(tmpdir) / "a.md").write_text(SAMPLE_MARKDOWN_TEXT)
+            self._run(tmpdir, mock_qdrant_client, mock_text_embedding)
+            mock_qdrant_client.collection_exists.return_value = True
+            mock_qdrant_client.upsert.reset_mock()
+
+            with pytest.raises(RuntimeError, match="--recreate"):
+                self._run(
+                    tmpdir,
+                    mock_qdrant_client,
+                    mock_text_embedding,
+                    payload_mode="offsets",
+                )
+            mock_qdrant_client.delete_collection.assert_not_called()
+
+            self._run(
+                tmpdir,
+                mock_qdrant_client,
+                mock_text_embedding,
+                payload_mode="offsets",
+                incremental=False,
+            )
+
+            mock_qdrant_client.delete_collection.assert_called_once()
+            points = [
+                point
+                for call in mock_qdrant_client.upsert.call_args_list
+                for point in call.kwargs["points"]
+            ]
+            assert points
+            for point in points:
+                assert point.payload["schema"] == "offsets"
+                assert "content" not in point.payload
+                text = payload_text(point.payload, tmpdir)
+                assert text and text in SAMPLE_MARKDOWN_TEXT
+
+
+class TestCheckpointedIndexRepo:
+    """Test checkpoints and resuming interrupted rebuilds."""
+
+    @pytest.mark.integration
+    def test_interrupted_rebuild_resumes_from_checkpoint(
+        self, mock_qdrant_client, mock_text_embedding
+    ):
+        """A resumed rebuild keeps the collection and skips checkpointed files."""
+        run = TestIncrementalIndexRepo()._run
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for i in range(3):
+                (Path(tmpdir) / f"a{i}.md").write_text(
+                    SAMPLE_MARKDOWN_TEXT.replace("Some content", f"File {i} content")
+                )
+
+            with patch("app.finish_target", side_effect=RuntimeError("killed")):
+                with pytest.raises(RuntimeError):
+                    run(
+                        tmpdir,
+                        mock_qdrant_client,
+                        mock_text_embedding,
+                        incremental=False,
+                        embed_cache=False,
+                        repo_chunk_size=1,
+                    )
+            assert has_resumable_rebuild(TEST_COLLECTION_NAME, "test-model")
+
+            mock_qdrant_client.collection_exists.return_value = True
+            mock_text_embedding.embed.reset_mock()
+            run(
+                tmpdir,
+                mock_qdrant_client,
+                mock_text_embedding,
+                incremental=False,
+                embed_cache=False,
+                resume=True,
+            )
+
+            # Only files committed after the last checkpoint are embedded again
+            redone = {
+                text.split()[1]
+                for call in mock_text_embedding.embed.call_args_list
+                for text in call.args[0]
+                if text.startswith("File ")
+            }
+            assert len(redone) <= 1
+            mock_qdrant_client.delete_collection.assert_not_called()
+            assert not has_resumable_rebuild(TEST_COLLECTION_NAME, "test-model")
+
+
+class TestGitAwareIndexRepo:
+    """Test git-driven change detection in index_repo."""
+
+    @staticmethod
+    def git(repo, *args):
+        subprocess.run(["git", "-C", repo, *args], check=True, capture_output=True)
+
+    @pytest.mark.integration
+    @pytest.mark.skipif(shutil.which("git") is None, reason="git not installed")
+    def test_second_run_uses_git_instead_of_scanning(
+        self, mock_qdrant_client, mock_text_embedding
+    ):
+        """After the first run only files from git diff/status are looked at."""
+        with tempfile.TemporaryDirectory() as repo:
+            self.git(repo, "init", "-q")
+            self.git(repo, "config", "user.email", "indexer@example.com")
+            self.git(repo, "config", "user.name", "Indexer Tests")
+            (Path(repo) / "a.md").write_text(SAMPLE_MARKDOWN_TEXT)
+            (Path(repo) / "b.md").write_text(SAMPLE_MARKDOWN_TEXT + " b")
+            self.git(repo, "add", "-A")
+            self.git(repo, "commit", "-q", "-m", "docs")
+
+            run = TestIncrementalIndexRepo()._run
+            run(repo, mock_qdrant_client, mock_text_embedding)
+            manifest = load_manifest(
+                manifest_path(
+                    default_state_dir(),
+                    ensure_model_suffix(TEST_COLLECTION_NAME, "test-model"),
+                )
+            )
+            assert manifest["git_commit"]
+
+            self.git(repo, "mv", "b.md", "c.md")
+            self.git(repo, "commit", "-q", "-m", "rename")
+            mock_qdrant_client.collection_exists.return_value = True
+            with patch("app.scan_tree") as scan_tree:
+                run(repo, mock_qdrant_client, mock_text_embedding)
+            scan_tree.assert_not_called()
+
+            manifest = load_manifest(
+                manifest_path(
+                    default_state_dir(),
+                    ensure_model_suffix(TEST_COLLECTION_NAME, "test-model"),
+                )
+            )
+            assert sorted(manifest["files"]) == ["a.md", "c.md"]
+            mock_qdrant_client.delete.assert_called_once()
+
+
+class TestIndexTargets:
+    """Test single-process indexing of several repositories."""
+
+    @pytest.mark.integration
+    def test_targets_share_one_model_and_are_interleaved(
+        self, mock_qdrant_client, mock_text_embedding
+    ):
+        """The model is loaded once and every collection gets its files."""
+        with (
+            tempfile.TemporaryDirectory() as first,
+            tempfile.TemporaryDirectory() as second,
+        ):
+            for i in range(3):
+                (Path(first) / f"a{i}.md").write_text(SAMPLE_MARKDOWN_TEXT + f" {i}")
+            (Path(second) / "b.md").write_text(SAMPLE_MARKDOWN_TEXT + " b")
+
+            with (
+                patch("app.embedder", return_value=mock_text_embedding) as embedder,
+                patch("app.QdrantClient", return_value=mock_qdrant_client),
+                patch("app.AsyncQdrantClient", return_value=mock_qdrant_client),
+            ):
+                results = index_targets(
+                    [(first, "first"), (second, "second")],
+                    qdrant_url="http://localhost:6333",
+                    api_key="",
+                    model_name="test-model",
+                    includes="*.md",
+                    excludes="",
+                    chunk_max_tokens=CHUNK_MAX_TOKENS_TEST,
+                    chunk_min_chars=CHUNK_MIN_CHARS_TEST,
+                    chunk_overlap=CHUNK_OVERLAP_TOKENS_TEST,
+                )
+
+            embedder.assert_called_once()
+            assert results["first_unknown"][0] == 3
+            assert results["second_unknown"][0] == 1
+            upserted = {
+                call.kwargs["collection_name"]
+                for call in mock_qdrant_client.upsert.call_args_list
+            }
+            assert upserted == {"first_unknown", "second_unknown"}
+
+    @pytest.mark.integration
+    def test_up_to_date_targets_are_reported(
+        self, mock_qdrant_client, mock_text_embedding
+    ):
+        """Targets without work still get a (0, 0) result."""
+        with (
+            tempfile.TemporaryDirectory() as first,
+            tempfile.TemporaryDirectory() as second,
+        ):
+            (Path(first) / "a.md").write_text(SAMPLE_MARKDOWN_TEXT)
+
+            with (
+                patch("app.embedder", return_value=mock_text_embedding),
+                patch("app.QdrantClient", return_value=mock_qdrant_client),
+                patch("app.AsyncQdrantClient", return_value=mock_qdrant_client),
+            ):
+                results = index_targets(
+                    [(first, "first"), (second, "second")],
+                    qdrant_url="http://localhost:6333",
+                    api_key="",
+                    model_name="test-model",
+                    includes="*.md",
+                    excludes="",
+                    chunk_max_tokens=CHUNK_MAX_TOKENS_TEST,
+                    chunk_min_chars=CHUNK_MIN_CHARS_TEST,
+                    chunk_overlap=CHUNK_OVERLAP_TOKENS_TEST,
+                )
+
+            assert results["first_unknown"][0] == 1
+            assert results["second_unknown"] == (0, 0)
+
+    @pytest.mark.unit
+    def test_interleave_is_round_robin(self):
+        """Files of all targets alternate until the smaller ones run out."""
+        big, small = IndexTarget("/big", "big"), IndexTarget("/small", "small")
+        big.files = ["1", "2", "3"]
+        small.files = ["x"]
+
+        order = [
+            (work.target.collection, work.rel) for work in interleave([big, small])
+        ]
+
+        assert order == [("big", "1"), ("small", "x"), ("big", "2"), ("big", "3")]
+
+    @pytest.mark.unit
+    def test_interleave_passes_scanned_sizes(self):
+        """Work items carry the size the scan found, if any."""
+        target = IndexTarget("/repo", "repo")
+        target.files = ["a", "b"]
+        target.fingerprints = {"a": {"size": 42, "mtime_ns": 1, "sha256": "x"}}
+
+        sizes = [(work.rel, work.size) for work in interleave([target])]
+
+        assert sizes == [("a", 42), ("b", None)]
+
+
+class TestWatchRepo:
+    """Test the long-running watch mode."""
+
+    @staticmethod
+    def wait_for(condition, timeout=10.0):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            assert time.monotonic() < deadline, "timed out waiting for the watcher"
+            time.sleep(0.05)
+
+    @pytest.mark.integration
+    def test_edits_are_reindexed_with_the_model_kept_loaded(
+        self, mock_qdrant_client, mock_text_embedding
+    ):
+        """After catching up, only edited files are embedded again."""
+        stop = threading.Event()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            (Path(tmpdir) / "a.md").write_text(SAMPLE_MARKDOWN_TEXT)
+            (Path(tmpdir) / "b.md").write_text(
+                SAMPLE_MARKDOWN_TEXT.replace("More content", "Other content")
+            )
+            with (
+                patch("app.embedder", return_value=mock_text_embedding) as embedder,
+                patch("app.QdrantClient", return_value=mock_qdrant_client),
+                patch("app.AsyncQdrantClient", return_value=mock_qdrant_client),
+            ):
+                thread = threading.Thread(
+                    target=watch_repo,
+                    kwargs=dict(
+                        work_root=tmpdir,
+                        qdrant_url="http://localhost:6333",
+                        api_key="",
+                        collection=TEST_COLLECTION_NAME,
+                        model_name="test-model",
+                        includes="*.md",
+                        excludes="",
+                        chunk_max_tokens=CHUNK_MAX_TOKENS_TEST,
+                        chunk_min_chars=CHUNK_MIN_CHARS_TEST,
+                        chunk_overlap=CHUNK_OVERLAP_TOKENS_TEST,
+                        embed_cache=False,
+                        debounce_ms=50,
+                        poll_interval_s=0.05,
+                        stop=stop,
+                    ),
+                )
+                thread.start()
+                try:
+                    self.wait_for(lambda: mock_qdrant_client.upsert.call_count >= 1)
+                    upserts = mock_qdrant_client.upsert.call_count
+                    mock_text_embedding.embed.reset_mock()
+
+                    (Path(tmpdir) / "a.md").write_text(
+                        SAMPLE_MARKDOWN_TEXT.replace("Some content", "Edited content")
+                    )
+                    self.wait_for(
+                        lambda: mock_qdrant_client.upsert.call_count > upserts
+                    )
+                    (Path(tmpdir) / "b.md").unlink()
+                    self.wait_for(lambda: mock_qdrant_client.delete.call_count >= 1)
+                finally:
+                    stop.set()
+                    thread.join(timeout=10)
+
+            assert not thread.is_alive()
+            embedder.assert_called_once()
+            embedded = [
+                text
+                for call in mock_text_embedding.embed.call_args_list
+                for text in call.args[0]
+            ]
+            assert any("Edited content" in text for text in embedded)
+            assert not any("Other content" in text for text in embedded)
+
+
 class TestMain:
     """Test the main function."""
 
@@ -261,17 +878,12 @@ class TestMain:
         }
         mock_getenv.side_effect = lambda key, default="": env_vars.get(key, default)
 
-        with patch("sys.argv", ["app.py", "--recreate"]), patch("app.index_repo"):
+        with (
+            patch("sys.argv", ["app.py", "--recreate"]),
+            patch("app.index_repo") as mock_index_repo,
+        ):
             main()
 
-            # Should recreate collection with named vector config for MCP compatibility
-            from qdrant_client.http.models import Distance, VectorParams
-
-            expected_vectors_config = {
-                TEST_MODEL_NAME: VectorParams(
-                    size=EXPECTED_EMBEDDING_DIMENSION, distance=Distance.COSINE
-                )
-            }
-            mock_client.recreate_collection.assert_called_once_with(
-                TEST_COLLECTION_NAME, vectors_config=expected_vectors_config
-            )
+            # The non-incremental run drops and recreates the collection itself
+            mock_client.recreate_collection.assert_not_called()
+            assert mock_index_repo.call_args.kwargs["incremental"] is False
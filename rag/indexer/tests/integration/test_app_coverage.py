@@ -7,18 +7,21 @@ particularly around file processing, error handling, and command-line functional
 
 import os
 import tempfile
-from unittest.mock import Mock, patch
+from unittest.mock import AsyncMock, Mock, patch
 
 import pytest
 
 from app import (
+    IndexTarget,
     ensure_model_suffix,
     get_model_suffix,
     get_optimal_model,
     is_code_collection,
     main,
-    process_files_in_chunks,
+    read_file,
+    run_targets,
 )
+from memory import MemoryGovernor
 from tests.conftest import (
     EXPECTED_EMBEDDING_DIMENSION,
     SAMPLE_MARKDOWN_TEXT,
@@ -26,15 +29,18 @@ from tests.conftest import (
     TEST_COLLECTION_NAME,
     TEST_MODEL_NAME,
 )
+from writer import PointWriter
 
 
-class TestProcessFilesInChunks:
-    """Test the process_files_in_chunks function for large repository handling."""
+class TestRunTargets:
+    """Test the shared indexing pipeline used for repositories of any size."""
 
     @pytest.fixture
     def mock_setup(self):
         """Set up mocks for file processing tests."""
         mock_client = Mock()
+        mock_client.upsert = AsyncMock(return_value=None)
+        mock_client.close = AsyncMock(return_value=None)
         mock_model = Mock()
         mock_model.embed.return_value = [[0.1] * EXPECTED_EMBEDDING_DIMENSION]
 
@@ -62,146 +68,118 @@ class TestProcessFilesInChunks:
             "files": files,
         }
 
+    def run(self, setup, files, batch_size, upsert_retries=3, **kwargs):
+        """Index files through run_targets with a PointWriter on the mock client."""
+        target = IndexTarget(setup["temp_dir"], TEST_COLLECTION_NAME)
+        target.files = files
+        target.manifest = {"files": {}}
+        target.fingerprints = {
+            rel: {"size": 1, "mtime_ns": 1, "sha256": rel} for rel in files
+        }
+        run_targets(
+            [target],
+            setup["model"],
+            lambda target: PointWriter(
+                setup["client"],
+                target.collection,
+                batch_size,
+                on_commit=target.commit,
+                max_retries=upsert_retries,
+            ),
+            chunk_max_tokens=100,
+            chunk_min_chars=50,
+            chunk_overlap=20,
+            model_name=TEST_MODEL_NAME,
+            max_file_size_mb=1,
+            max_workers=1,
+            read_workers=kwargs.pop("read_workers", 2),
+            embed_workers=1,
+            queue_size=4,
+            **kwargs,
+        )
+        return target
+
     @pytest.mark.integration
-    def test_process_files_in_chunks_basic(self, mock_setup):
-        """Test basic file processing in chunks."""
+    def test_run_targets_basic(self, mock_setup):
+        """Every file is read once and its points are upserted."""
         setup = mock_setup
 
-        with patch("app.process_single_file") as mock_process_single:
-            # Mock return: (filename, points, file_size)
-            mock_process_single.return_value = (
-                "test.py",
-                [Mock(id=1, vector=[0.1] * EXPECTED_EMBEDDING_DIMENSION)],
-                1024,
-            )
-
-            total_files, total_chunks = process_files_in_chunks(
-                files_to_process=setup["files"],
-                work_root=setup["temp_dir"],
-                model=setup["model"],
-                chunk_max_tokens=100,
-                chunk_min_chars=50,
-                chunk_overlap=20,
-                optimal_model=TEST_MODEL_NAME,
-                max_file_size_mb=1,
-                collection=TEST_COLLECTION_NAME,
-                client=setup["client"],
-                batch_size=2,
-                repo_chunk_size=2,
-                memory_cleanup_interval=2,
-                max_workers=1,
-            )
+        with patch("app.read_file", wraps=read_file) as mock_read_file:
+            target = self.run(setup, setup["files"], batch_size=2)
 
-            assert total_files == len(setup["files"])
-            assert total_chunks >= 0
-            assert mock_process_single.call_count == len(setup["files"])
+            assert target.total_files == len(setup["files"])
+            assert mock_read_file.call_count == len(setup["files"])
             setup["client"].upsert.assert_called()
 
     @pytest.mark.integration
-    def test_process_files_in_chunks_large_repo(self, mock_setup):
-        """Test chunked processing for large repositories."""
+    def test_run_targets_large_repo_under_memory_pressure(self, mock_setup):
+        """Above the memory budget the run is throttled, not stopped."""
         setup = mock_setup
-
-        # Create many more files to trigger chunking
-        large_file_list = setup["files"] * 10  # 30 files total
-
-        with patch("app.process_single_file") as mock_process_single:
-            mock_process_single.return_value = (
-                "test.py",
-                [Mock(id=1, vector=[0.1] * EXPECTED_EMBEDDING_DIMENSION)],
-                2048,
+        large_file_list = [
+            f"copy{i}_{rel}" for i in range(10) for rel in setup["files"]
+        ]
+        for rel in large_file_list:
+            original = os.path.join(setup["temp_dir"], rel.split("_", 1)[1])
+            with open(original) as src:
+                with open(os.path.join(setup["temp_dir"], rel), "w") as dst:
+                    dst.write(src.read())
+        governor = MemoryGovernor(100, rss_mb=lambda: 95, check_interval_s=0)
+
+        with patch("app.read_file", wraps=read_file) as mock_read_file:
+            target = self.run(
+                setup, large_file_list, batch_size=5, governor=governor, read_workers=4
             )
 
-            total_files, total_chunks = process_files_in_chunks(
-                files_to_process=large_file_list,
-                work_root=setup["temp_dir"],
-                model=setup["model"],
-                chunk_max_tokens=100,
-                chunk_min_chars=50,
-                chunk_overlap=20,
-                optimal_model=TEST_MODEL_NAME,
-                max_file_size_mb=1,
-                collection=TEST_COLLECTION_NAME,
-                client=setup["client"],
-                batch_size=5,
-                repo_chunk_size=3,  # Small chunks to test chunking logic
-                memory_cleanup_interval=5,
-                max_workers=1,
-            )
-
-            assert total_files == len(large_file_list)
-            assert mock_process_single.call_count == len(large_file_list)
+            assert target.total_files == len(large_file_list)
+            assert mock_read_file.call_count == len(large_file_list)
+            assert governor.episodes == 1
+            assert governor.throttled >= len(large_file_list)
             # Should have multiple upsert calls due to batching
             assert setup["client"].upsert.call_count >= 2
 
     @pytest.mark.integration
-    def test_process_files_in_chunks_error_handling(self, mock_setup):
+    def test_run_targets_error_handling(self, mock_setup):
         """Test error handling in file processing."""
         setup = mock_setup
 
-        with patch("app.process_single_file") as mock_process_single:
+        with patch("app.read_file") as mock_read_file:
             # First file succeeds, second fails, third succeeds
-            mock_process_single.side_effect = [
-                ("test1.py", [Mock(id=1)], 1024),
+            mock_read_file.side_effect = [
+                SAMPLE_PYTHON_CODE,
                 Exception("Processing failed"),
-                ("test3.py", [Mock(id=3)], 512),
+                SAMPLE_MARKDOWN_TEXT,
             ]
 
             # Should not raise exception, should continue processing
-            total_files, total_chunks = process_files_in_chunks(
-                files_to_process=setup["files"],
-                work_root=setup["temp_dir"],
-                model=setup["model"],
-                chunk_max_tokens=100,
-                chunk_min_chars=50,
-                chunk_overlap=20,
-                optimal_model=TEST_MODEL_NAME,
-                max_file_size_mb=1,
-                collection=TEST_COLLECTION_NAME,
-                client=setup["client"],
-                batch_size=10,
-                repo_chunk_size=10,
-                memory_cleanup_interval=10,
-                max_workers=1,
-            )
+            target = self.run(setup, setup["files"], batch_size=10, read_workers=1)
 
             # Should process successful files despite errors
-            assert total_files >= 2
-            assert mock_process_single.call_count == 3
+            assert target.total_files == 2
+            assert mock_read_file.call_count == 3
 
     @pytest.mark.integration
-    def test_process_files_in_chunks_upsert_error(self, mock_setup):
-        """Test handling of Qdrant upsert errors."""
+    def test_run_targets_upsert_error(self, mock_setup):
+        """A failed upsert is logged and its file left uncommitted."""
         setup = mock_setup
         setup["client"].upsert.side_effect = Exception("Qdrant connection failed")
 
-        with patch("app.process_single_file") as mock_process_single:
-            mock_process_single.return_value = (
-                "test.py",
-                [Mock(id=1, vector=[0.1] * EXPECTED_EMBEDDING_DIMENSION)],
-                1024,
-            )
+        # Should not raise exception, should log error and continue
+        target = self.run(setup, setup["files"][:1], batch_size=1, upsert_retries=0)
 
-            # Should not raise exception, should log error and continue
-            total_files, total_chunks = process_files_in_chunks(
-                files_to_process=setup["files"][:1],  # Just one file
-                work_root=setup["temp_dir"],
-                model=setup["model"],
-                chunk_max_tokens=100,
-                chunk_min_chars=50,
-                chunk_overlap=20,
-                optimal_model=TEST_MODEL_NAME,
-                max_file_size_mb=1,
-                collection=TEST_COLLECTION_NAME,
-                client=setup["client"],
-                batch_size=1,  # Force immediate upsert
-                repo_chunk_size=10,
-                memory_cleanup_interval=10,
-                max_workers=1,
-            )
+        assert target.total_files == 1
+        assert target.manifest["files"] == {}
+        setup["client"].upsert.assert_called()
 
-            assert total_files == 1
-            setup["client"].upsert.assert_called()
+    @pytest.mark.integration
+    def test_run_targets_records_committed_files(self, mock_setup):
+        """Only files whose batch was upserted are recorded in the manifest."""
+        setup = mock_setup
+
+        target = self.run(setup, setup["files"], batch_size=100)
+
+        assert set(target.manifest["files"]) == set(setup["files"])
+        # The short file produced no chunks but is still recorded
+        assert target.manifest["files"]["test3.py"]["point_ids"] == []
 
 
 class TestModelHelperFunctions:
@@ -364,8 +342,7 @@ class TestMainFunctionCoverage:
                 "BATCH_SIZE": "128",
                 "MAX_FILE_SIZE_MB": "10",
                 "REPO_CHUNK_SIZE": "200",
-                "REPO_SIZE_THRESHOLD_MB": "100",
-                "MEMORY_CLEANUP_INTERVAL": "100",
+                "MEMORY_BUDGET_MB": "1024",
             }.get(key, default)
 
             main()
@@ -386,8 +363,7 @@ class TestMainFunctionCoverage:
             assert call_args[1]["batch_size"] == 128
             assert call_args[1]["max_file_size_mb"] == 10.0
             assert call_args[1]["repo_chunk_size"] == 200
-            assert call_args[1]["repo_size_threshold_mb"] == 100.0
-            assert call_args[1]["memory_cleanup_interval"] == 100
+            assert call_args[1]["memory_budget_mb"] == 1024.0
 
 
 class TestErrorHandlingAndEdgeCases:
@@ -429,9 +405,9 @@ class TestErrorHandlingAndEdgeCases:
 
         mock_client = Mock()
 
-        # Test when get_collection succeeds (collection exists)
+        mock_client.collection_exists.return_value = True
         mock_collection_info = Mock()
-        mock_collection_info.vectors_count = 100
+        mock_collection_info.points_count = 100
         mock_client.get_collection.return_value = mock_collection_info
 
         # Should NOT recreate collection if it already exists
@@ -443,4 +419,4 @@ class TestErrorHandlingAndEdgeCases:
         )
 
         mock_client.get_collection.assert_called_once_with(TEST_COLLECTION_NAME)
-        mock_client.recreate_collection.assert_not_called()
+        mock_client.create_collection.assert_not_called()
@@ -9,16 +9,32 @@ import os
 import tempfile
 from unittest.mock import Mock, patch
 
+import numpy as np
 import pytest
 
 from app import (
+    DEFAULT_GRPC_PORT,
+    FileWork,
+    IndexTarget,
+    as_matrix,
+    build_points,
+    chunk_sizing,
+    connect,
+    embed_pieces,
     ensure_model_suffix,
     get_model_suffix,
     get_optimal_model,
     guess_dim,
+    index_settings,
     is_code_collection,
-    process_single_file,
+    model_tokenizer,
+    normalize_vectors,
+    point_id,
+    run_work_pipeline,
+    split_text,
 )
+from dedup import Duplicates, dedup_config
+from payload import PayloadFormat
 from tests.conftest import (
     EXPECTED_EMBEDDING_DIMENSION,
     SAMPLE_MARKDOWN_TEXT,
@@ -201,8 +217,214 @@ class TestCollectionHelpers:
         assert get_optimal_model("any_collection", None) == TEST_MODEL_NAME
 
 
-class TestProcessSingleFileUnit:
-    """Unit tests for process_single_file function."""
+class TestIndexSettings:
+    """Test the settings a manifest is tied to."""
+
+    @pytest.mark.unit
+    def test_default_chunking_is_recorded(self):
+        """Manifests without the chunker setting (older runs) no longer match."""
+        settings = index_settings(TEST_MODEL_NAME, 400, 50, 50, PayloadFormat())
+
+        assert settings["markdown_chunker"] == "sections"
+        assert settings["chunk_tokenizer"] == "model"
+        assert "payload" not in settings
+
+
+class TestPointId:
+    """Test content-addressed point IDs."""
+
+    @pytest.mark.unit
+    def test_point_id_is_stable_uuid(self):
+        """The same chunk always maps to the same UUID."""
+        first = point_id(TEST_COLLECTION_NAME, "docs/a.md", 0)
+
+        assert first == point_id(TEST_COLLECTION_NAME, "docs/a.md", 0)
+        assert len(first) == 36 and first.count("-") == 4
+
+    @pytest.mark.unit
+    def test_point_id_differs_per_collection_path_and_ordinal(self):
+        """Collection, path and ordinal all take part in the ID."""
+        ids = {
+            point_id(TEST_COLLECTION_NAME, "docs/a.md", 0),
+            point_id(TEST_COLLECTION_NAME, "docs/a.md", 1),
+            point_id(TEST_COLLECTION_NAME, "docs/b.md", 0),
+            point_id("other_collection", "docs/a.md", 0),
+        }
+
+        assert len(ids) == 4
+
+
+class TestVectors:
+    """Test that embeddings stay float32 matrices until they become points."""
+
+    @pytest.mark.unit
+    def test_rows_become_one_contiguous_float32_matrix(self):
+        """Model rows are copied once; float32 matrices are passed through."""
+        rows = [np.ones(4, dtype=np.float64), [0.0, 1.0, 2.0, 3.0]]
+        matrix = as_matrix(rows)
+
+        assert matrix.dtype == np.float32
+        assert matrix.flags.c_contiguous
+        assert matrix.shape == (2, 4)
+        assert as_matrix(matrix) is matrix
+        assert as_matrix([]).shape == (0, 0)
+
+    @pytest.mark.unit
+    def test_normalize_in_place(self):
+        """Vectors are scaled to unit length inside the same matrix."""
+        matrix = np.array([[3.0, 4.0], [0.0, 0.0]], dtype=np.float32)
+        normalized = normalize_vectors(matrix)
+
+        assert normalized is matrix
+        np.testing.assert_allclose(normalized, [[0.6, 0.8], [0.0, 0.0]])
+
+    @pytest.mark.unit
+    def test_unit_vectors_are_left_untouched(self):
+        """Output of models that already normalize is not rewritten."""
+        matrix = np.array([[0.6, 0.8], [1.0, 0.0]], dtype=np.float32)
+        # Writing to a read-only matrix would raise
+        matrix.flags.writeable = False
+
+        assert normalize_vectors(matrix) is matrix
+
+    @pytest.mark.unit
+    def test_read_only_vectors_are_copied(self):
+        """Cached vectors (read-only buffers) are normalized in a copy."""
+        row = np.frombuffer(
+            np.array([3.0, 4.0], dtype=np.float32).tobytes(), np.float32
+        )
+        normalized = normalize_vectors(row[np.newaxis, :])
+
+        assert normalized is not row
+        np.testing.assert_allclose(normalized, [[0.6, 0.8]])
+
+    @pytest.mark.unit
+    def test_points_carry_plain_float_vectors(self):
+        """build_points hands the client Python floats, not numpy scalars."""
+        matrix = normalize_vectors([[3.0, 4.0]])
+        (point,) = build_points(
+            "a.md", ["text"], matrix, TEST_MODEL_NAME, TEST_COLLECTION_NAME
+        )
+
+        vector = point.vector[TEST_MODEL_NAME]
+        assert type(vector[0]) is float
+        assert vector == pytest.approx([0.6, 0.8])
+
+    @pytest.mark.unit
+    def test_duplicates_reuse_the_representative_vector(self):
+        """Only new chunks are embedded; duplicates point at their first file."""
+        model = Mock()
+        model.embed.side_effect = lambda texts: [[3.0, 4.0] for _ in texts]
+        dups = Duplicates(dedup_config("exact"))
+        pieces = ["Licensed under MIT.", "Other text."]
+
+        first = embed_pieces(
+            model, pieces, [dups.check(p, "a.md") for p in pieces], dups
+        )
+        matches = [dups.check(p, "b.md") for p in pieces + ["New text."]]
+        second = embed_pieces(model, pieces + ["New text."], matches, dups)
+        points = build_points(
+            "b.md",
+            pieces + ["New text."],
+            second,
+            TEST_MODEL_NAME,
+            TEST_COLLECTION_NAME,
+            duplicate_of=[None if is_new else rep.rel for rep, is_new in matches],
+        )
+
+        assert model.embed.call_args_list[1].args[0] == ["New text."]
+        np.testing.assert_allclose(second, [[0.6, 0.8]] * 3)
+        np.testing.assert_allclose(first, second[:2])
+        assert [p.payload.get("duplicate_of") for p in points] == ["a.md", "a.md", None]
+
+        third = embed_pieces(
+            model, pieces, [dups.check(p, "c.md") for p in pieces], dups
+        )
+        assert model.embed.call_count == 2  # every vector reused
+        assert third.dtype == np.float32
+        np.testing.assert_allclose(third, first)
+
+
+class TestSplitText:
+    """Test how files are split into chunks."""
+
+    @pytest.mark.unit
+    def test_markdown_sections_record_their_heading_path(self):
+        """Markdown chunks carry heading_path; other files do not."""
+        chunks = split_text("guide.md", SAMPLE_MARKDOWN_TEXT, 300, 50, 40)
+        points = build_points(
+            "guide.md",
+            [chunk.text for chunk in chunks],
+            normalize_vectors([[1.0, 0.0]] * len(chunks)),
+            TEST_MODEL_NAME,
+            TEST_COLLECTION_NAME,
+            headings=[chunk.headings for chunk in chunks],
+        )
+
+        assert len(chunks) == 1
+        assert points[0].payload["heading_path"] == ["Test Document"]
+        assert "List item 2" in points[0].payload["raw_content"]
+        assert all(
+            c.headings == ()
+            for c in split_text("a.py", SAMPLE_PYTHON_CODE, 300, 50, 40)
+        )
+
+    @pytest.mark.unit
+    def test_fragments_chunker_keeps_the_old_split(self):
+        """The fragments chunker splits on every heading and drops short pieces."""
+        chunks = split_text("guide.md", SAMPLE_MARKDOWN_TEXT, 300, 40, 40, "fragments")
+
+        assert [c.text for c in chunks] == [
+            "This is a test document with multiple sections.",
+            "Some content in the first section with enough text to create meaningful chunks.",
+            "More content in the second section that should be processed correctly.",
+        ]
+
+    @pytest.mark.unit
+    def test_chunks_are_sized_in_model_tokens(self, word_tokenizer):
+        """The model's tokenizer is found through the wrappers and caps chunks."""
+        wrapped = Mock(spec=["model"])
+        wrapped.model = Mock(spec=["model"])
+        wrapped.model.model = Mock(spec=["tokenizer"])
+        wrapped.model.model.tokenizer = word_tokenizer
+        tokenizer = model_tokenizer(wrapped)
+        text = "\n".join(" ".join(f"w{i}" for i in range(5)) for _ in range(8))
+
+        counter, max_tokens = chunk_sizing(tokenizer, "model", 512)
+        chunks = split_text("a.py", text, max_tokens, 1, 2, counter=counter)
+
+        assert (counter, max_tokens) == (tokenizer, 6)
+        assert all(n <= 6 for n in tokenizer.count([c.text for c in chunks]))
+        assert chunk_sizing(tokenizer, "tiktoken", 512)[1] == 512
+        assert chunk_sizing(None, "model", 512)[1] == 512
+        assert model_tokenizer(Mock()) is None
+
+
+class TestConnect:
+    """Test Qdrant client construction."""
+
+    @pytest.mark.unit
+    def test_connect_passes_transport_options(self):
+        """gRPC preference and port reach the sync and async clients."""
+        with (
+            patch("app.QdrantClient") as sync_client,
+            patch("app.AsyncQdrantClient") as async_client,
+        ):
+            connect("http://localhost:6333", "", prefer_grpc=True)
+            connect("http://localhost:6333", "key", asynchronous=True)
+
+        sync_client.assert_called_once_with(
+            url="http://localhost:6333",
+            api_key=None,
+            prefer_grpc=True,
+            grpc_port=DEFAULT_GRPC_PORT,
+        )
+        assert async_client.call_args.kwargs["api_key"] == "key"
+        assert async_client.call_args.kwargs["prefer_grpc"] is False
+
+
+class TestRunWorkPipelineUnit:
+    """Unit tests for single files going through run_work_pipeline."""
 
     @pytest.fixture
     def temp_file_setup(self):
@@ -225,140 +447,115 @@ class TestProcessSingleFileUnit:
 
         return temp_dir, file_paths
 
+    @staticmethod
+    def embedding_model():
+        model = Mock()
+        model.embed.side_effect = lambda texts, **kwargs: [
+            [0.1] * EXPECTED_EMBEDDING_DIMENSION for _ in texts
+        ]
+        return model
+
+    @staticmethod
+    def index_file(temp_dir, rel, model, max_file_size_mb=1, size=None):
+        """Run one file through the pipeline; returns its points and error."""
+        target = IndexTarget(temp_dir, TEST_COLLECTION_NAME)
+        target.writer = Mock()
+        done = []
+        run_work_pipeline(
+            [FileWork(rel, target, size)],
+            model,
+            chunk_max_tokens=100,
+            chunk_min_chars=50,
+            chunk_overlap=20,
+            model_name=TEST_MODEL_NAME,
+            max_file_size_mb=max_file_size_mb,
+            chunk_workers=1,
+            on_file_done=lambda work, error: done.append(error),
+        )
+        points = [
+            point for call in target.writer.add.call_args_list for point in call.args[1]
+        ]
+        return points, done
+
     @pytest.mark.unit
-    def test_process_single_file_basic(self, temp_file_setup):
+    def test_pipeline_basic(self, temp_file_setup):
         """Test basic file processing."""
         temp_dir, file_paths = temp_file_setup
+        model = self.embedding_model()
 
-        mock_model = Mock()
-        mock_model.embed.return_value = [[0.1] * EXPECTED_EMBEDDING_DIMENSION]
-
-        with patch("app.read_text") as mock_read_text:
-            mock_read_text.return_value = SAMPLE_PYTHON_CODE
-
-            filename, points, file_size = process_single_file(
-                rel="test.py",
-                work_root=temp_dir,
-                model=mock_model,
-                chunk_max_tokens=100,
-                chunk_min_chars=50,
-                chunk_overlap=20,
-                model_name=TEST_MODEL_NAME,
-                max_file_size_mb=1,
-                collection=TEST_COLLECTION_NAME,
-            )
+        points, done = self.index_file(temp_dir, "test.py", model)
 
-            assert filename == "test.py"
-            assert len(points) > 0
-            assert file_size > 0
-            mock_model.embed.assert_called()
+        assert done == [None]
+        assert len(points) > 0
+        model.embed.assert_called()
+        assert points[0].id == point_id(TEST_COLLECTION_NAME, "test.py", 0)
+        assert points[0].payload["path"] == "test.py"
 
     @pytest.mark.unit
-    def test_process_single_file_empty_file(self, temp_file_setup):
-        """Test processing of empty files."""
+    def test_pipeline_empty_file(self, temp_file_setup):
+        """Empty files complete without points or embedding."""
         temp_dir, file_paths = temp_file_setup
+        model = self.embedding_model()
 
-        mock_model = Mock()
+        points, done = self.index_file(temp_dir, "empty.txt", model)
 
-        with patch("app.read_text") as mock_read_text:
-            mock_read_text.return_value = ""
-
-            filename, points, file_size = process_single_file(
-                rel="empty.txt",
-                work_root=temp_dir,
-                model=mock_model,
-                chunk_max_tokens=100,
-                chunk_min_chars=50,
-                chunk_overlap=20,
-                model_name=TEST_MODEL_NAME,
-                max_file_size_mb=1,
-                collection=TEST_COLLECTION_NAME,
-            )
-
-            assert filename == "empty.txt"
-            assert len(points) == 0  # No points for empty file
-            assert file_size >= 0
+        assert done == [None]
+        assert points == []
+        model.embed.assert_not_called()
 
     @pytest.mark.unit
-    def test_process_single_file_file_too_large(self, temp_file_setup):
+    def test_pipeline_file_too_large(self, temp_file_setup):
         """Test handling of files that are too large."""
         temp_dir, file_paths = temp_file_setup
+        model = self.embedding_model()
 
-        mock_model = Mock()
-
-        with (
-            patch("app.read_text") as mock_read_text,
-            patch("os.path.getsize") as mock_getsize,
-        ):
+        with patch("os.path.getsize") as mock_getsize:
             # Mock file size to be larger than limit
             mock_getsize.return_value = 2 * 1024 * 1024  # 2MB
-            mock_read_text.return_value = "small content"
-
-            filename, points, file_size = process_single_file(
-                rel="large.txt",
-                work_root=temp_dir,
-                model=mock_model,
-                chunk_max_tokens=100,
-                chunk_min_chars=50,
-                chunk_overlap=20,
-                model_name=TEST_MODEL_NAME,
-                max_file_size_mb=1,  # 1MB limit
-                collection=TEST_COLLECTION_NAME,
-            )
+            points, done = self.index_file(temp_dir, "large.txt", model)
 
-            assert filename == "large.txt"
-            assert len(points) == 0  # No points for oversized file
-            assert file_size == 0  # File size is set to 0 when skipped
+        assert done == [None]
+        assert points == []  # No points for oversized file
+        model.embed.assert_not_called()
 
     @pytest.mark.unit
-    def test_process_single_file_read_error(self, temp_file_setup):
-        """Test handling of file read errors."""
+    def test_pipeline_uses_scanned_size(self, temp_file_setup):
+        """A size known from the scan decides without stat-ing the file again."""
         temp_dir, file_paths = temp_file_setup
+        model = self.embedding_model()
 
-        mock_model = Mock()
+        with patch("os.path.getsize") as mock_getsize:
+            points, done = self.index_file(
+                temp_dir, "large.txt", model, size=2 * 1024 * 1024
+            )
+
+        mock_getsize.assert_not_called()
+        assert done == [None]
+        assert points == []
+        model.embed.assert_not_called()
+
+    @pytest.mark.unit
+    def test_pipeline_read_error(self, temp_file_setup):
+        """Unreadable files are skipped, not failed."""
+        temp_dir, file_paths = temp_file_setup
+        model = self.embedding_model()
 
         with patch("app.read_text") as mock_read_text:
             mock_read_text.side_effect = Exception("File read error")
+            points, done = self.index_file(temp_dir, "test.py", model)
 
-            filename, points, file_size = process_single_file(
-                rel="test.py",
-                work_root=temp_dir,
-                model=mock_model,
-                chunk_max_tokens=100,
-                chunk_min_chars=50,
-                chunk_overlap=20,
-                model_name=TEST_MODEL_NAME,
-                max_file_size_mb=1,
-                collection=TEST_COLLECTION_NAME,
-            )
-
-            assert filename == "test.py"
-            assert len(points) == 0  # No points due to error
-            assert file_size >= 0
+        assert done == [None]
+        assert points == []
 
     @pytest.mark.unit
-    def test_process_single_file_embedding_error(self, temp_file_setup):
+    def test_pipeline_embedding_error(self, temp_file_setup):
         """Test handling of embedding errors."""
         temp_dir, file_paths = temp_file_setup
+        model = Mock()
+        model.embed.side_effect = Exception("Embedding failed")
 
-        mock_model = Mock()
-        mock_model.embed.side_effect = Exception("Embedding failed")
-
-        with patch("app.read_text") as mock_read_text:
-            mock_read_text.return_value = SAMPLE_PYTHON_CODE
-
-            filename, points, file_size = process_single_file(
-                rel="test.py",
-                work_root=temp_dir,
-                model=mock_model,
-                chunk_max_tokens=100,
-                chunk_min_chars=50,
-                chunk_overlap=20,
-                model_name=TEST_MODEL_NAME,
-                max_file_size_mb=1,
-                collection=TEST_COLLECTION_NAME,
-            )
+        points, done = self.index_file(temp_dir, "test.py", model)
 
-            assert filename == "test.py"
-            assert len(points) == 0  # No points due to embedding error
-            assert file_size == 0  # File size is set to 0 when embedding fails
+        assert len(done) == 1
+        assert str(done[0]) == "Embedding failed"
+        assert points == []
@@ -1,10 +1,21 @@
 """Unit tests for chunkers module."""
 
-from unittest.mock import Mock, patch
+from unittest.mock import patch
 
 import pytest
 
-from chunkers import chunk_text, prefer_md_splits
+from chunkers import (
+    ModelTokenizer,
+    TiktokenCounter,
+    chunk_markdown,
+    chunk_text,
+    chunk_texts,
+    get_encoder,
+    markdown_blocks,
+    prefer_md_splits,
+    token_chunks,
+    token_windows,
+)
 from tests.conftest import SAMPLE_MARKDOWN_TEXT, SAMPLE_PYTHON_CODE
 
 
@@ -14,57 +25,39 @@ class TestChunkText:
     @pytest.mark.unit
     def test_chunk_text_basic(self):
         """Test basic text chunking functionality."""
-        text = "This is a simple test text that should be chunked properly."
+        text = " ".join(f"word{i}" for i in range(100))
 
-        with patch("chunkers.tiktoken.get_encoding") as mock_encoding:
-            # Mock tokenizer behavior
-            mock_enc = Mock()
-            mock_enc.encode.return_value = list(range(50))  # 50 tokens
-            mock_enc.decode.side_effect = lambda tokens: " ".join(
-                [f"token{i}" for i in tokens]
-            )
-            mock_encoding.return_value = mock_enc
+        chunks = chunk_text(text, max_tokens=20, overlap=5)
 
-            chunks = chunk_text(text, max_tokens=20, overlap=5)
-
-            assert len(chunks) > 0
-            assert all(chunk.strip() for chunk in chunks)  # No empty chunks
+        assert len(chunks) > 1
+        assert all(chunk.strip() for chunk in chunks)  # No empty chunks
+        assert all(len(get_encoder().encode(chunk)) <= 20 for chunk in chunks)
 
     @pytest.mark.unit
     def test_chunk_text_small_text(self):
         """Test chunking with text smaller than max tokens."""
         text = "Short text."
 
-        with patch("chunkers.tiktoken.get_encoding") as mock_encoding:
-            mock_enc = Mock()
-            mock_enc.encode.return_value = [1, 2, 3]  # 3 tokens
-            mock_enc.decode.return_value = text
-            mock_encoding.return_value = mock_enc
-
+        with patch("chunkers.encode_texts") as encode:
             chunks = chunk_text(text, max_tokens=20, overlap=5)
 
-            assert len(chunks) == 1
-            assert chunks[0] == text
+        assert chunks == [text]
+        # Fewer bytes than max_tokens: no tokenizing needed
+        encode.assert_called_once_with(get_encoder(), [])
 
     @pytest.mark.unit
     def test_chunk_text_overlap_handling(self):
         """Test that overlap is handled correctly."""
-        text = "A longer piece of text for testing overlap behavior."
-
-        with patch("chunkers.tiktoken.get_encoding") as mock_encoding:
-            mock_enc = Mock()
-            mock_enc.encode.return_value = list(range(100))  # 100 tokens
-            mock_enc.decode.side_effect = (
-                lambda tokens: f"chunk_{min(tokens)}_{max(tokens)}"
-            )
-            mock_encoding.return_value = mock_enc
+        text = " ".join(f"w{i}" for i in range(200))
+        tokens = get_encoder().encode(text)
 
-            chunks = chunk_text(text, max_tokens=30, overlap=10)
+        chunks = chunk_text(text, max_tokens=30, overlap=10)
 
-            assert len(chunks) > 1
-            # Should have multiple chunks due to overlap
-            expected_chunks = 4  # 100 tokens / (30-10) overlap = ~4 chunks
-            assert len(chunks) >= expected_chunks - 1
+        # Windows step by max_tokens - overlap and stop at the end of the text
+        assert len(chunks) == len(token_windows(len(tokens), 30, 10))
+        assert chunks[0] == get_encoder().decode(tokens[:30]).strip()
+        assert chunks[-1].endswith("w199")
+        assert chunks[1].split()[0] in chunks[0].split()
 
     @pytest.mark.unit
     def test_chunk_text_edge_cases(self):
@@ -76,14 +69,100 @@ class TestChunkText:
         assert chunk_text("   \n\t   ") == []
 
         # Single character
-        with patch("chunkers.tiktoken.get_encoding") as mock_encoding:
-            mock_enc = Mock()
-            mock_enc.encode.return_value = [1]
-            mock_enc.decode.return_value = "a"
-            mock_encoding.return_value = mock_enc
+        assert chunk_text("a", max_tokens=10) == ["a"]
+
+        # Special-token markers are plain text, not an error
+        assert chunk_text("<|endoftext|> " * 50, max_tokens=10)
+
+    @pytest.mark.unit
+    def test_windows_are_sliced_from_the_text(self):
+        """Chunks are exact slices; split multi-byte characters stay whole."""
+        text = "héllo wörld 😀 日本語のテキスト " * 40
+
+        chunks = chunk_text(text, max_tokens=7, overlap=3)
+
+        assert len(chunks) > 10
+        assert all(chunk in text for chunk in chunks)
+        assert not any("\ufffd" in chunk for chunk in chunks)
+
+    @pytest.mark.unit
+    def test_no_window_repeats_the_tail(self):
+        """The last window ends the text; no overlap-only chunk follows it."""
+        assert token_windows(100, 30, 10) == [
+            (0, 30),
+            (20, 50),
+            (40, 70),
+            (60, 90),
+            (80, 100),
+        ]
+        assert token_windows(25, 30, 10) == [(0, 25)]
+        assert token_windows(0, 30, 10) == []
+
+    @pytest.mark.unit
+    def test_chunk_texts_matches_chunk_text(self):
+        """Batched chunking of sections gives the same chunks per section."""
+        texts = [SAMPLE_MARKDOWN_TEXT, "", SAMPLE_PYTHON_CODE * 5]
+
+        with (
+            patch("chunkers.BATCH_ENCODE_MIN_CHARS", 0),
+            patch("chunkers.os.cpu_count", return_value=4),
+        ):
+            batched = chunk_texts(texts, max_tokens=40, overlap=8)
+
+        assert batched == [chunk_text(t, max_tokens=40, overlap=8) for t in texts]
+
+
+class TestTokenCounters:
+    """Test measuring chunks with tiktoken or the model's own tokenizer."""
+
+    @pytest.mark.unit
+    def test_tiktoken_bounds_are_character_offsets(self):
+        """Token boundaries inside multi-byte characters move past them."""
+        text = "naïve café — 東京 " * 20
+        (bounds,) = TiktokenCounter().bounds([text])
+
+        assert bounds[0] == 0 and bounds[-1] == len(text)
+        assert len(bounds) - 1 == len(get_encoder().encode(text))
+        assert all(bounds[1:] >= bounds[:-1])
+
+    @pytest.mark.unit
+    def test_model_tokenizer_knows_the_model_limit(self, word_tokenizer):
+        """The limit excludes special tokens; counts are not truncated."""
+        tokenizer = ModelTokenizer(word_tokenizer)
+        text = " ".join(f"w{i}" for i in range(20))
+
+        assert tokenizer.max_tokens == 6
+        assert tokenizer.count([text, "a b"]) == [20, 2]
+        # The model's own tokenizer keeps truncating
+        assert len(word_tokenizer.encode(text).ids) == 8
+
+    @pytest.mark.unit
+    def test_model_tokenizer_chunks(self, word_tokenizer):
+        """Chunks hold at most max_tokens of the model's tokens."""
+        tokenizer = ModelTokenizer(word_tokenizer)
+        text = " ".join(f"w{i}" for i in range(20))
+
+        (chunks,) = token_chunks([text], 6, 2, tokenizer)
+
+        assert [c.text for c in chunks][:2] == [
+            "w0 w1 w2 w3 w4 w5",
+            "w4 w5 w6 w7 w8 w9",
+        ]
+        assert chunks[-1].text.endswith("w19")
+        assert all(c.tokens <= 6 for c in chunks)
+        assert tokenizer.count([c.text for c in chunks]) == [c.tokens for c in chunks]
+
+    @pytest.mark.unit
+    def test_markdown_is_packed_in_model_tokens(self, word_tokenizer):
+        """Blocks are counted in the model's tokens, not tiktoken's."""
+        tokenizer = ModelTokenizer(word_tokenizer)
+        doc = "# Title\n\none two three\n\nfour five\n"
+
+        chunks = chunk_markdown(doc, max_tokens=6, overlap=1, counter=tokenizer)
 
-            chunks = chunk_text("a", max_tokens=10)
-            assert chunks == ["a"]
+        assert all(c.tokens <= 6 for c in chunks)
+        assert [c.headings for c in chunks] == [("Title",)] * len(chunks)
+        assert "four five" in chunks[-1].text
 
 
 class TestPreferMdSplits:
@@ -149,3 +228,84 @@ Conclusion text.
         # Should handle code content gracefully
         content_splits = [s for s in splits if s and len(s.strip()) > 0]
         assert len(content_splits) >= 1
+
+
+class TestChunkMarkdown:
+    """Test the section-aware markdown chunker."""
+
+    DOC = """# Guide
+
+Intro paragraph.
+
+## Install
+
+Run the installer.
+
+```bash
+# not a heading
+
+pip install hish
+```
+
+### Options
+
+- one
+- two
+
+## Usage
+
+Use it.
+"""
+
+    @pytest.mark.unit
+    def test_blocks_carry_their_heading_path(self):
+        """Headings nest by level; fenced code stays one block."""
+        blocks = markdown_blocks(self.DOC)
+        paths = {self.DOC[b.start : b.end].strip(): b.headings for b in blocks}
+
+        assert paths["Intro paragraph."] == ("Guide",)
+        assert paths["- one\n- two"] == ("Guide", "Install", "Options")
+        assert paths["Use it."] == ("Guide", "Usage")
+        fence = [text for text in paths if text.startswith("```")]
+        assert fence == ["```bash\n# not a heading\n\npip install hish\n```"]
+
+    @pytest.mark.unit
+    def test_small_sections_are_packed_into_one_chunk(self):
+        """A document within the budget becomes a single verbatim chunk."""
+        chunks = chunk_markdown(self.DOC, max_tokens=300, overlap=10)
+
+        assert [chunk[:2] for chunk in chunks] == [(self.DOC.strip(), ("Guide",))]
+
+    @pytest.mark.unit
+    def test_chunks_break_at_headings_within_budget(self):
+        """Chunks stay under the budget, start at headings and never end with one."""
+        section = "\n\n".join(f"Paragraph {i} of the section." for i in range(8))
+        doc = "".join(f"## Part {n}\n\n{section}\n\n" for n in range(4))
+
+        chunks = chunk_markdown(doc, max_tokens=80, overlap=10)
+
+        assert 4 <= len(chunks) < 16
+        assert all(len(get_encoder().encode(c.text)) <= 80 for c in chunks)
+        assert all(c.text in doc for c in chunks)
+        assert not any(c.text.splitlines()[-1].startswith("#") for c in chunks)
+        assert [c.headings for c in chunks if c.text.startswith("## Part")] == [
+            (f"Part {n}",) for n in range(4)
+        ]
+
+    @pytest.mark.unit
+    def test_oversized_blocks_are_split_into_windows(self):
+        """A paragraph larger than the budget falls back to token windows."""
+        doc = "# Big\n\n" + " ".join(f"w{i}" for i in range(300))
+
+        chunks = chunk_markdown(doc, max_tokens=50, overlap=5)
+
+        assert len(chunks) > 5
+        assert all(c.headings == ("Big",) for c in chunks)
+        assert chunks[-1].text.endswith("w299")
+
+    @pytest.mark.unit
+    def test_heading_titles_drop_emphasis(self):
+        """Markup in heading titles is not part of the path."""
+        (block,) = markdown_blocks("## **Bold** `code` title ##\n")
+
+        assert block.headings == ("Bold code title",)
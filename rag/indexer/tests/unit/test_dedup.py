@@ -0,0 +1,100 @@
+"""Unit tests for dedup module."""
+
+import pytest
+
+from dedup import (
+    Duplicates,
+    dedup_config,
+    dedup_settings,
+    duplicates,
+    minhash,
+    similarity,
+)
+
+LICENSE = (
+    "Permission is hereby granted, free of charge, to any person obtaining a copy "
+    "of this software and associated documentation files (the Software), to deal "
+    "in the Software without restriction, including without limitation the rights "
+    "to use, copy, modify, merge, publish, distribute, sublicense, and/or sell "
+    "copies of the Software, and to permit persons to whom the Software is "
+    "furnished to do so, subject to the following conditions. "
+) * 3
+
+
+class TestSignatures:
+    """Test MinHash signatures."""
+
+    @pytest.mark.unit
+    def test_signatures_estimate_similarity(self):
+        """Copies with a small edit stay close; unrelated text does not."""
+        edited = LICENSE.replace("free of charge", "without charge", 1)
+
+        assert similarity(minhash(LICENSE), minhash(LICENSE.upper())) == 1.0
+        assert similarity(minhash(LICENSE), minhash(edited)) >= 0.9
+        assert similarity(minhash(LICENSE), minhash("Install with pip. " * 20)) < 0.2
+
+    @pytest.mark.unit
+    def test_short_and_empty_texts_have_signatures(self):
+        """Texts shorter than a shingle (or without words) still hash."""
+        assert len(minhash("two words")) == 64
+        assert similarity(minhash("---"), minhash("---")) == 1.0
+
+
+class TestDuplicates:
+    """Test duplicate detection across chunks."""
+
+    @pytest.mark.unit
+    def test_near_duplicates_share_a_representative(self):
+        """The first chunk represents its near-copies in other files."""
+        dups = Duplicates(dedup_config("near"))
+
+        first, first_new = dups.check(LICENSE, "a/LICENSE")
+        copy, copy_new = dups.check(LICENSE + " Copyright Example", "b/LICENSE")
+        other, other_new = dups.check("Install with pip. " * 20, "README.md")
+
+        assert (first_new, copy_new, other_new) == (True, False, True)
+        assert copy is first and copy.rel == "a/LICENSE"
+        assert other is not first
+        assert dups.matched == 1
+
+    @pytest.mark.unit
+    def test_exact_mode_ignores_whitespace_and_case_only(self):
+        """exact matches normalized text; an edited copy is a new chunk."""
+        dups = Duplicates(dedup_config("exact"))
+        dups.check(LICENSE, "a")
+
+        assert dups.check("  " + LICENSE.upper(), "b")[1] is False
+        assert dups.check(LICENSE + " Copyright Example", "c")[1] is True
+
+    @pytest.mark.unit
+    def test_vectors_are_reused_once_embedded(self):
+        """Duplicates see the representative's vector after it is embedded."""
+        dups = Duplicates(dedup_config("near"))
+        first, _ = dups.check(LICENSE, "a")
+        copy, _ = dups.check(LICENSE, "b")
+
+        assert dups.vector(copy) is None
+        first.vector = [1.0, 0.0]
+        assert dups.vector(copy) == [1.0, 0.0]
+        assert dups.reused == 1
+
+    @pytest.mark.unit
+    def test_least_recently_matched_representatives_are_dropped(self):
+        """The number of representatives is bounded."""
+        dups = Duplicates(dedup_config("exact"), max_representatives=2)
+        for name in ("one", "two", "three"):
+            dups.check(f"chunk {name}", name)
+
+        assert dups.check("chunk one", "again")[1] is True
+        assert dups.check("chunk three", "again")[1] is False
+
+    @pytest.mark.unit
+    def test_config_and_settings(self):
+        """off disables detection; the mode is recorded in the manifest settings."""
+        assert duplicates(dedup_config("off")) is None
+        assert dedup_settings(dedup_config("off")) == {}
+        assert dedup_settings(dedup_config("near", 0.85)) == {"dedup": "near:0.85"}
+        with pytest.raises(ValueError):
+            dedup_config("fuzzy")
+        with pytest.raises(ValueError):
+            dedup_config("near", 0)
@@ -0,0 +1,229 @@
+"""Unit tests for embedding module."""
+
+import threading
+import time
+from unittest.mock import Mock
+
+import pytest
+
+from embedding import AUTOTUNE_RECOVER_AFTER, BatchAutotuner, EmbeddingBatcher
+
+
+def echo_model():
+    """Model whose 'vector' for a text is the text itself, recording batch sizes."""
+    model = Mock()
+    model.batch_sizes = []
+
+    def embed(texts, **kwargs):
+        model.batch_sizes.append(len(texts))
+        return iter([[text] for text in texts])
+
+    model.embed.side_effect = embed
+    return model
+
+
+class TestEmbeddingBatcher:
+    """Test the cross-file embedding batcher."""
+
+    @pytest.mark.unit
+    def test_embed_returns_vectors_in_order(self):
+        """A single caller gets its vectors back in input order."""
+        model = echo_model()
+        with EmbeddingBatcher(model, batch_size=4, max_wait_ms=1) as batcher:
+            vectors = batcher.embed(["a", "b", "c"])
+
+        assert vectors == [["a"], ["b"], ["c"]]
+
+    @pytest.mark.unit
+    def test_requests_from_many_callers_share_a_batch(self):
+        """Small requests from concurrent callers are packed into one batch."""
+        model = echo_model()
+        results = {}
+
+        with EmbeddingBatcher(
+            model, batch_size=8, max_wait_ms=5000, sort_window=1
+        ) as batcher:
+
+            def worker(name):
+                results[name] = batcher.embed([f"{name}-0", f"{name}-1"])
+
+            threads = [
+                threading.Thread(target=worker, args=(f"file{i}",)) for i in range(4)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(timeout=10)
+
+        assert model.batch_sizes == [8]
+        for i in range(4):
+            assert results[f"file{i}"] == [[f"file{i}-0"], [f"file{i}-1"]]
+
+    @pytest.mark.unit
+    def test_large_request_is_split_across_batches(self):
+        """Requests larger than the batch size are split and reassembled."""
+        model = echo_model()
+        texts = [str(i) for i in range(10)]
+
+        with EmbeddingBatcher(model, batch_size=4, max_wait_ms=1) as batcher:
+            vectors = batcher.embed(texts)
+
+        assert vectors == [[t] for t in texts]
+        assert model.batch_sizes == [4, 4, 2]
+        assert batcher.batches == 3
+        assert batcher.texts == 10
+
+    @pytest.mark.unit
+    def test_queued_chunks_are_batched_by_length(self):
+        """Chunks of similar length share a batch; callers keep their order.
+
+        Without token counts, lengths are estimated from characters.
+        """
+        model = echo_model()
+        texts = ["x" * n for n in (4, 200, 8, 160, 12, 240, 16, 120)]
+
+        with EmbeddingBatcher(model, batch_size=4, max_wait_ms=1) as batcher:
+            vectors = batcher.embed(texts)
+        with EmbeddingBatcher(echo_model(), batch_size=4, sort_window=1) as unsorted:
+            unsorted.embed(texts)
+
+        assert vectors == [[t] for t in texts]
+        batches = [call.args[0] for call in model.embed.call_args_list]
+        assert [len(t) for t in batches[0]] == [240, 200, 160, 120]
+        assert [len(t) for t in batches[1]] == [16, 12, 8, 4]
+        assert batcher.padded_tokens < unsorted.padded_tokens
+
+    @pytest.mark.unit
+    def test_chunks_are_sorted_by_token_count(self):
+        """Given token counts win over character lengths."""
+        model = echo_model()
+        texts = ["aaaa", "b", "cc", "ddd"]
+
+        with EmbeddingBatcher(model, batch_size=2, max_wait_ms=1) as batcher:
+            vectors = batcher.embed(texts, lengths=[1, 9, 8, 2])
+
+        assert vectors == [[t] for t in texts]
+        batches = [call.args[0] for call in model.embed.call_args_list]
+        assert batches == [["b", "cc"], ["ddd", "aaaa"]]
+        assert batcher.tokens == 20 and batcher.padded_tokens == 22
+
+    @pytest.mark.unit
+    def test_window_fills_before_it_is_sorted(self):
+        """A full batch waits for the rest of the window from other callers."""
+        model = echo_model()
+        results = {}
+
+        with EmbeddingBatcher(
+            model, batch_size=2, max_wait_ms=5000, sort_window=2
+        ) as batcher:
+
+            def worker(name):
+                results[name] = batcher.embed([f"{name}", f"{name}" * 20])
+
+            first = threading.Thread(target=worker, args=("a",))
+            first.start()
+            time.sleep(0.05)
+            second = threading.Thread(target=worker, args=("b",))
+            second.start()
+            for thread in (first, second):
+                thread.join(timeout=10)
+
+        batches = [call.args[0] for call in model.embed.call_args_list]
+        assert batches == [["a" * 20, "b" * 20], ["a", "b"]]
+        assert results == {"a": [["a"], ["a" * 20]], "b": [["b"], ["b" * 20]]}
+
+    @pytest.mark.unit
+    def test_model_error_propagates_to_caller(self):
+        """A failed batch raises in every caller that had chunks in it."""
+        model = Mock()
+        model.embed.side_effect = Exception("ONNX failure")
+
+        with EmbeddingBatcher(model, batch_size=4, max_wait_ms=1) as batcher:
+            with pytest.raises(Exception, match="ONNX failure"):
+                batcher.embed(["a", "b", "c", "d", "e", "f"])
+
+            # The batcher keeps serving later requests
+            model.embed.side_effect = lambda texts, **kwargs: [[t] for t in texts]
+            assert batcher.embed(["g"]) == [["g"]]
+
+    @pytest.mark.unit
+    def test_empty_and_closed(self):
+        """Empty input needs no inference; a closed batcher rejects work."""
+        model = echo_model()
+        batcher = EmbeddingBatcher(model, batch_size=4)
+
+        assert batcher.embed([]) == []
+        batcher.close()
+        batcher.close()  # idempotent
+
+        with pytest.raises(RuntimeError):
+            batcher.embed(["a"])
+        model.embed.assert_not_called()
+
+
+class TestBatchAutotuner:
+    """Test throughput-driven batch sizing."""
+
+    @staticmethod
+    def run(tuner, rates, batches):
+        """Feed the tuner full batches timed from a chunks/s table."""
+        for _ in range(batches):
+            size = tuner.batch_size
+            tuner.record(size, size / rates[size])
+
+    @pytest.mark.unit
+    def test_settles_on_smallest_size_near_peak_throughput(self):
+        """Probing stops past the knee; near-equal larger sizes lose."""
+        tuner = BatchAutotuner(probe_batches=2, memory_limit_mb=1e9, rss_mb=lambda: 0)
+        rates = {16: 100.0, 32: 200.0, 64: 390.0, 128: 400.0, 256: 300.0}
+
+        self.run(tuner, rates, 1 + 2 * 5)  # warm-up, then two batches per size
+
+        assert tuner.tuned == 64
+        assert tuner.batch_size == 64
+
+    @pytest.mark.unit
+    def test_partial_batches_are_not_measured(self):
+        """Batches cut short by a dry input do not count as probes."""
+        tuner = BatchAutotuner(probe_batches=1, memory_limit_mb=1e9, rss_mb=lambda: 0)
+        tuner.record(16, 1.0)  # warm-up
+        tuner.record(3, 0.001)
+
+        assert tuner.tuned is None and tuner.batch_size == 16
+
+    @pytest.mark.unit
+    def test_backs_off_on_spikes_and_recovers(self):
+        """Slow batches or high RSS halve the size; healthy batches restore it."""
+        rss = [0.0]
+        tuner = BatchAutotuner(
+            candidates=(16, 32),
+            probe_batches=1,
+            max_latency_s=1.0,
+            memory_limit_mb=100,
+            rss_mb=lambda: rss[0],
+        )
+        self.run(tuner, {16: 100.0, 32: 400.0}, 3)
+        assert tuner.tuned == 32
+
+        tuner.record(32, 5.0)  # latency spike
+        assert tuner.batch_size == 16
+        for _ in range(AUTOTUNE_RECOVER_AFTER):
+            tuner.record(16, 0.1)
+        assert tuner.batch_size == 32
+
+        rss[0] = 500.0  # memory spike
+        tuner.record(32, 0.1)
+        assert tuner.batch_size == 16
+        assert tuner.back_offs == 2
+
+    @pytest.mark.unit
+    def test_batcher_follows_the_tuner(self):
+        """The batcher forms its batches at the tuner's current size."""
+        model = echo_model()
+        tuner = BatchAutotuner(candidates=(2, 4), memory_limit_mb=1e9, rss_mb=lambda: 0)
+        with EmbeddingBatcher(model, batch_size=0, autotuner=tuner) as batcher:
+            vectors = batcher.embed([str(i) for i in range(7)])
+
+        assert vectors == [[str(i)] for i in range(7)]
+        assert max(model.batch_sizes) <= 4
+        assert model.batch_sizes[0] == 2
@@ -0,0 +1,110 @@
+"""Unit tests for embedding_cache module."""
+
+from unittest.mock import Mock
+
+import numpy as np
+import pytest
+
+from embedding_cache import CachedEmbedding, EmbeddingCache, cache_key, open_cache
+
+
+def counting_model():
+    """Model embedding a text as [len(text), 1.0], recording what it was asked."""
+    model = Mock()
+    model.requests = []
+
+    def embed(texts, **kwargs):
+        model.requests.append(list(texts))
+        return [[float(len(text)), 1.0] for text in texts]
+
+    model.embed.side_effect = embed
+    return model
+
+
+class TestEmbeddingCache:
+    """Test the SQLite vector store."""
+
+    @pytest.mark.unit
+    def test_roundtrip_and_persistence(self, tmp_path):
+        """Vectors survive reopening the cache as float32 arrays."""
+        path = str(tmp_path / "cache.sqlite3")
+        key = cache_key("model", "hello")
+        cache = EmbeddingCache(path)
+        cache.put_many({key: [0.5, 0.25]})
+        cache.close()
+
+        reopened = EmbeddingCache(path)
+        found = reopened.get_many([key, cache_key("model", "other")])
+
+        assert list(found) == [key]
+        assert found[key].dtype == np.float32
+        assert found[key].tolist() == [0.5, 0.25]
+        assert reopened.size_bytes == 8
+        reopened.close()
+
+    @pytest.mark.unit
+    def test_key_depends_on_model_and_text(self):
+        """The same text under another model is a different entry."""
+        assert cache_key("a", "text") != cache_key("b", "text")
+        assert cache_key("a", "text") != cache_key("a", "text2")
+
+    @pytest.mark.unit
+    def test_lru_eviction_keeps_recently_used(self, tmp_path):
+        """Beyond the bound, the least recently used entries are evicted."""
+        # Each 256-dim float32 vector is 1 KiB; bound the cache to 4 KiB
+        cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"), max_mb=4 / 1024)
+        keys = [cache_key("m", str(i)) for i in range(4)]
+        for key in keys:
+            cache.put_many({key: np.zeros(256)})
+        cache.get_many([keys[0]])  # refresh the oldest entry
+
+        cache.put_many({cache_key("m", "new"): np.zeros(256)})
+
+        assert cache.evicted >= 1
+        assert cache.size_bytes <= 4 * 1024
+        remaining = cache.get_many(keys)
+        assert keys[0] in remaining
+        assert keys[1] not in remaining
+        cache.close()
+
+
+class TestCachedEmbedding:
+    """Test the caching model wrapper."""
+
+    @pytest.mark.unit
+    def test_only_misses_reach_the_model(self, tmp_path):
+        """Cached texts are not re-embedded; duplicates are embedded once."""
+        model = counting_model()
+        cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"))
+        cached = CachedEmbedding(model, cache, "m")
+
+        first = cached.embed(["aa", "bbb", "aa"])
+        second = cached.embed(["bbb", "c"])
+
+        assert model.requests == [["aa", "bbb"], ["c"]]
+        assert [list(v) for v in first] == [[2.0, 1.0], [3.0, 1.0], [2.0, 1.0]]
+        assert [list(v) for v in second] == [[3.0, 1.0], [1.0, 1.0]]
+        assert (cache.hits, cache.misses) == (1, 4)
+        cached.close()
+        model.close.assert_called_once()
+
+    @pytest.mark.unit
+    def test_token_counts_follow_the_missing_texts(self, tmp_path):
+        """Only the token counts of texts sent to the model are passed on."""
+        model = counting_model()
+        cached = CachedEmbedding(model, EmbeddingCache(str(tmp_path / "c.db")), "m")
+
+        cached.embed(["aa"], lengths=[7])
+        cached.embed(["aa", "bbb", "c"], lengths=[7, 9, 3])
+
+        assert model.embed.call_args_list[-1].args[0] == ["bbb", "c"]
+        assert model.embed.call_args_list[-1].kwargs["lengths"] == [9, 3]
+        cached.close()
+
+    @pytest.mark.unit
+    def test_open_cache_falls_back_when_unusable(self, tmp_path):
+        """A state dir that cannot hold the database disables caching."""
+        blocker = tmp_path / "state"
+        blocker.write_text("not a directory")
+
+        assert open_cache(str(blocker / "nested"), 10) is None
@@ -0,0 +1,106 @@
+"""Unit tests for git_changes module."""
+
+import shutil
+import subprocess
+
+import pytest
+
+from git_changes import changes_since, git_head, hook_base, hook_changes
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="git not installed")
+
+
+def git(repo, *args):
+    subprocess.run(
+        ["git", "-C", str(repo), *args], check=True, capture_output=True, text=True
+    )
+
+
+@pytest.fixture
+def repo(tmp_path):
+    """A git repository with docs/a.md, docs/b.md and docs/c.md committed."""
+    git(tmp_path, "init", "-q")
+    git(tmp_path, "config", "user.email", "indexer@example.com")
+    git(tmp_path, "config", "user.name", "Indexer Tests")
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    for name in ("a", "b", "c"):
+        (docs / f"{name}.md").write_text(f"# {name}\n\nSome text about {name}.\n")
+    (tmp_path / ".gitignore").write_text("build/\nnotes.md\n")
+    git(tmp_path, "add", "-A")
+    git(tmp_path, "commit", "-q", "-m", "initial")
+    return tmp_path
+
+
+class TestGitChanges:
+    """Test change detection from git history and status."""
+
+    @pytest.mark.unit
+    def test_not_a_repository(self, tmp_path):
+        """Outside a git checkout there is no HEAD and no change set."""
+        assert git_head(str(tmp_path)) is None
+        assert changes_since(str(tmp_path), "HEAD") is None
+
+    @pytest.mark.unit
+    def test_committed_renames_deletes_and_edits(self, repo):
+        """Diffs since a commit report renames as delete + add."""
+        base = git_head(str(repo))
+        (repo / "docs" / "a.md").write_text("# a\n\nEdited.\n")
+        git(repo, "mv", "docs/b.md", "docs/renamed.md")
+        git(repo, "rm", "-q", "docs/c.md")
+        git(repo, "commit", "-q", "-am", "change docs")
+
+        changes = changes_since(str(repo), base)
+
+        assert sorted(changes.touched) == ["docs/a.md", "docs/renamed.md"]
+        assert sorted(changes.deleted) == ["docs/b.md", "docs/c.md"]
+        assert changes.dirty == []
+
+    @pytest.mark.unit
+    def test_working_tree_and_ignored_paths(self, repo):
+        """Uncommitted edits are dirty; ignored files and directories are reported."""
+        head = git_head(str(repo))
+        (repo / "docs" / "a.md").write_text("# a\n\nUncommitted.\n")
+        (repo / "docs" / "new.md").write_text("# new\n")
+        (repo / "notes.md").write_text("# ignored file\n")
+        (repo / "build").mkdir()
+        (repo / "build" / "out.md").write_text("# ignored dir\n")
+
+        changes = changes_since(str(repo), head)
+
+        assert sorted(changes.dirty) == ["docs/a.md", "docs/new.md"]
+        assert "notes.md" in changes.touched
+        assert changes.ignored_dirs == ["build"]
+
+    @pytest.mark.unit
+    def test_paths_are_relative_to_a_subdirectory(self, repo):
+        """Indexing a subdirectory only sees (and strips) its own paths."""
+        base = git_head(str(repo))
+        (repo / "docs" / "a.md").write_text("# a\n\nEdited.\n")
+        (repo / "top.md").write_text("# outside docs\n")
+        git(repo, "add", "-A")
+        git(repo, "commit", "-q", "-m", "edit")
+
+        changes = changes_since(str(repo / "docs"), base)
+
+        assert changes.touched == ["a.md"]
+
+    @pytest.mark.unit
+    def test_unknown_commit_falls_back(self, repo):
+        """An unknown base commit yields None so callers do a full scan."""
+        assert changes_since(str(repo), "0" * 40) is None
+
+    @pytest.mark.unit
+    def test_post_commit_hook_sees_only_that_commit(self, repo):
+        """Hook mode reports the files of HEAD's commit and its parent as base."""
+        base = git_head(str(repo))
+        (repo / "docs" / "b.md").write_text("# b\n\nEdited.\n")
+        git(repo, "commit", "-q", "-am", "edit b")
+        (repo / "docs" / "c.md").write_text("# c\n\nNot committed.\n")
+
+        changes = hook_changes(str(repo), "post-commit")
+
+        assert changes.touched == ["docs/b.md"]
+        assert hook_base(str(repo), "post-commit") == base
+        with pytest.raises(ValueError):
+            hook_changes(str(repo), "pre-push")
@@ -0,0 +1,170 @@
+"""Unit tests for manifest module."""
+
+import json
+import os
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from manifest import (
+    default_state_dir,
+    forget_files,
+    hash_file,
+    load_manifest,
+    manifest_matches,
+    manifest_path,
+    new_manifest,
+    plan_changes,
+    record_file,
+    save_manifest,
+    superseded_point_ids,
+)
+from util import ScannedFile
+
+TEST_SETTINGS = {"model": "test-model", "chunk_max_tokens": 100}
+
+
+class TestManifestPersistence:
+    """Test loading and saving manifests."""
+
+    @pytest.mark.unit
+    def test_default_state_dir_from_env(self, monkeypatch):
+        """INDEX_STATE_DIR overrides the default location."""
+        monkeypatch.setenv("INDEX_STATE_DIR", "/tmp/custom-state")
+        assert default_state_dir() == "/tmp/custom-state"
+
+        monkeypatch.delenv("INDEX_STATE_DIR")
+        assert default_state_dir().endswith(os.path.join(".cache", "hish", "indexer"))
+
+    @pytest.mark.unit
+    def test_save_and_load_roundtrip(self, tmp_path):
+        """A saved manifest loads back unchanged."""
+        path = manifest_path(str(tmp_path / "state"), "docs_mpnet")
+        manifest = new_manifest(str(tmp_path), TEST_SETTINGS)
+        record_file(manifest, "a.md", {"size": 1, "mtime_ns": 2, "sha256": "x"}, [1, 2])
+
+        save_manifest(path, manifest)
+
+        assert load_manifest(path) == manifest
+        assert not [f for f in os.listdir(tmp_path / "state") if f.endswith(".tmp")]
+
+    @pytest.mark.unit
+    def test_load_missing_or_corrupt(self, tmp_path):
+        """Missing, corrupt or foreign-version manifests are ignored."""
+        path = tmp_path / "m.json"
+        assert load_manifest(str(path)) is None
+
+        path.write_text("{not json")
+        assert load_manifest(str(path)) is None
+
+        path.write_text(json.dumps({"version": -1}))
+        assert load_manifest(str(path)) is None
+
+    @pytest.mark.unit
+    def test_manifest_matches(self, tmp_path):
+        """Manifests are bound to the work root and settings."""
+        manifest = new_manifest(str(tmp_path), TEST_SETTINGS)
+
+        assert manifest_matches(manifest, str(tmp_path), TEST_SETTINGS)
+        assert not manifest_matches(manifest, "/elsewhere", TEST_SETTINGS)
+        assert not manifest_matches(
+            manifest, str(tmp_path), {**TEST_SETTINGS, "chunk_max_tokens": 200}
+        )
+
+
+class TestPlanChanges:
+    """Test change detection against the manifest."""
+
+    @pytest.fixture
+    def repo(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            (Path(tmpdir) / "keep.md").write_text("unchanged content")
+            (Path(tmpdir) / "edit.md").write_text("original content")
+            yield tmpdir
+
+    def _indexed_manifest(self, repo):
+        manifest = new_manifest(repo, TEST_SETTINGS)
+        changed, removed, fingerprints = plan_changes(
+            manifest, repo, ["keep.md", "edit.md"]
+        )
+        for rel in changed:
+            record_file(manifest, rel, fingerprints[rel], [rel + "-1"])
+        return manifest
+
+    @pytest.mark.unit
+    def test_new_files_are_changed(self, repo):
+        """Everything is new against an empty manifest."""
+        manifest = new_manifest(repo, TEST_SETTINGS)
+
+        changed, removed, fingerprints = plan_changes(
+            manifest, repo, ["keep.md", "edit.md"]
+        )
+
+        assert sorted(changed) == ["edit.md", "keep.md"]
+        assert removed == []
+        assert fingerprints["keep.md"]["sha256"] == hash_file(
+            os.path.join(repo, "keep.md")
+        )
+
+    @pytest.mark.unit
+    def test_only_modified_and_removed_files_reported(self, repo):
+        """Unchanged files are skipped; edits and deletions are detected."""
+        manifest = self._indexed_manifest(repo)
+        (Path(repo) / "edit.md").write_text("edited content, now longer")
+        (Path(repo) / "new.md").write_text("brand new")
+
+        # A one-shot iterator, as handed over by the scanner
+        scan = iter(["edit.md", "new.md"])
+        changed, removed, _ = plan_changes(manifest, repo, scan)
+
+        assert sorted(changed) == ["edit.md", "new.md"]
+        assert removed == ["keep.md"]
+
+    @pytest.mark.unit
+    def test_touched_file_with_same_content_is_unchanged(self, repo):
+        """An mtime-only change refreshes the stat but does not re-index."""
+        manifest = self._indexed_manifest(repo)
+        path = os.path.join(repo, "keep.md")
+        os.utime(path, ns=(0, 123456789))
+
+        changed, removed, _ = plan_changes(manifest, repo, ["keep.md", "edit.md"])
+
+        assert changed == []
+        assert removed == []
+        assert manifest["files"]["keep.md"]["mtime_ns"] == 123456789
+
+    @pytest.mark.unit
+    def test_scanned_files_are_not_stat_again(self, repo):
+        """The stat collected by the scanner is used as is."""
+        manifest = self._indexed_manifest(repo)
+        entry = manifest["files"]["keep.md"]
+        scan = [ScannedFile("keep.md", entry["size"], entry["mtime_ns"])]
+
+        with patch("manifest.os.stat") as stat:
+            changed, removed, _ = plan_changes(manifest, repo, scan)
+
+        stat.assert_not_called()
+        assert changed == []
+        assert removed == ["edit.md"]
+
+    @pytest.mark.unit
+    def test_forget_files_returns_point_ids(self, repo):
+        """Forgetting files removes their entries and yields their point IDs."""
+        manifest = self._indexed_manifest(repo)
+
+        point_ids = forget_files(manifest, ["keep.md", "missing.md"])
+
+        assert point_ids == ["keep.md-1"]
+        assert "keep.md" not in manifest["files"]
+
+    @pytest.mark.unit
+    def test_superseded_point_ids(self, repo):
+        """Only IDs a re-indexed file no longer uses are reported."""
+        manifest = self._indexed_manifest(repo)
+        fingerprint = {"size": 1, "mtime_ns": 1, "sha256": "new"}
+        record_file(manifest, "edit.md", fingerprint, ["p0"])
+        previous_ids = {"edit.md": ["p0", "p1", "p2"], "keep.md": ["keep.md-1"]}
+
+        assert superseded_point_ids(manifest, previous_ids) == ["p1", "p2"]
@@ -0,0 +1,80 @@
+"""Unit tests for memory module."""
+
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from memory import DEFAULT_MEMORY_FRACTION, MemoryGovernor, memory_budget_mb
+
+
+class TestMemoryGovernor:
+    """Test RSS-driven throttling of pipeline stages."""
+
+    @pytest.mark.unit
+    def test_default_budget_is_a_share_of_physical_memory(self):
+        """A budget of 0 means DEFAULT_MEMORY_FRACTION of RAM."""
+        with patch("memory.total_memory_mb", return_value=1000.0):
+            assert memory_budget_mb(0) == 1000.0 * DEFAULT_MEMORY_FRACTION
+            assert memory_budget_mb(300) == 300
+
+    @pytest.mark.unit
+    def test_pressure_has_hysteresis(self):
+        """Throttling starts above 90% of the budget and ends below 80%."""
+        rss = [50.0]
+        governor = MemoryGovernor(100, rss_mb=lambda: rss[0], check_interval_s=0)
+
+        assert not governor.pressure()
+        rss[0] = 95
+        with patch("memory.gc.collect") as collect:
+            assert governor.pressure()
+            rss[0] = 85
+            assert governor.pressure()
+        collect.assert_called_once()
+        rss[0] = 75
+        assert not governor.pressure()
+        assert governor.episodes == 1
+        assert governor.peak_mb == 95
+
+    @pytest.mark.unit
+    def test_admit_serializes_work_under_pressure(self):
+        """Under pressure only one admitted item runs at a time."""
+
+        def run(rss_mb):
+            governor = MemoryGovernor(100, rss_mb=lambda: rss_mb, check_interval_s=0)
+            active, peak = [0], [0]
+            lock = threading.Lock()
+
+            def work():
+                with governor.admit():
+                    with lock:
+                        active[0] += 1
+                        peak[0] = max(peak[0], active[0])
+                    time.sleep(0.02)
+                    with lock:
+                        active[0] -= 1
+
+            threads = [threading.Thread(target=work) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            return peak[0], governor.throttled
+
+        assert run(rss_mb=10) == (4, 0)
+        assert run(rss_mb=95) == (1, 4)
+
+    @pytest.mark.unit
+    def test_rss_is_sampled_at_most_once_per_interval(self):
+        """Admitting work does not read /proc on every call."""
+        calls = []
+        governor = MemoryGovernor(
+            100, rss_mb=lambda: calls.append(1) or 10, check_interval_s=60
+        )
+
+        for _ in range(100):
+            with governor.admit():
+                pass
+
+        assert len(calls) == 1
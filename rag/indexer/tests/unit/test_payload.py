@@ -0,0 +1,91 @@
+"""Unit tests for payload module."""
+
+import pytest
+
+from payload import (
+    PayloadFormat,
+    build_payload,
+    locate_pieces,
+    payload_format,
+    payload_text,
+)
+
+META = {"path": "docs/a.md", "repo": "docs_mpnet", "ext": "md", "title": "a.md"}
+HEADER = "[repo: docs_mpnet] [file: docs/a.md] [ext: md] [title: a.md]\n---\n"
+
+
+class TestPayloadSchemas:
+    """Test building and reading the payload schemas."""
+
+    @pytest.mark.unit
+    def test_full_payload_keeps_the_legacy_layout(self):
+        """The default schema writes content, document and raw_content."""
+        payload = build_payload(META, "chunk text", PayloadFormat())
+
+        assert payload == {
+            **META,
+            "content": HEADER + "chunk text",
+            "document": HEADER + "chunk text",
+            "raw_content": "chunk text",
+        }
+        assert payload_text(payload) == "chunk text"
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("mode", ["compact", "compressed"])
+    def test_compact_payloads_store_the_text_once(self, mode):
+        """Compact schemas store the chunk once and read it back."""
+        chunk = "chunk text " * 50
+        payload = build_payload(META, chunk, payload_format(mode, "content"))
+
+        assert sum(chunk in str(value) for value in payload.values()) <= 1
+        assert len(str(payload)) < len(str(build_payload(META, chunk, PayloadFormat())))
+        assert payload_text(payload) == chunk
+
+    @pytest.mark.unit
+    def test_compact_text_field_is_configurable(self):
+        """The single text field is named after what the MCP server reads."""
+        payload = build_payload(META, "chunk", payload_format("compact", "content"))
+
+        assert payload["content"] == "chunk"
+        assert "document" not in payload and "raw_content" not in payload
+
+    @pytest.mark.unit
+    def test_offsets_are_read_from_the_source(self, tmp_path):
+        """Offset payloads store no text and fetch it lazily."""
+        text = "# Title\n\nFirst part. Second part."
+        (tmp_path / "docs").mkdir()
+        (tmp_path / "docs" / "a.md").write_text(text)
+        span = locate_pieces(text, ["Second part."])[0]
+        payload = build_payload(META, "Second part.", payload_format("offsets"), span)
+
+        assert "Second part." not in payload.values()
+        assert payload_text(payload, str(tmp_path)) == "Second part."
+
+        (tmp_path / "docs" / "a.md").write_text(text.replace("Second", "Other"))
+        with pytest.raises(ValueError):
+            payload_text(payload, str(tmp_path))
+
+    @pytest.mark.unit
+    def test_offsets_fall_back_to_inline_text(self):
+        """A chunk that is not a verbatim slice of the file is stored inline."""
+        payload = build_payload(META, "rewritten", payload_format("offsets"), None)
+
+        assert payload["schema"] == "compact"
+        assert payload_text(payload) == "rewritten"
+
+    @pytest.mark.unit
+    def test_locate_overlapping_pieces(self):
+        """Pieces are located in order, including overlapping ones."""
+        text = "aaa bbb aaa bbb"
+
+        assert locate_pieces(text, ["aaa bbb", "bbb aaa", "aaa bbb", "zzz"]) == [
+            (0, 7),
+            (4, 11),
+            (8, 15),
+            None,
+        ]
+
+    @pytest.mark.unit
+    def test_unknown_mode(self):
+        with pytest.raises(ValueError):
+            payload_format("tiny")
@@ -0,0 +1,435 @@
+"""Unit tests for pipeline and writer modules."""
+
+import asyncio
+import threading
+import time
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+from qdrant_client.http.models import UpdateStatus
+
+from pipeline import Budget, Stage, run_pipeline
+from writer import BulkPointWriter, PointWriter
+
+
+class TestRunPipeline:
+    """Test the staged pipeline runner."""
+
+    @pytest.mark.unit
+    def test_items_flow_through_all_stages(self):
+        """Every item passes through every stage into the sink."""
+        results = []
+        run_pipeline(
+            range(50),
+            [
+                Stage("double", lambda x: x * 2, workers=3),
+                Stage("inc", lambda x: x + 1),
+            ],
+            results.append,
+            queue_size=2,
+        )
+
+        assert sorted(results) == sorted(x * 2 + 1 for x in range(50))
+
+    @pytest.mark.unit
+    def test_stage_error_drops_only_that_item(self):
+        """A failing stage call is reported and the rest keeps flowing."""
+        results, errors = [], []
+
+        def fail_on_three(x):
+            if x == 3:
+                raise ValueError("bad item")
+            return x
+
+        run_pipeline(
+            range(6),
+            [Stage("check", fail_on_three, workers=2)],
+            results.append,
+            on_error=lambda item, e: errors.append((item, str(e))),
+        )
+
+        assert sorted(results) == [0, 1, 2, 4, 5]
+        assert errors == [(3, "bad item")]
+
+    @pytest.mark.unit
+    def test_none_result_is_filtered(self):
+        """Stages return None to drop an item."""
+        results = []
+        run_pipeline(
+            range(10),
+            [Stage("even", lambda x: x if x % 2 == 0 else None, workers=2)],
+            results.append,
+        )
+
+        assert sorted(results) == [0, 2, 4, 6, 8]
+
+    @pytest.mark.unit
+    def test_source_and_sink_errors_abort(self):
+        """Errors in the source or sink are re-raised to the caller."""
+
+        def broken_source():
+            yield 1
+            raise RuntimeError("scan failed")
+
+        with pytest.raises(RuntimeError, match="scan failed"):
+            run_pipeline(broken_source(), [Stage("id", lambda x: x)], lambda x: None)
+
+        def broken_sink(item):
+            raise RuntimeError("sink failed")
+
+        with pytest.raises(RuntimeError, match="sink failed"):
+            run_pipeline(
+                range(1000), [Stage("id", lambda x: x)], broken_sink, queue_size=1
+            )
+
+    @pytest.mark.unit
+    def test_max_in_flight_caps_items_across_stages(self):
+        """The source is pulled lazily: never more than max_in_flight items out."""
+        pulled, finished, peak = [0], [0], [0]
+        lock = threading.Lock()
+
+        def source():
+            for i in range(100):
+                with lock:
+                    pulled[0] += 1
+                    peak[0] = max(peak[0], pulled[0] - finished[0])
+                yield i
+
+        def sink(item):
+            with lock:
+                finished[0] += 1
+
+        def drop_odd(item):
+            if item % 2 == 0:
+                return item
+            sink(item)  # dropped items leave the pipeline as well
+            return None
+
+        run_pipeline(
+            source(),
+            [
+                Stage("drop-odd", drop_odd, workers=4),
+                Stage("id", lambda x: x, workers=4),
+            ],
+            sink,
+            queue_size=64,
+            max_in_flight=5,
+        )
+
+        assert finished[0] == 100
+        assert peak[0] <= 5 + 1  # the item just pulled before its slot is checked
+
+
+class TestBudget:
+    """Test the shared points budget."""
+
+    @pytest.mark.unit
+    def test_acquire_blocks_until_released(self):
+        """A second holder waits for room; an oversized amount goes alone."""
+        budget = Budget(10)
+        budget.acquire(8)
+        acquired = threading.Event()
+
+        def take():
+            budget.acquire(25)  # larger than the whole budget
+            acquired.set()
+
+        thread = threading.Thread(target=take)
+        thread.start()
+        time.sleep(0.05)
+        assert not acquired.is_set()
+
+        budget.release(8)
+        thread.join(timeout=5)
+        assert acquired.is_set()
+        assert budget.used == 25 and budget.peak == 25
+
+    @pytest.mark.unit
+    def test_acquire_gives_up_on_abort(self):
+        """A waiting holder returns False once the pipeline aborts."""
+        abort = threading.Event()
+        budget = Budget(10, abort)
+        budget.acquire(8)
+        results = []
+        thread = threading.Thread(target=lambda: results.append(budget.acquire(5)))
+        thread.start()
+        time.sleep(0.05)
+
+        abort.set()
+        thread.join(timeout=5)
+        assert results == [False]
+        assert budget.used == 8
+
+    @pytest.mark.unit
+    def test_failing_sink_does_not_deadlock_budget_holders(self):
+        """Stages blocked on a budget exit when the sink raises."""
+        abort = threading.Event()
+        budget = Budget(10, abort)
+        seen = []
+
+        def take(item):
+            return item if budget.acquire(5) else None
+
+        def sink(item):
+            try:
+                seen.append(item)
+                if len(seen) == 3:
+                    raise RuntimeError("writer failed")
+            finally:
+                budget.release(5)
+
+        errors = []
+
+        def run():
+            try:
+                run_pipeline(
+                    range(20),
+                    [Stage("embed", take, workers=4)],
+                    sink,
+                    queue_size=2,
+                    abort=abort,
+                )
+            except RuntimeError as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        thread.join(timeout=5)
+        assert not thread.is_alive()
+        assert [str(e) for e in errors] == ["writer failed"]
+
+
+class TestPointWriter:
+    """Test the asynchronous Qdrant writer."""
+
+    @staticmethod
+    def points(*ids):
+        return [Mock(id=i) for i in ids]
+
+    @staticmethod
+    def client(status=UpdateStatus.ACKNOWLEDGED):
+        client = Mock()
+        client.upsert = AsyncMock(return_value=Mock(status=status))
+        client.close = AsyncMock()
+        return client
+
+    @pytest.mark.unit
+    def test_flushes_when_batch_is_full(self):
+        """Full batches are sent with wait=False and committed on acknowledgement."""
+        client = self.client()
+        committed = []
+        writer = PointWriter(client, "coll", batch_size=3, on_commit=committed.extend)
+
+        writer.add("a.py", self.points(1, 2))
+        client.upsert.assert_not_called()
+        writer.add("b.py", self.points(3))
+        assert writer.close() is True
+
+        first = client.upsert.call_args_list[0]
+        assert first.kwargs["wait"] is False
+        assert committed == [("a.py", [1, 2]), ("b.py", [3])]
+        assert writer.upserted == 3
+
+    @pytest.mark.unit
+    def test_close_confirms_acknowledged_batches(self):
+        """The final barrier re-sends the last acknowledged batch with wait=True."""
+        client = self.client()
+        writer = PointWriter(client, "coll", batch_size=1)
+
+        writer.add("a.py", self.points(1))
+        writer.add("b.py", self.points(2))
+        assert writer.close() is True
+
+        last = client.upsert.call_args_list[-1]
+        assert last.kwargs["wait"] is True
+        assert [p.id for p in last.kwargs["points"]] == [2]
+        client.close.assert_awaited_once()
+
+    @pytest.mark.unit
+    def test_drain_waits_for_commits_and_keeps_writer_open(self):
+        """After drain() every file sent so far is committed; add() still works."""
+        client = self.client()
+        committed = []
+        writer = PointWriter(client, "coll", batch_size=10, on_commit=committed.extend)
+
+        writer.add("a.py", self.points(1))
+        writer.drain()
+        assert committed == [("a.py", [1])]
+
+        writer.add("b.py", self.points(2))
+        assert writer.close() is True
+        assert committed == [("a.py", [1]), ("b.py", [2])]
+
+    @pytest.mark.unit
+    def test_completed_batches_need_no_confirmation(self):
+        """Batches Qdrant already applied are not re-sent by the barrier."""
+        client = self.client(status=UpdateStatus.COMPLETED)
+        writer = PointWriter(client, "coll", batch_size=1)
+
+        writer.add("a.py", self.points(1))
+        assert writer.close() is True
+
+        assert client.upsert.await_count == 1
+
+    @pytest.mark.unit
+    def test_transient_errors_are_retried(self):
+        """A failing upsert is retried with backoff before it succeeds."""
+        client = self.client()
+        client.upsert.side_effect = [
+            Exception("timeout"),
+            Mock(status=UpdateStatus.ACKNOWLEDGED),
+            Mock(status=UpdateStatus.COMPLETED),
+        ]
+        committed = []
+        writer = PointWriter(
+            client,
+            "coll",
+            batch_size=10,
+            on_commit=committed.extend,
+            retry_backoff_s=0,
+        )
+
+        writer.add("a.py", self.points(1))
+        assert writer.close() is True
+
+        assert writer.retries == 1
+        assert committed == [("a.py", [1])]
+
+    @pytest.mark.unit
+    def test_failed_batch_is_not_committed(self):
+        """Files of a batch that exhausted its retries are not reported."""
+        client = self.client()
+        client.upsert.side_effect = Exception("down")
+        committed = []
+        writer = PointWriter(
+            client,
+            "coll",
+            batch_size=10,
+            on_commit=committed.extend,
+            max_retries=2,
+            retry_backoff_s=0,
+        )
+
+        writer.add("a.py", self.points(1))
+        assert writer.close() is False
+
+        assert committed == []
+        assert writer.failed_batches == 1
+        assert client.upsert.await_count == 3
+
+    @pytest.mark.unit
+    def test_in_flight_upserts_are_bounded(self):
+        """No more than max_in_flight upserts are outstanding at once."""
+        active, peak = [0], [0]
+
+        async def slow_upsert(**kwargs):
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+            await asyncio.sleep(0.01)
+            active[0] -= 1
+            return Mock(status=UpdateStatus.COMPLETED)
+
+        client = self.client()
+        client.upsert.side_effect = slow_upsert
+        writer = PointWriter(client, "coll", batch_size=1, max_in_flight=2)
+
+        for i in range(10):
+            writer.add(f"{i}.py", self.points(i))
+        assert writer.close() is True
+
+        assert peak[0] == 2
+        assert writer.upserted == 10
+
+    @pytest.mark.unit
+    def test_files_without_points_are_committed(self):
+        """Files that produced no chunks are still committed on flush."""
+        client = self.client()
+        committed = []
+        writer = PointWriter(client, "coll", batch_size=10, on_commit=committed.extend)
+
+        writer.add("empty.md", [])
+        assert writer.close() is True
+
+        client.upsert.assert_not_called()
+        assert committed == [("empty.md", [])]
+
+    @pytest.mark.unit
+    def test_commits_run_off_the_event_loop(self):
+        """A slow on_commit does not hold up upserts of other batches."""
+        client = self.client()
+        commit_threads = []
+        release = threading.Event()
+
+        def on_commit(pending):
+            commit_threads.append(threading.current_thread().name)
+            release.wait(timeout=5)
+
+        writer = PointWriter(client, "coll", batch_size=1, on_commit=on_commit)
+        writer.add("a.py", self.points(1))
+        writer.add("b.py", self.points(2))
+        deadline = time.monotonic() + 5
+        while client.upsert.await_count < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        # The second batch was sent while the first commit was still blocked
+        assert client.upsert.await_count == 2
+        release.set()
+        assert writer.close() is True
+        assert commit_threads and "qdrant-writer" not in commit_threads
+
+
+class TestBulkPointWriter:
+    """Test the streaming upload_points writer."""
+
+    @staticmethod
+    def client():
+        client = Mock()
+        client.uploaded = []
+        client.upload_points.side_effect = (
+            lambda points, **kwargs: client.uploaded.extend(points)
+        )
+        return client
+
+    @pytest.mark.unit
+    def test_streams_points_and_commits_on_close(self):
+        """All points go through one upload_points call; files commit at the end."""
+        client = self.client()
+        committed = []
+        writer = BulkPointWriter(
+            client, "coll", batch_size=2, on_commit=committed.extend, parallel=3
+        )
+
+        writer.add("a.py", [Mock(id=1), Mock(id=2)])
+        writer.add("b.py", [Mock(id=3)])
+        assert committed == []
+        assert writer.close() is True
+
+        client.upload_points.assert_called_once()
+        kwargs = client.upload_points.call_args.kwargs
+        assert kwargs["parallel"] == 3 and kwargs["batch_size"] == 2
+        assert [p.id for p in client.uploaded] == [1, 2, 3]
+        # The barrier confirms the tail of the upload with wait=True
+        assert client.upsert.call_args.kwargs["wait"] is True
+        assert committed == [("a.py", [1, 2]), ("b.py", [3])]
+
+    @pytest.mark.unit
+    def test_failed_upload_commits_nothing(self):
+        """A failed upload does not block producers and commits no file."""
+        client = Mock()
+
+        def fail(points, **kwargs):
+            next(iter(points))
+            raise Exception("grpc unavailable")
+
+        client.upload_points.side_effect = fail
+        committed = []
+        writer = BulkPointWriter(
+            client, "coll", batch_size=1, on_commit=committed.extend, parallel=1
+        )
+
+        for i in range(20):
+            writer.add(f"{i}.py", [Mock(id=i)])
+        assert writer.close() is False
+
+        assert committed == []
+        assert writer.failed_batches == 1
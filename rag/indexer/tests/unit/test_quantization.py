@@ -0,0 +1,118 @@
+"""Unit tests for quantization module."""
+
+import pytest
+from qdrant_client.http.models import (
+    BinaryQuantization,
+    Datatype,
+    Disabled,
+    ProductQuantization,
+    ProductQuantizationConfig,
+    ScalarQuantization,
+    ScalarType,
+)
+
+from quantization import (
+    Quantization,
+    for_collection,
+    parse_overrides,
+    quantization,
+    quantization_config,
+    quantization_update,
+    search_params,
+    vector_datatype,
+    vector_settings,
+)
+
+
+class TestQuantizationSettings:
+    """Test parsing and per-collection selection of quantization settings."""
+
+    @pytest.mark.unit
+    def test_legacy_flag_values_are_accepted(self):
+        """HISH_ENABLE_QUANTIZATION=true means int8 scalar quantization."""
+        assert quantization("true").mode == "scalar"
+        assert quantization("false").mode == "none"
+        assert quantization("").mode == "none"
+        assert quantization(" Binary ").mode == "binary"
+        with pytest.raises(ValueError):
+            quantization("pq")
+
+    @pytest.mark.unit
+    def test_oversampling_defaults_per_mode(self):
+        """0 picks more candidates for binary than for scalar codes."""
+        assert quantization("scalar").oversampling == 1.5
+        assert quantization("binary").oversampling == 3.0
+        assert quantization("binary", oversampling=4).oversampling == 4
+
+    @pytest.mark.unit
+    def test_overrides_match_with_or_without_model_suffix(self):
+        """A collection uses its override, other collections the default."""
+        default = quantization("scalar", always_ram=False)
+        overrides = parse_overrides("docs=binary, notes_mpnet=none")
+
+        assert for_collection("docs_mpnet", default, overrides) == quantization(
+            "binary", always_ram=False
+        )
+        assert for_collection("notes_mpnet", default, overrides).mode == "none"
+        assert for_collection("other_mpnet", default, overrides) == default
+        with pytest.raises(ValueError):
+            parse_overrides("docs")
+
+
+class TestCollectionConfig:
+    """Test the Qdrant configuration derived from the settings."""
+
+    @pytest.mark.unit
+    def test_scalar_and_binary_configs(self):
+        """scalar is an int8 copy, binary a 1-bit copy; both honor always_ram."""
+        scalar = quantization_config(quantization("scalar", always_ram=False))
+        binary = quantization_config(quantization("binary"))
+
+        assert isinstance(scalar, ScalarQuantization)
+        assert scalar.scalar.type == ScalarType.INT8
+        assert scalar.scalar.always_ram is False
+        assert isinstance(binary, BinaryQuantization)
+        assert binary.binary.always_ram is True
+        assert quantization_config(quantization("float16")) is None
+
+    @pytest.mark.unit
+    def test_float16_changes_the_vectors_not_the_index(self):
+        """float16 sets the datatype and is recorded in the manifest settings."""
+        assert vector_datatype(quantization("float16")) == Datatype.FLOAT16
+        assert vector_datatype(quantization("scalar")) is None
+        assert vector_settings(quantization("float16")) == {"datatype": "float16"}
+        assert vector_settings(quantization("binary")) == {}
+
+    @pytest.mark.unit
+    def test_update_only_when_the_collection_differs(self):
+        """Existing collections are re-quantized only on a real change."""
+        scalar = quantization_config(quantization("scalar"))
+
+        assert quantization_update(None, quantization("none")) is None
+        assert quantization_update(None, quantization("float16")) is None
+        assert quantization_update(scalar, quantization("scalar")) is None
+        assert isinstance(
+            quantization_update(None, quantization("binary")), BinaryQuantization
+        )
+        assert (
+            quantization_update(
+                scalar, quantization("scalar", always_ram=False)
+            ).scalar.always_ram
+            is False
+        )
+        assert quantization_update(scalar, quantization("none")) == Disabled.DISABLED
+        # Configured by hand with something this module does not manage
+        product = ProductQuantization(
+            product=ProductQuantizationConfig(compression="x16")
+        )
+        assert quantization_update(product, quantization("none")) is None
+
+    @pytest.mark.unit
+    def test_search_params_oversample_and_rescore(self):
+        """Readers of quantized collections rescore oversampled candidates."""
+        params = search_params(quantization("binary"), hnsw_ef=128)
+
+        assert params.hnsw_ef == 128
+        assert params.quantization.oversampling == 3.0
+        assert params.quantization.rescore is True
+        assert search_params(Quantization()).quantization is None
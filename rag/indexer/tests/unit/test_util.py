@@ -1,13 +1,68 @@
 """Unit tests for util module."""
 
 import os
+import subprocess
+import sys
 import tempfile
+import time
 from pathlib import Path
 from unittest.mock import mock_open, patch
 
 import pytest
 
-from util import compile_globs, iter_files, read_text
+from util import (
+    GitIgnore,
+    ScanCache,
+    ScannedFile,
+    cgroup_memory_limit_mb,
+    compile_globs,
+    iter_files,
+    lazy_import,
+    read_text,
+    scan_key,
+    scan_tree,
+    total_memory_mb,
+)
+
+
+class TestLazyImport:
+    """Test the stand-ins for lazily imported names."""
+
+    @pytest.mark.unit
+    def test_names_resolve_on_first_use(self):
+        """Calls, attributes and isinstance go to the imported object."""
+        OrderedDict, deque = lazy_import("collections", "OrderedDict", "deque")
+
+        assert OrderedDict(a=1) == {"a": 1}
+        assert OrderedDict.fromkeys("ab") == {"a": None, "b": None}
+        assert isinstance(deque(), deque)
+        assert lazy_import("json").dumps([1]) == "[1]"
+
+    @pytest.mark.unit
+    def test_typing_does_not_import(self):
+        """Annotations such as Optional[name] leave the module unimported."""
+        from typing import Optional
+
+        missing = lazy_import("no_such_module_for_tests", "Name")
+        Optional[missing]
+
+        with pytest.raises(ImportError):
+            missing()
+
+    @pytest.mark.unit
+    def test_indexer_starts_without_heavy_imports(self):
+        """Importing app pulls in neither torch nor qdrant_client or fastembed."""
+        heavy = ("torch", "fastembed", "onnxruntime", "qdrant_client")
+        code = f"import sys, app; print([m for m in {heavy!r} if m in sys.modules])"
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+
+        assert result.stdout.strip() == "[]"
 
 
 class TestCompileGlobs:
@@ -138,6 +193,200 @@ class TestIterFiles:
             assert "test_excluded.py" not in files
 
 
+class TestScanTree:
+    """Test the scandir-based scanner."""
+
+    @pytest.mark.unit
+    def test_excluded_directories_are_never_listed(self, tmp_path):
+        """Excluded directories are pruned before the scanner descends."""
+        (tmp_path / "node_modules" / "pkg").mkdir(parents=True)
+        (tmp_path / "node_modules" / "pkg" / "README.md").write_text("vendored")
+        (tmp_path / "docs").mkdir()
+        (tmp_path / "docs" / "guide.md").write_text("guide")
+        inc_spec, exc_spec = compile_globs("**/*.md", "**/node_modules/**")
+        listed = []
+        real_scandir = os.scandir
+
+        def scandir(path):
+            listed.append(os.path.relpath(path, tmp_path))
+            return real_scandir(path)
+
+        with patch("util.os.scandir", side_effect=scandir):
+            files = list(scan_tree(str(tmp_path), inc_spec, exc_spec))
+
+        assert [f.rel for f in files] == ["docs/guide.md"]
+        assert sorted(listed) == [".", "docs"]
+
+    @pytest.mark.unit
+    def test_size_and_mtime_come_from_the_scan(self, tmp_path):
+        """Each file is reported with the stat taken while walking."""
+        (tmp_path / "a.md").write_text("12345")
+        st = os.stat(tmp_path / "a.md")
+        inc_spec, exc_spec = compile_globs("*.md", "")
+
+        files = list(scan_tree(str(tmp_path), inc_spec, exc_spec))
+
+        assert files == [ScannedFile("a.md", 5, st.st_mtime_ns)]
+
+    @pytest.mark.unit
+    def test_negated_exclude_keeps_directory(self, tmp_path):
+        """A directory is not pruned when a negation could re-include files."""
+        (tmp_path / "build").mkdir()
+        (tmp_path / "build" / "out.md").write_text("out")
+        (tmp_path / "build" / "keep.md").write_text("keep")
+        inc_spec, exc_spec = compile_globs("**/*.md", "build/**,!build/keep.md")
+
+        files = list(iter_files(str(tmp_path), inc_spec, exc_spec))
+
+        assert files == ["build/keep.md"]
+
+    @pytest.mark.unit
+    def test_nested_gitignore_files(self, tmp_path):
+        """Rules of nested .gitignore files apply below their directory."""
+        (tmp_path / ".gitignore").write_text("*.log.md\ngenerated/\n")
+        (tmp_path / "docs" / "generated").mkdir(parents=True)
+        (tmp_path / "docs" / ".gitignore").write_text("draft-*.md\n!debug.log.md\n")
+        (tmp_path / ".git").mkdir()
+        (tmp_path / ".git" / "notes.md").write_text("git internals")
+        for rel in (
+            "top.md",
+            "run.log.md",
+            "docs/guide.md",
+            "docs/draft-1.md",
+            "docs/debug.log.md",
+            "docs/generated/api.md",
+        ):
+            (tmp_path / rel).write_text(rel)
+        inc_spec, exc_spec = compile_globs("**/*.md", "")
+        ignore = GitIgnore(str(tmp_path))
+
+        files = sorted(iter_files(str(tmp_path), inc_spec, exc_spec, ignore))
+
+        assert files == ["docs/debug.log.md", "docs/guide.md", "top.md"]
+        assert ignore.is_ignored("docs/generated/api.md")
+        assert not ignore.is_ignored("docs/guide.md")
+
+    @pytest.mark.unit
+    def test_gitignore_above_root_applies(self, tmp_path):
+        """Indexing a subdirectory of a checkout honors the outer .gitignore."""
+        (tmp_path / ".git").mkdir()
+        (tmp_path / ".gitignore").write_text("docs/private/\n")
+        (tmp_path / "docs" / "private").mkdir(parents=True)
+        (tmp_path / "docs" / "private" / "secret.md").write_text("secret")
+        (tmp_path / "docs" / "public.md").write_text("public")
+        root = str(tmp_path / "docs")
+        inc_spec, exc_spec = compile_globs("**/*.md", "")
+
+        files = list(iter_files(root, inc_spec, exc_spec, GitIgnore(root)))
+
+        assert files == ["public.md"]
+
+
+def age(*paths, seconds=3600):
+    """Move mtimes into the past so directories are not racy for the cache."""
+    stamp = time.time() - seconds
+    for path in paths:
+        os.utime(path, (stamp, stamp))
+
+
+class TestScanCache:
+    """Test skipping unchanged directories with the scan cache."""
+
+    @pytest.fixture
+    def tree(self, tmp_path):
+        (tmp_path / "docs" / "api").mkdir(parents=True)
+        (tmp_path / "docs" / "guide.md").write_text("guide")
+        (tmp_path / "docs" / "api" / "ref.md").write_text("ref")
+        (tmp_path / "notes.txt").write_text("not matched")
+        age(tmp_path, tmp_path / "docs", tmp_path / "docs" / "api")
+        return tmp_path
+
+    def scan(self, root, cache, ignore=None):
+        inc_spec, exc_spec = compile_globs("**/*.md", "")
+        listed = []
+        real_scandir = os.scandir
+
+        def scandir(path):
+            listed.append(os.path.relpath(path, root))
+            return real_scandir(path)
+
+        with patch("util.os.scandir", side_effect=scandir):
+            files = sorted(
+                scan_tree(str(root), inc_spec, exc_spec, ignore, cache=cache)
+            )
+        cache.finish()
+        return files, sorted(listed)
+
+    @pytest.mark.unit
+    def test_unchanged_directories_are_not_listed(self, tree):
+        """A rescan only stats the cached files, and still sees their edits."""
+        cache = ScanCache("key")
+        first, listed = self.scan(tree, cache)
+        assert listed == [".", "docs", "docs/api"]
+
+        (tree / "docs" / "guide.md").write_text("guide, edited")
+        second, listed = self.scan(tree, cache)
+
+        assert listed == []
+        assert cache.hits == 3
+        assert [f.rel for f in second] == ["docs/api/ref.md", "docs/guide.md"]
+        assert second[1].size == len("guide, edited")
+
+    @pytest.mark.unit
+    def test_added_and_removed_entries_relist_their_directory(self, tree):
+        """Only the directory whose mtime changed is listed again."""
+        cache = ScanCache("key")
+        self.scan(tree, cache)
+
+        (tree / "docs" / "new.md").write_text("new")
+        (tree / "docs" / "api" / "ref.md").unlink()
+        os.utime(tree / "docs", (time.time() - 60, time.time() - 60))
+        os.utime(tree / "docs" / "api", (time.time() - 60, time.time() - 60))
+        files, listed = self.scan(tree, cache)
+
+        assert listed == ["docs", "docs/api"]
+        assert [f.rel for f in files] == ["docs/guide.md", "docs/new.md"]
+
+    @pytest.mark.unit
+    def test_changed_gitignore_invalidates_the_subtree(self, tree):
+        """Edited ignore rules re-match everything below them."""
+        (tree / ".gitignore").write_text("")
+        age(tree / ".gitignore", tree)
+        cache = ScanCache("key")
+        self.scan(tree, cache, GitIgnore(str(tree)))
+
+        (tree / ".gitignore").write_text("api/\n")
+        age(tree / ".gitignore", tree, seconds=60)
+        files, listed = self.scan(tree, cache, GitIgnore(str(tree)))
+
+        assert listed == [".", "docs"]
+        assert [f.rel for f in files] == ["docs/guide.md"]
+
+    @pytest.mark.unit
+    def test_recent_directories_are_not_cached(self, tree):
+        """Directories modified within the racy window are always listed."""
+        cache = ScanCache("key")
+        (tree / "docs" / "fresh.md").write_text("fresh")
+
+        self.scan(tree, cache)
+        _, listed = self.scan(tree, cache)
+
+        assert listed == ["docs"]
+
+    @pytest.mark.unit
+    def test_persisted_per_key(self, tree, tmp_path_factory):
+        """The cache is saved to disk and ignored for other roots or globs."""
+        path = str(tmp_path_factory.mktemp("state") / "docs.scan.json")
+        key = scan_key(str(tree), "**/*.md", "", True)
+        cache = ScanCache.load(path, key)
+        self.scan(tree, cache)
+        cache.save()
+
+        assert ScanCache.load(path, key).dirs == cache.dirs
+        other = scan_key(str(tree), "**/*.rst", "", True)
+        assert ScanCache.load(path, other).dirs == {}
+
+
 class TestReadText:
     """Test the read_text function."""
 
@@ -198,3 +447,33 @@ class TestReadText:
             assert result == test_content
         finally:
             os.unlink(temp_path)
+
+
+class TestMemoryLimits:
+    """Test the container-aware memory size."""
+
+    @pytest.mark.unit
+    def test_cgroup_limits(self, tmp_path):
+        """v2 and v1 limits are read; "max" and v1's huge default mean none."""
+        v2, v1 = tmp_path / "memory.max", tmp_path / "memory.limit_in_bytes"
+        v1.write_text("9223372036854771712\n")
+        assert cgroup_memory_limit_mb([str(v2), str(v1)]) == 0.0
+
+        v1.write_text(f"{512 * 1024 * 1024}\n")
+        assert cgroup_memory_limit_mb([str(v2), str(v1)]) == 512.0
+
+        v2.write_text("max\n")
+        assert cgroup_memory_limit_mb([str(v2), str(v1)]) == 0.0
+        v2.write_text(f"{256 * 1024 * 1024}\n")
+        assert cgroup_memory_limit_mb([str(v2), str(v1)]) == 256.0
+
+    @pytest.mark.unit
+    def test_total_memory_is_the_smaller_of_limit_and_machine(self):
+        """A container limit caps the budget; without one, physical memory counts."""
+        with patch("util.physical_memory_mb", return_value=16384.0):
+            with patch("util.cgroup_memory_limit_mb", return_value=2048.0):
+                assert total_memory_mb() == 2048.0
+            with patch("util.cgroup_memory_limit_mb", return_value=0.0):
+                assert total_memory_mb() == 16384.0
+            with patch("util.cgroup_memory_limit_mb", return_value=65536.0):
+                assert total_memory_mb() == 16384.0
@@ -0,0 +1,109 @@
+"""Unit tests for watcher module."""
+
+import sys
+import threading
+
+import pytest
+
+from util import compile_globs
+from watcher import InotifyWatcher, PollingWatcher, debounced
+
+
+def collect(watcher, rounds=5, timeout=0.2):
+    """Union of the paths a watcher reports over a few polls."""
+    changed = set()
+    for _ in range(rounds):
+        paths = watcher.poll(timeout)
+        assert paths is not None
+        changed |= paths
+    return changed
+
+
+class FakeWatcher:
+    """Replays scripted poll() results, then reports nothing."""
+
+    def __init__(self, results):
+        self.results = list(results)
+
+    def poll(self, timeout):
+        return self.results.pop(0) if self.results else set()
+
+
+class TestPollingWatcher:
+    """Test the stat-snapshot fallback."""
+
+    @pytest.mark.unit
+    def test_detects_new_modified_and_deleted_files(self, tmp_path):
+        """Only matching files are tracked; deletions are reported too."""
+        (tmp_path / "a.md").write_text("a")
+        (tmp_path / "b.md").write_text("b")
+        inc_spec, exc_spec = compile_globs("*.md", "")
+        watcher = PollingWatcher(str(tmp_path), inc_spec, exc_spec, interval_s=0.01)
+
+        (tmp_path / "a.md").write_text("a, edited")
+        (tmp_path / "b.md").unlink()
+        (tmp_path / "c.md").write_text("c")
+        (tmp_path / "ignored.txt").write_text("x")
+
+        assert watcher.poll(0.01) == {"a.md", "b.md", "c.md"}
+        assert watcher.poll(0.01) == set()
+
+
+@pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="inotify is Linux-only"
+)
+class TestInotifyWatcher:
+    """Test the recursive inotify watcher."""
+
+    @pytest.mark.unit
+    def test_reports_writes_new_directories_and_removals(self, tmp_path):
+        """Files in new subdirectories are seen; removed directories end in '/'."""
+        (tmp_path / "old").mkdir()
+        (tmp_path / "old" / "x.md").write_text("x")
+        (tmp_path / "node_modules").mkdir()
+        _, exc_spec = compile_globs("*.md", "**/node_modules/**")
+        watcher = InotifyWatcher(str(tmp_path), exc_spec)
+        try:
+            (tmp_path / "a.md").write_text("a")
+            (tmp_path / "docs" / "api").mkdir(parents=True)
+            (tmp_path / "docs" / "api" / "b.md").write_text("b")
+            (tmp_path / "node_modules" / "c.md").write_text("c")
+            (tmp_path / "old" / "x.md").unlink()
+            (tmp_path / "old").rmdir()
+
+            changed = collect(watcher)
+        finally:
+            watcher.close()
+
+        assert {"a.md", "docs/api/b.md", "old/x.md", "old/"} <= changed
+        assert "node_modules/c.md" not in changed
+
+
+class TestDebounced:
+    """Test grouping of change bursts."""
+
+    @pytest.mark.unit
+    def test_burst_is_flushed_once_quiet(self):
+        """Changes arriving back to back are yielded together."""
+        watcher = FakeWatcher([{"a.md"}, {"a.md", "b.md"}])
+        batches = debounced(watcher, debounce_ms=20)
+
+        assert next(batches) == {"a.md", "b.md"}
+        watcher.results = [{"c.md"}]
+        assert next(batches) == {"c.md"}
+
+    @pytest.mark.unit
+    def test_lost_events_request_a_rescan(self):
+        """A queue overflow is passed on as None."""
+        watcher = FakeWatcher([{"a.md"}, None])
+        batches = debounced(watcher, debounce_ms=10)
+
+        assert next(batches) is None
+
+    @pytest.mark.unit
+    def test_stops_when_asked(self):
+        """The generator ends once the stop event is set."""
+        stop = threading.Event()
+        stop.set()
+
+        assert list(debounced(FakeWatcher([{"a.md"}]), stop=stop)) == []
@@ -1,8 +1,61 @@
+import importlib
+import json
+import logging
 import os
-from typing import Iterable
+import tempfile
+import time
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
 
 import pathspec
 
+logger = logging.getLogger("indexer")
+
+
+class LazyImport:
+    """
+    Stands in for module.name until first used (called, an attribute read or
+    an isinstance check), so heavy libraries such as qdrant_client and
+    fastembed are only imported by code paths that need them.
+    """
+
+    __slots__ = ("_module", "_name", "_value")
+
+    def __init__(self, module: str, name: Optional[str] = None):
+        self._module = module
+        self._name = name
+        self._value = None
+
+    def resolve(self):
+        if self._value is None:
+            value = importlib.import_module(self._module)
+            self._value = getattr(value, self._name) if self._name else value
+        return self._value
+
+    def __call__(self, *args, **kwargs):
+        return self.resolve()(*args, **kwargs)
+
+    def __getattr__(self, attr: str):
+        if attr.startswith("__"):
+            # Probed by typing (Optional[...], Union[...]) and copy: no import
+            raise AttributeError(attr)
+        return getattr(self.resolve(), attr)
+
+    def __instancecheck__(self, obj) -> bool:
+        return isinstance(obj, self.resolve())
+
+    def __repr__(self) -> str:
+        target = f"{self._module}.{self._name}" if self._name else self._module
+        return f"<lazy {target}>"
+
+
+def lazy_import(module: str, *names: str):
+    """LazyImport stand-ins for module (no names) or names from it."""
+    if not names:
+        return LazyImport(module)
+    if len(names) == 1:
+        return LazyImport(module, names[0])
+    return tuple(LazyImport(module, name) for name in names)
+
 
 def compile_globs(includes: str, excludes: str):
     inc = [g.strip() for g in (includes or "").split(",") if g.strip()]
@@ -12,16 +65,358 @@ def compile_globs(includes: str, excludes: str):
     ), pathspec.PathSpec.from_lines("gitwildmatch", exc)
 
 
-def iter_files(root: str, inc_spec, exc_spec) -> Iterable[str]:
-    for dirpath, _, filenames in os.walk(root):
-        for f in filenames:
-            rel = os.path.relpath(os.path.join(dirpath, f), root)
-            if exc_spec.match_file(rel):
+class ScannedFile(NamedTuple):
+    """A file found by the scanner, with the stat taken while walking."""
+
+    rel: str
+    size: int
+    mtime_ns: int
+
+
+def is_excluded_dir(rel: str, exc_spec) -> bool:
+    """True if everything below the directory rel is excluded (e.g. **/node_modules/**)."""
+    if not rel or any(p.include is False for p in exc_spec.patterns):
+        # A negated pattern may re-include files below an excluded directory
+        return False
+    return exc_spec.match_file(os.path.join(rel, "x"))
+
+
+class GitIgnore:
+    """
+    The .gitignore rules that apply below root, read lazily per directory.
+    Files above root up to the enclosing checkout's top level apply too, as
+    in git. Later (deeper) rules override earlier ones; negations work, but
+    as in git nothing below an ignored directory can be re-included.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._specs: Dict[str, Optional[pathspec.GitIgnoreSpec]] = {}
+        self._outer: List[Tuple[str, pathspec.GitIgnoreSpec]] = []
+        # (size, mtime_ns) of the outer files, to tell when cached scans are stale
+        self.outer_stamp: List[Optional[List[int]]] = []
+        top = os.path.abspath(root)
+        ancestors: List[str] = []
+        while True:
+            if os.path.exists(os.path.join(top, ".git")):
+                break
+            parent = os.path.dirname(top)
+            if parent == top:
+                ancestors = []  # not inside a checkout
+                break
+            top = parent
+            ancestors.append(top)
+        for ancestor in reversed(ancestors):
+            spec = self._load(ancestor)
+            self.outer_stamp.append(file_stamp(os.path.join(ancestor, ".gitignore")))
+            if spec is not None:
+                prefix = os.path.relpath(os.path.abspath(root), ancestor)
+                self._outer.append((prefix.replace(os.sep, "/") + "/", spec))
+
+    @staticmethod
+    def _load(directory: str) -> Optional[pathspec.GitIgnoreSpec]:
+        try:
+            with open(os.path.join(directory, ".gitignore"), "r") as fh:
+                return pathspec.GitIgnoreSpec.from_lines(fh)
+        except OSError:
+            return None
+
+    def _spec(self, rel_dir: str) -> Optional[pathspec.GitIgnoreSpec]:
+        if rel_dir not in self._specs:
+            self._specs[rel_dir] = self._load(os.path.join(self.root, rel_dir))
+        return self._specs[rel_dir]
+
+    def match(self, rel: str, is_dir: bool = False) -> bool:
+        """True if the rules ignore rel itself (its parents are not checked)."""
+        path = rel.replace(os.sep, "/") + ("/" if is_dir else "")
+        ignored = None
+        spec: Optional[pathspec.GitIgnoreSpec]
+        for prefix, spec in self._outer:
+            include = spec.check_file(prefix + path).include
+            if include is not None:
+                ignored = include
+        parts = path.split("/")
+        for depth in range(len(parts) - (2 if is_dir else 1) + 1):
+            spec = self._spec("/".join(parts[:depth]))
+            if spec is not None:
+                include = spec.check_file("/".join(parts[depth:])).include
+                if include is not None:
+                    ignored = include
+        return bool(ignored)
+
+    def is_ignored(self, rel: str) -> bool:
+        """True if rel or one of its parent directories is ignored."""
+        parts = rel.split(os.sep)
+        return any(
+            self.match(os.path.join(*parts[:i]), is_dir=True)
+            for i in range(1, len(parts))
+        ) or self.match(rel)
+
+
+def file_stamp(path: str) -> Optional[List[int]]:
+    """[size, mtime_ns] of path, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def write_json_atomic(path: str, data) -> None:
+    """Write JSON so that a crash never leaves a partial file behind."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(data, fh)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def scan_cache_path(state_dir: str, collection: str) -> str:
+    return os.path.join(state_dir, f"{collection}.scan.json")
+
+
+class ScanCache:
+    """
+    Directory listings of the last scan, keyed by directory mtime (like git's
+    untracked cache). Adding, removing or renaming an entry changes its
+    directory's mtime, so a directory whose mtime (and .gitignore) is
+    unchanged is not listed or matched again: its subdirectories and matching
+    files are taken from the cache and only the files are stat'ed, which
+    still catches edits. The cache is only valid for one root and one set of
+    globs and ignore rules (key); path "" keeps it in memory only.
+    """
+
+    VERSION = 1
+
+    def __init__(self, key: str, path: str = ""):
+        self.key = key
+        self.path = path
+        self.outer: Optional[List] = None
+        self.dirs: Dict[str, Dict] = {}
+        self.hits = 0
+        self.misses = 0
+        self._visited: Set[str] = set()
+
+    @classmethod
+    def load(cls, path: str, key: str) -> "ScanCache":
+        cache = cls(key, path)
+        try:
+            with open(path, "r", encoding="utf-8") as fh:
+                data = json.load(fh)
+        except (OSError, ValueError):
+            return cache
+        if data.get("version") == cls.VERSION and data.get("key") == key:
+            cache.outer = data.get("outer")
+            cache.dirs = data.get("dirs", {})
+        return cache
+
+    def finish(self) -> None:
+        """Forget directories the last scan did not reach (deleted or pruned)."""
+        self.dirs = {d: e for d, e in self.dirs.items() if d in self._visited}
+        self._visited = set()
+
+    def save(self) -> None:
+        self.finish()
+        if self.path:
+            write_json_atomic(
+                self.path,
+                {
+                    "version": self.VERSION,
+                    "key": self.key,
+                    "outer": self.outer,
+                    "dirs": self.dirs,
+                },
+            )
+
+
+def scan_key(root: str, includes: str, excludes: str, gitignore: bool) -> str:
+    """Identifies the scans a ScanCache can be reused for."""
+    return json.dumps([os.path.abspath(root), includes, excludes, gitignore])
+
+
+# Directories modified this close to the scan may change again within the
+# same mtime tick, so their listing is not cached ("racy" entries in git)
+RACY_WINDOW_NS = 2_000_000_000
+
+
+def scan_tree(
+    root: str,
+    inc_spec,
+    exc_spec,
+    ignore: Optional[GitIgnore] = None,
+    top: str = "",
+    cache: Optional[ScanCache] = None,
+) -> Iterator[ScannedFile]:
+    """
+    Walk root (or its subdirectory top) with os.scandir and yield the files
+    matching the globs. Excluded and ignored directories are pruned without
+    being listed, and each file's size and mtime come from the same pass.
+    With ignore, .gitignore rules apply and .git itself is skipped.
+    With cache, unchanged directories are not listed again (see ScanCache).
+    """
+    if top and ignore is not None and ignore.is_ignored(top):
+        return
+    if cache is not None:
+        outer = ignore.outer_stamp if ignore is not None else []
+        if cache.outer != outer:
+            cache.dirs = {}
+            cache.outer = outer
+        racy_after = time.time_ns() - RACY_WINDOW_NS
+
+    # (directory, whether its cached listing may be used)
+    pending = [(top, True)]
+    while pending:
+        rel_dir, trusted = pending.pop()
+        path = os.path.join(root, rel_dir)
+        if cache is not None:
+            cache._visited.add(rel_dir)
+            stamp = file_stamp(path)
+            gitignore = (
+                file_stamp(os.path.join(path, ".gitignore"))
+                if ignore is not None
+                else None
+            )
+            cached = cache.dirs.get(rel_dir)
+            if (
+                trusted
+                and cached is not None
+                and stamp is not None
+                and cached["mtime_ns"] == stamp[1]
+                and cached["gitignore"] == gitignore
+            ):
+                cache.hits += 1
+                for name in cached["files"]:
+                    rel = os.path.join(rel_dir, name) if rel_dir else name
+                    try:
+                        st = os.stat(os.path.join(root, rel))
+                    except OSError:
+                        continue
+                    yield ScannedFile(rel, st.st_size, st.st_mtime_ns)
+                pending.extend(
+                    (os.path.join(rel_dir, name) if rel_dir else name, True)
+                    for name in reversed(cached["dirs"])
+                )
                 continue
-            if inc_spec.match_file(rel):
-                yield rel
+            cache.misses += 1
+            # New ignore rules here change what is matched below as well
+            trusted = trusted and (cached is None or cached["gitignore"] == gitignore)
+        try:
+            entries = os.scandir(path)
+        except OSError as e:
+            logger.warning(f"Could not scan {rel_dir or root}: {e}")
+            continue
+        subdirs = []
+        files = []
+        with entries:
+            for entry in entries:
+                rel = os.path.join(rel_dir, entry.name) if rel_dir else entry.name
+                try:
+                    if entry.is_dir():
+                        # Like os.walk: symlinked directories are not followed
+                        if entry.is_symlink() or is_excluded_dir(rel, exc_spec):
+                            continue
+                        if ignore is not None and (
+                            entry.name == ".git" or ignore.match(rel, is_dir=True)
+                        ):
+                            continue
+                        subdirs.append(entry.name)
+                        continue
+                    if exc_spec.match_file(rel) or not inc_spec.match_file(rel):
+                        continue
+                    if ignore is not None and ignore.match(rel):
+                        continue
+                    st = entry.stat()
+                except OSError:
+                    continue  # vanished or broken symlink
+                files.append(entry.name)
+                yield ScannedFile(rel, st.st_size, st.st_mtime_ns)
+        if cache is not None:
+            if stamp is not None and stamp[1] < racy_after:
+                cache.dirs[rel_dir] = {
+                    "mtime_ns": stamp[1],
+                    "gitignore": gitignore,
+                    "dirs": subdirs,
+                    "files": files,
+                }
+            else:
+                cache.dirs.pop(rel_dir, None)
+        pending.extend(
+            (os.path.join(rel_dir, name) if rel_dir else name, trusted)
+            for name in reversed(subdirs)
+        )
+
+
+def iter_files(
+    root: str, inc_spec, exc_spec, ignore: Optional[GitIgnore] = None
+) -> Iterator[str]:
+    for scanned in scan_tree(root, inc_spec, exc_spec, ignore):
+        yield scanned.rel
 
 
 def read_text(path: str) -> str:
     with open(path, "r", encoding="utf-8", errors="ignore") as fh:
         return fh.read()
+
+
+def current_rss_mb() -> float:
+    """Resident set size of this process from /proc (0.0 where unavailable)."""
+    try:
+        with open("/proc/self/statm", "r") as fh:
+            resident_pages = int(fh.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return 0.0
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+# Memory limits of the process's cgroup (v2, then v1)
+CGROUP_MEMORY_LIMITS = (
+    "/sys/fs/cgroup/memory.max",
+    "/sys/fs/cgroup/memory/memory.limit_in_bytes",
+)
+
+
+def cgroup_memory_limit_mb(paths: Iterable[str] = CGROUP_MEMORY_LIMITS) -> float:
+    """
+    Memory limit of the container's cgroup (0.0 if none is set). v2 writes
+    "max" for no limit; v1 a page-rounded huge number, ignored here too.
+    """
+    for path in paths:
+        try:
+            with open(path, "r") as fh:
+                value = fh.read().strip()
+        except OSError:
+            continue
+        if value == "max":
+            return 0.0
+        try:
+            limit = int(value)
+        except ValueError:
+            continue
+        return limit / (1024 * 1024) if 0 < limit < 1 << 60 else 0.0
+    return 0.0
+
+
+def physical_memory_mb() -> float:
+    """Physical memory of the machine (0.0 where unavailable)."""
+    try:
+        return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return 0.0
+
+
+def total_memory_mb() -> float:
+    """
+    Memory available to this process: the cgroup limit when running in a
+    container that sets one, below the machine's physical memory.
+    """
+    physical = physical_memory_mb()
+    limit = cgroup_memory_limit_mb()
+    if limit and (not physical or limit < physical):
+        return limit
+    return physical
@@ -0,0 +1,255 @@
+"""File system watchers for watch mode: inotify on Linux, polling elsewhere."""
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from typing import Dict, Iterator, Optional, Set, Tuple
+
+from util import GitIgnore, ScanCache, is_excluded_dir, scan_tree
+
+logger = logging.getLogger("indexer")
+
+DEFAULT_DEBOUNCE_MS = 500
+DEFAULT_POLL_INTERVAL_S = 2.0
+# A burst of edits is flushed after this many debounce windows at the latest
+MAX_DELAY_FACTOR = 10
+
+# <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+WATCH_MASK = (
+    IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+)
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class PollingWatcher:
+    """
+    Detects changes by comparing (size, mtime) snapshots of the matching files.
+    Portable fallback for systems without inotify.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        inc_spec,
+        exc_spec,
+        interval_s: float,
+        ignore: Optional[GitIgnore] = None,
+    ):
+        self.root = root
+        self.inc_spec = inc_spec
+        self.exc_spec = exc_spec
+        self.interval_s = interval_s
+        self.ignore = ignore
+        # Only directories whose mtime changed are listed again on each poll
+        self._cache = ScanCache("")
+        self._snapshot = self._scan()
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        snapshot = {
+            scanned.rel: (scanned.size, scanned.mtime_ns)
+            for scanned in scan_tree(
+                self.root, self.inc_spec, self.exc_spec, self.ignore, cache=self._cache
+            )
+        }
+        self._cache.finish()
+        return snapshot
+
+    def poll(self, timeout: float) -> Optional[Set[str]]:
+        """Wait up to timeout; return the changed paths (empty if none)."""
+        time.sleep(min(timeout, self.interval_s))
+        current = self._scan()
+        previous, self._snapshot = self._snapshot, current
+        changed = {rel for rel, stat in current.items() if previous.get(rel) != stat}
+        changed.update(rel for rel in previous if rel not in current)
+        return changed
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher:
+    """
+    Recursive inotify watch of a directory tree (Linux only).
+
+    poll() returns relative paths of files that were written, created, moved
+    or deleted. Directories that disappeared are reported as "dir/" so callers
+    can drop everything below them. If the kernel queue overflowed, poll()
+    returns None: events were lost and callers must rescan.
+    """
+
+    def __init__(self, root: str, exc_spec, ignore: Optional[GitIgnore] = None):
+        self.root = root
+        self.exc_spec = exc_spec
+        self.ignore = ignore
+        self._libc = ctypes.CDLL(
+            ctypes.util.find_library("c") or "libc.so.6", use_errno=True
+        )
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs: Dict[int, str] = {}
+        self._add_tree("")
+
+    def _add_tree(self, rel_dir: str, changed: Optional[Set[str]] = None) -> None:
+        """Watch rel_dir and its subdirectories; report files already in them."""
+        for dirpath, dirnames, filenames in os.walk(os.path.join(self.root, rel_dir)):
+            rel = os.path.relpath(dirpath, self.root)
+            rel = "" if rel == "." else rel
+            dirnames[:] = [
+                d for d in dirnames if not self._skip_dir(os.path.join(rel, d))
+            ]
+            wd = self._libc.inotify_add_watch(
+                self._fd, os.fsencode(dirpath), WATCH_MASK | IN_ONLYDIR
+            )
+            if wd < 0:
+                err = ctypes.get_errno()
+                if err == errno.ENOSPC:
+                    raise OSError(
+                        err, "inotify watch limit reached (fs.inotify.max_user_watches)"
+                    )
+                continue
+            self._dirs[wd] = rel
+            if changed is not None:
+                changed.update(os.path.join(rel, f) for f in filenames)
+
+    def _skip_dir(self, rel: str) -> bool:
+        if is_excluded_dir(rel, self.exc_spec):
+            return True
+        return self.ignore is not None and (
+            os.path.basename(rel) == ".git" or self.ignore.match(rel, is_dir=True)
+        )
+
+    def _remove_tree(self, rel_dir: str) -> None:
+        """Drop watches below a moved directory (they would report its old path)."""
+        prefix = rel_dir + os.sep
+        for wd, rel in list(self._dirs.items()):
+            if rel == rel_dir or rel.startswith(prefix):
+                self._libc.inotify_rm_watch(self._fd, wd)
+                del self._dirs[wd]
+
+    def poll(self, timeout: float) -> Optional[Set[str]]:
+        """Wait up to timeout for events; return the changed paths (empty if none)."""
+        changed: Set[str] = set()
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return changed
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            if not self._parse(data, changed):
+                return None
+        return changed
+
+    def _parse(self, data: bytes, changed: Set[str]) -> bool:
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                return False
+            if mask & IN_IGNORED:
+                self._dirs.pop(wd, None)
+                continue
+            parent = self._dirs.get(wd)
+            if parent is None or not name:
+                continue
+            rel = os.path.join(parent, name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    if not self._skip_dir(rel):
+                        self._add_tree(rel, changed)
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    self._remove_tree(rel)
+                    changed.add(rel + "/")
+            else:
+                changed.add(rel)
+        return True
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def open_watcher(
+    root: str,
+    inc_spec,
+    exc_spec,
+    poll_interval_s: float = DEFAULT_POLL_INTERVAL_S,
+    use_inotify: bool = True,
+    ignore: Optional[GitIgnore] = None,
+):
+    """inotify watcher where available, otherwise the polling fallback."""
+    if use_inotify and sys.platform.startswith("linux"):
+        try:
+            watcher = InotifyWatcher(root, exc_spec, ignore)
+            logger.info(
+                f"Watching {root} with inotify ({len(watcher._dirs)} directories)"
+            )
+            return watcher
+        except (OSError, AttributeError) as e:
+            logger.warning(f"inotify unavailable ({e}) - falling back to polling")
+    logger.info(f"Watching {root} by polling every {poll_interval_s}s")
+    return PollingWatcher(root, inc_spec, exc_spec, poll_interval_s, ignore)
+
+
+def debounced(
+    watcher,
+    debounce_ms: float = DEFAULT_DEBOUNCE_MS,
+    stop: Optional[threading.Event] = None,
+) -> Iterator[Optional[Set[str]]]:
+    """
+    Group bursts of changes: yield the collected paths once no new change has
+    arrived for debounce_ms, or after MAX_DELAY_FACTOR windows of continuous
+    edits. Yields None when events were lost and a full rescan is needed.
+    """
+    debounce = debounce_ms / 1000.0
+    pending: Set[str] = set()
+    first = last = 0.0
+    lost = False
+    while stop is None or not stop.is_set():
+        changed = watcher.poll(debounce if (pending or lost) else 1.0)
+        now = time.monotonic()
+        if changed is None:
+            lost = True
+            first = first or now
+            last = now
+        elif changed:
+            if not pending and not lost:
+                first = now
+            pending |= changed
+            last = now
+
+        if not (pending or lost):
+            continue
+        if now - last >= debounce or now - first >= debounce * MAX_DELAY_FACTOR:
+            yield None if lost else pending
+            pending, lost = set(), False
+            first = last = 0.0
@@ -0,0 +1,348 @@
+"""Asynchronous Qdrant writer: the upsert stage of the indexing pipeline."""
+
+import asyncio
+import logging
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Deque,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+from util import lazy_import
+
+# qdrant_client is imported on first use (see util.LazyImport)
+if TYPE_CHECKING:
+    from qdrant_client import AsyncQdrantClient, QdrantClient
+    from qdrant_client.http.models import PointStruct, UpdateStatus
+else:
+    QdrantClient, AsyncQdrantClient = lazy_import(
+        "qdrant_client", "QdrantClient", "AsyncQdrantClient"
+    )
+    PointStruct, UpdateStatus = lazy_import(
+        "qdrant_client.http.models", "PointStruct", "UpdateStatus"
+    )
+
+logger = logging.getLogger("indexer")
+
+DEFAULT_MAX_IN_FLIGHT = 4
+DEFAULT_UPSERT_RETRIES = 3
+DEFAULT_RETRY_BACKOFF_S = 0.5
+DEFAULT_UPLOAD_PARALLEL = 2
+
+# (relative path, point IDs) of a file whose points are part of a batch
+PendingFile = Tuple[str, List]
+
+_END = object()
+
+
+class PointWriter:
+    """
+    Accumulates the points of finished files and upserts them in batches.
+
+    Batches are sent from a background event loop through AsyncQdrantClient
+    with wait=False, so indexing continues while Qdrant applies them; at most
+    max_in_flight upserts are outstanding and add() blocks once that limit is
+    reached. A batch is retried with exponential backoff before it is given up.
+
+    on_commit receives the files of every batch Qdrant acknowledged (written to
+    its WAL); files of a failed batch are not reported, so they are retried next
+    run. on_commit runs on a separate thread, one call at a time, so blocking
+    work there (checkpoints) does not stall the event loop's other upserts.
+    close() is the final barrier: it waits for all outstanding batches and
+    confirms they were applied. The writer owns the client and closes it.
+    """
+
+    def __init__(
+        self,
+        client: AsyncQdrantClient,
+        collection: str,
+        batch_size: int,
+        on_commit: Optional[Callable[[List[PendingFile]], None]] = None,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+        max_retries: int = DEFAULT_UPSERT_RETRIES,
+        retry_backoff_s: float = DEFAULT_RETRY_BACKOFF_S,
+    ):
+        self.client = client
+        self.collection = collection
+        self.batch_size = max(1, batch_size)
+        self.on_commit = on_commit
+        self.max_retries = max(0, max_retries)
+        self.retry_backoff_s = retry_backoff_s
+        self.batch: List[PointStruct] = []
+        self.pending: List[PendingFile] = []
+        self.upserted = 0
+        self.acknowledged = 0  # batches accepted with wait=False, not yet confirmed
+        self.failed_batches = 0
+        self.retries = 0
+        self._last_acknowledged: List[PointStruct] = []
+        self._slots = threading.Semaphore(max(1, max_in_flight))
+        self._in_flight: Set[Future] = set()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="qdrant-writer", daemon=True
+        )
+        self._thread.start()
+        self._commits = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="qdrant-commit"
+        )
+
+    def add(self, rel: str, points: List[PointStruct]) -> None:
+        self.batch.extend(points)
+        self.pending.append((rel, [point.id for point in points]))
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Send the current batch without waiting for it to be applied."""
+        if self._closed:
+            raise RuntimeError("PointWriter is closed")
+        if not self.batch and not self.pending:
+            return
+        batch, pending = self.batch, self.pending
+        self.batch, self.pending = [], []
+        self._slots.acquire()
+        future = asyncio.run_coroutine_threadsafe(
+            self._upsert(batch, pending), self._loop
+        )
+        with self._lock:
+            self._in_flight.add(future)
+        future.add_done_callback(self._release)
+
+    def drain(self) -> None:
+        """
+        Flush and wait until every batch sent so far was acknowledged (its
+        files committed) or given up. The writer stays open.
+        """
+        self.flush()
+        with self._lock:
+            in_flight = list(self._in_flight)
+        for future in in_flight:
+            future.result()
+
+    def close(self) -> bool:
+        """
+        Flush, wait for every outstanding batch and confirm it was applied.
+        Returns False if any batch failed or could not be confirmed.
+        """
+        if self._closed:
+            return self.failed_batches == 0
+        self.flush()
+        self._closed = True
+        with self._lock:
+            in_flight = list(self._in_flight)
+        for future in in_flight:
+            future.result()
+
+        confirmed = asyncio.run_coroutine_threadsafe(
+            self._confirm(), self._loop
+        ).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._commits.shutdown()
+
+        logger.info(
+            f"Upserted {self.upserted} points "
+            f"({self.failed_batches} failed batches, {self.retries} retries)"
+        )
+        return confirmed and self.failed_batches == 0
+
+    def _release(self, future: Future) -> None:
+        with self._lock:
+            self._in_flight.discard(future)
+        self._slots.release()
+
+    async def _upsert(self, batch: List[PointStruct], pending: List[PendingFile]):
+        if batch:
+            logger.debug(f"Upserting batch of {len(batch)} vectors...")
+            for attempt in range(self.max_retries + 1):
+                try:
+                    result = await self.client.upsert(
+                        collection_name=self.collection, points=batch, wait=False
+                    )
+                    status = getattr(result, "status", UpdateStatus.ACKNOWLEDGED)
+                    if status not in (
+                        UpdateStatus.ACKNOWLEDGED,
+                        UpdateStatus.COMPLETED,
+                    ):
+                        raise RuntimeError(f"upsert returned status '{status}'")
+                    break
+                except Exception as e:
+                    if attempt == self.max_retries:
+                        logger.error(f"Failed to upsert batch: {e}")
+                        self.failed_batches += 1
+                        return
+                    delay = self.retry_backoff_s * (2**attempt)
+                    logger.warning(
+                        f"Upsert of {len(batch)} points failed ({e}), retrying in {delay:.1f}s"
+                    )
+                    self.retries += 1
+                    await asyncio.sleep(delay)
+
+            self.upserted += len(batch)
+            if status == UpdateStatus.ACKNOWLEDGED:
+                self.acknowledged += 1
+                self._last_acknowledged = batch
+            logger.debug("Batch acknowledged")
+        if self.on_commit is not None and pending:
+            await self._loop.run_in_executor(self._commits, self.on_commit, pending)
+
+    async def _confirm(self) -> bool:
+        """
+        Wait until Qdrant has applied every acknowledged batch.
+
+        Updates to a collection are applied in order, so re-sending the last
+        acknowledged batch with wait=True (idempotent: point IDs are stable)
+        returns only once everything queued before it is applied too.
+        """
+        confirmed = True
+        if self._last_acknowledged:
+            try:
+                await self.client.upsert(
+                    collection_name=self.collection,
+                    points=self._last_acknowledged,
+                    wait=True,
+                )
+                logger.debug(f"Confirmed {self.acknowledged} acknowledged batches")
+            except Exception as e:
+                logger.error(f"Could not confirm pending upserts: {e}")
+                confirmed = False
+        try:
+            await self.client.close()
+        except Exception as e:
+            logger.debug(f"Error closing async Qdrant client: {e}")
+        return confirmed
+
+
+class BulkPointWriter:
+    """
+    Streams points into one long-running QdrantClient.upload_points() call.
+
+    Meant for initial builds of large collections over gRPC: upload_points
+    batches the stream itself and sends batches from `parallel` worker
+    processes, each with its own connection, without an acknowledgement round
+    trip per batch. add() blocks once the upload falls behind.
+
+    upload_points reports no per-batch results, so files are only committed
+    once the whole upload finished and was confirmed by close(); an
+    interrupted bulk load is redone in full on the next run.
+    """
+
+    def __init__(
+        self,
+        client: QdrantClient,
+        collection: str,
+        batch_size: int,
+        on_commit: Optional[Callable[[List[PendingFile]], None]] = None,
+        parallel: int = DEFAULT_UPLOAD_PARALLEL,
+        max_retries: int = DEFAULT_UPSERT_RETRIES,
+    ):
+        self.client = client
+        self.collection = collection
+        self.batch_size = max(1, batch_size)
+        self.on_commit = on_commit
+        self.parallel = max(1, parallel)
+        self.max_retries = max(0, max_retries)
+        self.pending: List[PendingFile] = []
+        self.upserted = 0
+        self.failed_batches = 0
+        self._tail: Deque[PointStruct] = deque(maxlen=self.batch_size)
+        self._queue: queue.Queue = queue.Queue(
+            maxsize=self.batch_size * self.parallel * 2
+        )
+        self._error: Optional[BaseException] = None
+        self._ended = False
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._upload, name="qdrant-bulk-upload", daemon=True
+        )
+        self._thread.start()
+
+    def add(self, rel: str, points: List[PointStruct]) -> None:
+        if self._closed:
+            raise RuntimeError("BulkPointWriter is closed")
+        for point in points:
+            if self._error is not None:
+                break
+            self._queue.put(point)
+        self.pending.append((rel, [point.id for point in points]))
+
+    def flush(self) -> None:
+        """Batches are formed by upload_points; there is nothing to flush."""
+
+    def drain(self) -> None:
+        """Files are only committed by close(); there is nothing to wait for."""
+
+    def close(self) -> bool:
+        """
+        Finish the upload and confirm it was applied.
+        Returns False (committing nothing) if the upload failed.
+        """
+        if self._closed:
+            return self.failed_batches == 0
+        self._closed = True
+        self._queue.put(_END)
+        self._thread.join()
+
+        if self._error is None and self._tail:
+            # Updates are applied in order: once the last batch is confirmed
+            # with wait=True, everything uploaded before it is applied as well
+            try:
+                self.client.upsert(
+                    collection_name=self.collection, points=list(self._tail), wait=True
+                )
+            except Exception as e:
+                self._error = e
+
+        if self._error is not None:
+            logger.error(f"Bulk upload failed: {self._error}")
+            self.failed_batches += 1
+            return False
+
+        logger.info(f"Bulk uploaded {self.upserted} points ({self.parallel} parallel)")
+        if self.on_commit is not None and self.pending:
+            self.on_commit(list(self.pending))
+        self.pending = []
+        return True
+
+    def _points(self) -> Iterator[PointStruct]:
+        while True:
+            point = self._queue.get()
+            if point is _END:
+                self._ended = True
+                return
+            self._tail.append(point)
+            self.upserted += 1
+            yield point
+
+    def _upload(self) -> None:
+        try:
+            self.client.upload_points(
+                collection_name=self.collection,
+                points=self._points(),
+                batch_size=self.batch_size,
+                parallel=self.parallel,
+                max_retries=self.max_retries,
+                wait=False,
+            )
+        except Exception as e:
+            self._error = e
+            # Drain the queue so producers blocked in add() can finish
+            while not self._ended:
+                self._ended = self._queue.get() is _END
+
+
+# Either writer: add(rel, points) from the pipeline, close() when done
+Writer = Union[PointWriter, BulkPointWriter]
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for the indexer CLI.
+Times fresh interpreters importing the indexer and running host-indexer --help,
+and lists the slowest imports (python -X importtime).
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+hish_root = Path(__file__).parent.parent
+indexer_dir = hish_root / "rag" / "indexer"
+
+# Libraries the CLI must not import before it indexes anything
+HEAVY_MODULES = ("torch", "fastembed", "onnxruntime", "qdrant_client")
+
+
+def time_command(args, runs: int) -> float:
+    """Median wall time of a command in seconds (one untimed warm-up run)."""
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    subprocess.run(args, cwd=indexer_dir, env=env, capture_output=True, check=True)
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(args, cwd=indexer_dir, env=env, capture_output=True, check=True)
+        times.append(time.perf_counter() - started)
+    return statistics.median(times)
+
+
+def slowest_imports(module: str, top: int):
+    """(cumulative microseconds, module) of the slowest top-level imports."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=indexer_dir,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            rows.append((int(cumulative), name.rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark indexer startup time")
+    parser.add_argument("--runs", type=int, default=5, help="Timed runs per command")
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports to list")
+    args = parser.parse_args()
+
+    print(f"⏱  Indexer startup (median of {args.runs} runs)")
+    commands = {
+        "python (empty)": [sys.executable, "-c", "pass"],
+        "import app": [sys.executable, "-c", "import app"],
+        "host-indexer --help": [
+            sys.executable,
+            str(hish_root / "scripts" / "host-indexer.py"),
+            "--help",
+        ],
+    }
+    for label, command in commands.items():
+        print(f"  {label:<22} {time_command(command, args.runs) * 1000:8.0f} ms")
+
+    loaded = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            f"import sys, app; print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))",
+        ],
+        cwd=indexer_dir,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.strip()
+    print(f"\n📦 Heavy modules loaded by 'import app': {loaded or 'none'}")
+
+    print("\n🐢 Slowest imports (cumulative):")
+    for micros, name in slowest_imports("app", args.top):
+        print(f"  {micros / 1000:8.1f} ms {name}")
+
+    return 1 if loaded else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
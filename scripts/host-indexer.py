@@ -8,7 +8,7 @@ import os
 import sys
 import logging
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional, Tuple
 
 # Add the rag/indexer directory to Python path for imports
 hish_root = Path(__file__).parent.parent
@@ -16,7 +16,7 @@ sys.path.insert(0, str(hish_root / "rag" / "indexer"))
 
 # Import the indexing function directly
 try:
-    from app import index_repo
+    from app import has_resumable_rebuild, index_repo, index_targets, watch_repo
 except ImportError as e:
     print(f"Error: Unable to import indexing module. Make sure you have the required dependencies installed:")
     print(f"  pip install -r {hish_root}/rag/indexer/requirements.txt")
@@ -52,10 +52,125 @@ def load_env_file(env_file: Path) -> dict:
     return env_vars
 
 
+def indexer_settings(env_vars: dict, bulk_load: bool, prefer_grpc: bool) -> dict:
+    """Indexer keyword arguments shared by single- and multi-target runs."""
+    return dict(
+        qdrant_url=env_vars.get("QDRANT_URL", "http://localhost:6333"),
+        api_key=env_vars.get("QDRANT_API_KEY", ""),
+        model_name=env_vars.get(
+            "EMBEDDING_MODEL", "BAAI/bge-small-en-v1.5"),
+        includes=env_vars.get("INDEX_INCLUDE", ""),
+        excludes=env_vars.get("INDEX_EXCLUDE", ""),
+        chunk_max_tokens=int(env_vars.get("CHUNK_MAX_TOKENS", "350")),
+        chunk_min_chars=int(env_vars.get("CHUNK_MIN_CHARS", "150")),
+        chunk_overlap=int(env_vars.get("CHUNK_OVERLAP_TOKENS", "70")),
+        max_workers=int(env_vars.get("MAX_WORKERS", "0")),
+        batch_size=int(env_vars.get("BATCH_SIZE", "256")),
+        embed_batch_size=int(env_vars.get("EMBED_BATCH_SIZE")
+                             or env_vars.get("HISH_BATCH_SIZE") or "64"),
+        read_workers=int(env_vars.get("READ_WORKERS", "2")),
+        embed_workers=int(env_vars.get("EMBED_WORKERS", "16")),
+        queue_size=int(env_vars.get("PIPELINE_QUEUE_SIZE", "64")),
+        max_files_in_flight=int(env_vars.get("MAX_FILES_IN_FLIGHT", "128")),
+        max_pending_points=int(env_vars.get("MAX_PENDING_POINTS", "2048")),
+        max_in_flight=int(env_vars.get("UPSERT_MAX_IN_FLIGHT", "4")),
+        upsert_retries=int(env_vars.get("UPSERT_RETRIES", "3")),
+        prefer_grpc=prefer_grpc or env_flag(env_vars, "QDRANT_PREFER_GRPC"),
+        grpc_port=int(env_vars.get("QDRANT_GRPC_PORT", "6334")),
+        bulk_load=bulk_load or env_flag(env_vars, "BULK_LOAD"),
+        upload_parallel=int(env_vars.get("UPLOAD_PARALLEL", "2")),
+        embed_cache=env_flag(env_vars, "EMBED_CACHE", True),
+        embed_cache_mb=float(env_vars.get("EMBED_CACHE_MAX_MB", "1024")),
+        use_git=env_flag(env_vars, "INDEX_USE_GIT", True),
+        use_gitignore=env_flag(env_vars, "INDEX_USE_GITIGNORE", True),
+        payload_mode=env_vars.get("PAYLOAD_MODE", "full"),
+        payload_text_field=env_vars.get("PAYLOAD_TEXT_FIELD", "document"),
+        markdown_chunker=env_vars.get("MARKDOWN_CHUNKER", "sections"),
+        chunk_tokenizer=env_vars.get("CHUNK_TOKENIZER", "model"),
+        dedup_mode=env_vars.get("DEDUP", "off"),
+        dedup_threshold=float(env_vars.get("DEDUP_THRESHOLD", "0.9")),
+        quantization_mode=(env_vars.get("QUANTIZATION")
+                           or env_vars.get("HISH_ENABLE_QUANTIZATION") or "none"),
+        quantization_collections=env_vars.get("QUANTIZATION_COLLECTIONS", ""),
+        quantization_always_ram=env_flag(
+            env_vars, "QUANTIZATION_ALWAYS_RAM", True),
+        quantization_oversampling=float(
+            env_vars.get("QUANTIZATION_OVERSAMPLING", "0")),
+        max_file_size_mb=int(env_vars.get("MAX_FILE_SIZE_MB", "5")),
+        memory_budget_mb=float(env_vars.get("MEMORY_BUDGET_MB", "0")),
+    )
+
+
+def env_flag(env_vars: dict, key: str, default: bool = False) -> bool:
+    """Read a boolean setting (1/true/yes/on) from the env file values."""
+    value = env_vars.get(key, "")
+    if not value:
+        return default
+    return value.lower() in ("1", "true", "yes", "on")
+
+
+def discover_targets(root: Path) -> List[Tuple[str, str]]:
+    """
+    The framework docs plus every context in local/*/repo_path.txt, as
+    (work_dir, collection) pairs - the same set `make index` covers.
+    """
+    targets = [(str(root), "hish_framework_mpnet")]
+    local_dir = root / "local"
+    if not local_dir.is_dir():
+        logger.info("No local contexts found. Create one with make new-context")
+        return targets
+
+    for context_dir in sorted(local_dir.iterdir()):
+        repo_path_file = context_dir / "repo_path.txt"
+        if not context_dir.is_dir() or not repo_path_file.is_file():
+            continue
+        repo_path = repo_path_file.read_text().strip()
+        if not Path(repo_path).is_dir():
+            logger.warning(
+                f"Repo path not found for {context_dir.name}: {repo_path}")
+            continue
+        targets.append((repo_path, f"{context_dir.name}_docs_mpnet"))
+    return targets
+
+
+def index_many(targets: List[Tuple[str, str]],
+               env_file: Path,
+               recreate: bool = False,
+               bulk_load: bool = False,
+               prefer_grpc: bool = False,
+               resume: bool = False) -> bool:
+    """Index several (work_dir, collection) pairs in one process with one model."""
+    env_vars = load_env_file(env_file)
+    env_vars["QDRANT_URL"] = "http://localhost:6333"
+    for key, value in env_vars.items():
+        os.environ[key] = value
+
+    for work_dir, collection in targets:
+        logger.info(f"Target: {work_dir} -> collection '{collection}'")
+
+    try:
+        # recreate: without manifests every collection is rebuilt from scratch
+        index_targets(
+            targets,
+            incremental=not recreate,
+            resume=resume,
+            checkpoint_every=int(env_vars.get("REPO_CHUNK_SIZE", "100")),
+            **indexer_settings(env_vars, bulk_load, prefer_grpc),
+        )
+        return True
+    except Exception as e:
+        logger.error(f"Indexing failed: {e}")
+        return False
+
+
 def index_directory(work_dir: Path,
                     env_file: Path,
                     collection_name: Optional[str] = None,
-                    recreate: bool = False) -> bool:
+                    recreate: bool = False,
+                    bulk_load: bool = False,
+                    prefer_grpc: bool = False,
+                    git_hook: Optional[str] = None,
+                    resume: bool = False) -> bool:
     """Index a directory using direct function calls."""
 
     # Load environment variables from env file
@@ -67,6 +182,7 @@ def index_directory(work_dir: Path,
 
     # Override Qdrant URL for host-based access
     env_vars["QDRANT_URL"] = "http://localhost:6333"
+    prefer_grpc = prefer_grpc or env_flag(env_vars, "QDRANT_PREFER_GRPC")
 
     # Set environment variables
     for key, value in env_vars.items():
@@ -75,67 +191,24 @@ def index_directory(work_dir: Path,
     logger.info(
         f"Indexing {work_dir} into collection '{env_vars.get('COLLECTION_NAME', 'unknown')}'")
 
-    if recreate:
+    if recreate and resume and has_resumable_rebuild(
+            env_vars.get("COLLECTION_NAME", "hish_framework"),
+            env_vars.get("EMBEDDING_MODEL", "BAAI/bge-small-en-v1.5")):
+        logger.info("Resuming the interrupted rebuild from its last checkpoint")
+    elif recreate:
         logger.warning(
             "⚠️  RECREATE FLAG ENABLED - This will DROP and RECREATE the collection, replacing all existing data!")
-        # Handle collection recreation before indexing
-        try:
-            from qdrant_client import QdrantClient
-            from qdrant_client.http.models import VectorParams, Distance
-
-            client = QdrantClient(url=env_vars.get("QDRANT_URL", "http://localhost:6333"),
-                                  api_key=env_vars.get("QDRANT_API_KEY", ""))
-
-            # Get embedding dimension from model name
-            model_name = env_vars.get(
-                "EMBEDDING_MODEL", "BAAI/bge-small-en-v1.5")
-            if "bge-small" in model_name.lower():
-                dim = 384
-            elif "bge-base" in model_name.lower():
-                dim = 768
-            elif "bge-large" in model_name.lower():
-                dim = 1024
-            elif "paraphrase-multilingual-mpnet-base-v2" in model_name.lower():
-                dim = 768
-            else:
-                dim = 384  # Default
-
-            collection = env_vars.get("COLLECTION_NAME", "hish_framework")
-            logger.info(
-                f"Recreating collection '{collection}' with dimension {dim}")
-
-            vectors_config = {model_name: VectorParams(
-                size=dim, distance=Distance.COSINE)}
-            client.recreate_collection(
-                collection, vectors_config=vectors_config)
-            logger.info(f"Collection '{collection}' recreated successfully")
-
-        except Exception as e:
-            logger.error(f"Failed to recreate collection: {e}")
-            return False
 
     try:
-        # Call the indexing function directly (without recreate parameter)
+        # Call the indexing function directly; recreate drops the collection and manifest
         index_repo(
             work_root=str(work_dir),
-            qdrant_url=env_vars.get("QDRANT_URL", "http://localhost:6333"),
-            api_key=env_vars.get("QDRANT_API_KEY", ""),
+            incremental=not recreate,
             collection=env_vars.get("COLLECTION_NAME", "hish_framework"),
-            model_name=env_vars.get(
-                "EMBEDDING_MODEL", "BAAI/bge-small-en-v1.5"),
-            includes=env_vars.get("INDEX_INCLUDE", ""),
-            excludes=env_vars.get("INDEX_EXCLUDE", ""),
-            chunk_max_tokens=int(env_vars.get("CHUNK_MAX_TOKENS", "350")),
-            chunk_min_chars=int(env_vars.get("CHUNK_MIN_CHARS", "150")),
-            chunk_overlap=int(env_vars.get("CHUNK_OVERLAP_TOKENS", "70")),
-            max_workers=int(env_vars.get("MAX_WORKERS", "0")),
-            batch_size=int(env_vars.get("BATCH_SIZE", "256")),
-            max_file_size_mb=int(env_vars.get("MAX_FILE_SIZE_MB", "5")),
             repo_chunk_size=int(env_vars.get("REPO_CHUNK_SIZE", "100")),
-            repo_size_threshold_mb=float(
-                env_vars.get("REPO_SIZE_THRESHOLD_MB", "50.0")),
-            memory_cleanup_interval=int(
-                env_vars.get("MEMORY_CLEANUP_INTERVAL", "50"))
+            git_hook=git_hook,
+            resume=resume,
+            **indexer_settings(env_vars, bulk_load, prefer_grpc),
         )
         return True
     except Exception as e:
@@ -143,6 +216,37 @@ def index_directory(work_dir: Path,
         return False
 
 
+def watch_directory(work_dir: Path,
+                    env_file: Path,
+                    collection_name: Optional[str] = None,
+                    prefer_grpc: bool = False) -> bool:
+    """Keep a directory's collection up to date until interrupted."""
+    env_vars = load_env_file(env_file)
+    if collection_name:
+        env_vars["COLLECTION_NAME"] = collection_name
+    env_vars["QDRANT_URL"] = "http://localhost:6333"
+    for key, value in env_vars.items():
+        os.environ[key] = value
+
+    settings = indexer_settings(env_vars, False, prefer_grpc)
+    # Bursts of edits are small; bulk uploads do not apply
+    settings.pop("bulk_load")
+    settings.pop("upload_parallel")
+    try:
+        watch_repo(
+            work_root=str(work_dir),
+            collection=env_vars.get("COLLECTION_NAME", "hish_framework"),
+            debounce_ms=float(env_vars.get("WATCH_DEBOUNCE_MS", "500")),
+            poll_interval_s=float(env_vars.get("WATCH_POLL_INTERVAL_S", "2")),
+            use_inotify=env_flag(env_vars, "WATCH_USE_INOTIFY", True),
+            **settings,
+        )
+        return True
+    except Exception as e:
+        logger.error(f"Watch failed: {e}")
+        return False
+
+
 def main():
     """Main entry point for host-based indexing."""
     import argparse
@@ -150,22 +254,65 @@ def main():
     parser = argparse.ArgumentParser(
         description="Host-based RAG indexing for hish framework")
     parser.add_argument("--work-dir", type=Path,
-                        required=True, help="Directory to index")
+                        help="Directory to index")
+    parser.add_argument("--target", action="append", default=[], metavar="WORK_DIR:COLLECTION",
+                        help="Index several directories in one process (repeatable)")
+    parser.add_argument("--all-contexts", action="store_true",
+                        help="Index framework docs and every local/*/repo_path.txt context in one process")
     parser.add_argument("--env-file", type=Path, required=True,
                         help="Environment configuration file")
     parser.add_argument("--collection", type=str,
                         help="Override collection name")
     parser.add_argument("--recreate", action="store_true",
                         help="Drop and recreate collection (DESTRUCTIVE - loses all existing data)")
+    parser.add_argument("--grpc", action="store_true",
+                        help="Talk to Qdrant over gRPC (port 6334)")
+    parser.add_argument("--git-hook", choices=["post-commit", "post-merge"],
+                        help="Index only the files touched by the commit/merge that fired this hook")
+    parser.add_argument("--bulk-load", action="store_true",
+                        help="Upload points with parallel upload_points (initial builds)")
+    parser.add_argument("--resume", action="store_true",
+                        help="With --recreate: continue an interrupted rebuild from its last checkpoint")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running and re-index files of --work-dir as they change")
 
     args = parser.parse_args()
 
-    success = index_directory(
-        work_dir=args.work_dir,
-        env_file=args.env_file,
-        collection_name=args.collection,
-        recreate=args.recreate
-    )
+    if args.target or args.all_contexts:
+        targets = discover_targets(hish_root) if args.all_contexts else []
+        for spec in args.target:
+            work_dir, sep, collection = spec.rpartition(":")
+            if not sep or not work_dir or not collection:
+                parser.error(f"--target expects WORK_DIR:COLLECTION, got '{spec}'")
+            targets.append((work_dir, collection))
+        success = index_many(
+            targets,
+            env_file=args.env_file,
+            recreate=args.recreate,
+            bulk_load=args.bulk_load,
+            prefer_grpc=args.grpc,
+            resume=args.resume
+        )
+    elif args.work_dir is None:
+        parser.error("one of --work-dir, --target or --all-contexts is required")
+    elif args.watch:
+        success = watch_directory(
+            work_dir=args.work_dir,
+            env_file=args.env_file,
+            collection_name=args.collection,
+            prefer_grpc=args.grpc
+        )
+    else:
+        success = index_directory(
+            work_dir=args.work_dir,
+            env_file=args.env_file,
+            collection_name=args.collection,
+            recreate=args.recreate,
+            bulk_load=args.bulk_load,
+            prefer_grpc=args.grpc,
+            git_hook=args.git_hook,
+            resume=args.resume
+        )
 
     if success:
         logger.info("✅ Indexing completed successfully")
@@ -8,6 +8,7 @@ Uses Phase 1 optimizations:
 - HNSW tuning (m=40, ef_construct=384)
 - On-disk storage + WAL
 - Payload indexes for filtering
+- Optional scalar/binary quantization or float16 vectors (QUANTIZATION)
 """
 
 from sentence_transformers import SentenceTransformer
@@ -29,6 +30,16 @@ script_dir = Path(__file__).parent
 rag_indexer_dir = script_dir.parent / "rag" / "indexer"
 sys.path.insert(0, str(rag_indexer_dir))
 
+from quantization import (  # noqa: E402
+    describe,
+    for_collection,
+    parse_overrides,
+    quantization,
+    quantization_config,
+    quantization_update,
+    vector_datatype,
+)
+
 
 def setup_intelligence_collection():
     """Create and configure the cross-project intelligence collection."""
@@ -46,6 +57,17 @@ def setup_intelligence_collection():
     print(f"📡 Qdrant URL: {qdrant_url}")
     print(f"🤖 Embedding Model: {model_name}")
 
+    quant = for_collection(
+        collection_name,
+        quantization(
+            os.getenv("QUANTIZATION") or os.getenv("HISH_ENABLE_QUANTIZATION", ""),
+            os.getenv("QUANTIZATION_ALWAYS_RAM", "true").lower() in ("1", "true", "yes", "on"),
+            float(os.getenv("QUANTIZATION_OVERSAMPLING", "0")),
+        ),
+        parse_overrides(os.getenv("QUANTIZATION_COLLECTIONS", "")),
+    )
+    print(f"🗜️  Vector storage: {describe(quant)}")
+
     try:
         # Initialize Qdrant client
         client = QdrantClient(
@@ -69,6 +91,7 @@ def setup_intelligence_collection():
                     full_scan_threshold=10000,
                 ),
                 on_disk=True,  # Enable mmap for memory efficiency
+                datatype=vector_datatype(quant),
             )
         }
 
@@ -90,10 +113,21 @@ def setup_intelligence_collection():
                     wal_config=WalConfigDiff(
                         wal_capacity_mb=64,
                     ),
+                    quantization_config=quantization_config(quant),
                 )
                 print(f"🔄 Recreated collection '{collection_name}' with Phase 1 optimizations")
             else:
                 print(f"✅ Using existing collection '{collection_name}'")
+                update = quantization_update(
+                    client.get_collection(collection_name).config.quantization_config,
+                    quant,
+                )
+                if update is not None:
+                    client.update_collection(
+                        collection_name=collection_name,
+                        quantization_config=update,
+                    )
+                    print(f"🗜️  Switched to {describe(quant)}")
                 print(f"⚠️  Note: Existing collection may not have Phase 1 optimizations")
         else:
             client.create_collection(
@@ -105,6 +139,7 @@ def setup_intelligence_collection():
                 wal_config=WalConfigDiff(
                     wal_capacity_mb=64,
                 ),
+                quantization_config=quantization_config(quant),
             )
             print(f"✨ Created new collection '{collection_name}' with Phase 1 optimizations")
 
@@ -147,6 +182,8 @@ def setup_intelligence_collection():
         print(f"  • HNSW m: {vec_config.hnsw_config.m}")
         print(f"  • HNSW ef_construct: {vec_config.hnsw_config.ef_construct}")
         print(f"  • On-disk storage: {vec_config.on_disk}")
+        print(f"  • Datatype: {vec_config.datatype or 'float32'}")
+        print(f"  • Quantization: {describe(quant)}")
         print(f"  • Indexing threshold: {config.optimizer_config.indexing_threshold}")
 
         print(f"\n✅ Cross-Project Intelligence Collection setup complete!")
@@ -154,6 +191,9 @@ def setup_intelligence_collection():
         print(f"   - Framework docs: Use collection 'hish_framework_mpnet'")
         print(f"   - Cross-project intelligence: Use collection '{collection_name}'")
         print(f"   - ⚠️  Important: Vectors MUST be normalized before storage (DOT distance)")
+        if quant.mode in ("scalar", "binary"):
+            print(f"   - Search with quantization.oversampling={quant.oversampling:g}, "
+                  f"rescore={str(quant.rescore).lower()} for best recall")
         print(f"\n📋 Collection Purpose:")
         print(f"   - Pattern observations across projects")
         print(f"   - Relationship mappings between contexts")